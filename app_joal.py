@@ -26,28 +26,44 @@
 # numpy==2.2.6
 # pillow==12.1.0
 
-import re
+import os
 import json
+import functools
 import time
-import uuid
-import hashlib
 import logging
-import sqlite3
+import importlib.machinery
 from pathlib import Path
-from datetime import datetime
-from typing import Dict, Any, Optional, Tuple, List
+from datetime import timedelta
+from typing import TYPE_CHECKING, Dict, Any, Optional, Tuple, List, Callable
 
 import streamlit as st
-import pandas as pd
-from fpdf import FPDF
+
+if TYPE_CHECKING:
+    import pandas as pd  # importado sob demanda: só os painéis com DataFrame pagam o import (~0.5s)
+
+from quantix.entity_index import diff_entity_indexes
+from quantix.jobs import JobWorkerPool, batch_summary
+# motor sem UI (dados, análise, IFC/PDF/JSON, fila): compartilhado com os workers de processo
+from quantix.engine import (
+    ENGINE_VERSION, DB, BLOBS, ANALYSIS_CACHE, JOB_QUEUE, PRO_FIELDS, IFC_UPLOAD_TYPES,
+    normalize_tenant, normalize_user, tenant_root, safe_filename, make_project_id, is_pdf, is_ifc, spool_upload, limpar_spool_antigo,
+    versao_tenant, uso_disco_tenant, remover_projeto,
+    load_props, save_props, confidence_0_100, analisar_ifc_arquivo, abrir_indice_entidades, executar_job,
+    enfileirar_projeto, enfileirar_lote,
+)
+
+# O Streamlit instala este script como __main__ com __file__ e sem __spec__: cada processo spawn
+# (scan paralelo, workers da fila) reexecutaria o app inteiro ao iniciar. Com um spec "__main__"
+# o multiprocessing não reimporta o script nos filhos (eles só precisam de quantix.*).
+# Verificado com streamlit==1.54.0 (o do requirements): ScriptRunner._new_module cria o "__main__" com
+# types.ModuleType, sem spec. Ao atualizar o Streamlit, confira que um job em QUANTIX_JOB_EXECUTOR=process
+# não reexecuta o app no filho (avisos "missing ScriptRunContext" no log dos workers).
+__spec__ = importlib.machinery.ModuleSpec("__main__", None)
 
 # -----------------------------------------------------------------------------
 # LOG
 # -----------------------------------------------------------------------------
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s - %(message)s")
-logger = logging.getLogger("quantix")
-
-ENGINE_VERSION = "2026.03.04-multiuser-mvp+pdfsafe+group+stylemap"
 
 # -----------------------------------------------------------------------------
 # STREAMLIT
@@ -59,11 +75,7 @@ st.set_page_config(
     initial_sidebar_state="expanded",
 )
 
-APP_ROOT = Path(".").resolve()
-DATA_DIR = APP_ROOT / "quantix_data"
-DATA_DIR.mkdir(parents=True, exist_ok=True)
-
-DB_PATH = DATA_DIR / "quantix.db"
+_T_RERUN = time.perf_counter()
 
 # -----------------------------------------------------------------------------
 # CSS + Mobile DNA
@@ -98,202 +110,53 @@ html, body, [class*="css"] { font-family: 'Inter', sans-serif; }
 # -----------------------------------------------------------------------------
 # AUTH (MVP) — tenant/user no sidebar
 # -----------------------------------------------------------------------------
-def _normalize_tenant(s: str) -> str:
-    s = (s or "").strip().lower()
-    s = re.sub(r"[^a-z0-9._-]+", "-", s).strip("-")
-    return s or "demo"
-
-def _normalize_user(s: str) -> str:
-    s = (s or "").strip().lower()
-    s = re.sub(r"[^a-z0-9@._-]+", "", s)
-    return s or "anon"
-
 with st.sidebar:
     st.markdown("### 🔐 Sessão")
     st.caption("MVP Multiusuário: dados isolados por tenant.")
     tenant_in = st.text_input("Empresa (tenant_id)", value=st.session_state.get("tenant_id", "demo"))
     user_in = st.text_input("Usuário (email ou id)", value=st.session_state.get("user_id", "anon"))
     if st.button("✅ Aplicar sessão"):
-        st.session_state["tenant_id"] = _normalize_tenant(tenant_in)
-        st.session_state["user_id"] = _normalize_user(user_in)
+        st.session_state["tenant_id"] = normalize_tenant(tenant_in)
+        st.session_state["user_id"] = normalize_user(user_in)
         st.success("Sessão aplicada.")
         st.rerun()
 
-TENANT_ID = _normalize_tenant(st.session_state.get("tenant_id", "demo"))
-USER_ID = _normalize_user(st.session_state.get("user_id", "anon"))
+TENANT_ID = normalize_tenant(st.session_state.get("tenant_id", "demo"))
+USER_ID = normalize_user(st.session_state.get("user_id", "anon"))
 
 # -----------------------------------------------------------------------------
-# STORAGE por tenant (isolamento)
+# STORAGE por tenant (isolamento) — tenant_root/DATA_DIR em quantix/engine.py
 # -----------------------------------------------------------------------------
-def tenant_root(tenant_id: str) -> Path:
-    p = DATA_DIR / "tenants" / tenant_id
-    p.mkdir(parents=True, exist_ok=True)
-    (p / "artefatos").mkdir(parents=True, exist_ok=True)
-    (p / "propriedades").mkdir(parents=True, exist_ok=True)
-    return p
-
 TENANT_ROOT = tenant_root(TENANT_ID)
 ARTIFACTS_DIR = TENANT_ROOT / "artefatos"
 PROPS_DIR = TENANT_ROOT / "propriedades"
+UPLOADS_DIR = TENANT_ROOT / "uploads"
 
 # -----------------------------------------------------------------------------
-# UTIL
+# DADOS DO TENANT (leituras para a UI; schema/pool em quantix/engine.py)
 # -----------------------------------------------------------------------------
-def now_iso() -> str:
-    return datetime.now().isoformat(timespec="seconds")
-
-def today_br() -> str:
-    return datetime.now().strftime("%d/%m/%Y")
-
-def safe_filename(s: str, max_len: int = 90) -> str:
-    s = (s or "").strip()
-    s = re.sub(r"[^a-zA-Z0-9._-]+", "_", s).strip("._-")
-    return s[:max_len] if s else "projeto"
-
-def file_sha256(data: bytes) -> str:
-    return hashlib.sha256(data).hexdigest()
-
-def decode_ifc_text(file_bytes: bytes) -> str:
-    try:
-        return file_bytes.decode("utf-8", errors="replace")
-    except Exception:
-        return file_bytes.decode("latin-1", errors="replace")
-
-def is_pdf(name: str) -> bool:
-    return name.lower().endswith(".pdf")
+DADOS_CACHE_MAX = 64
 
-def is_ifc(name: str) -> bool:
-    return name.lower().endswith(".ifc")
-
-def make_project_id() -> str:
-    return uuid.uuid4().hex
-
-def make_doc_id(project_id: str, file_hash: str) -> str:
-    return hashlib.sha1(f"{project_id}|{file_hash}".encode("utf-8")).hexdigest()[:8].upper()
-
-def pdf_safe_text(s: Any, max_len: int = 220) -> str:
-    t = "" if s is None else str(s)
-    t = t.replace("\r", " ").replace("\n", " ").replace("\t", " ")
-    t = t.replace("–", "-").replace("—", "-")
-    t = re.sub(r"\s+", " ", t).strip()
-
-    if len(t) > max_len:
-        t = t[: max_len - 3] + "..."
-
-    if len(t) > 80 and (" " not in t):
-        t = " ".join([t[i:i+32] for i in range(0, len(t), 32)])
-
-    return t
-
-def is_conflict_motive(motivo: str) -> bool:
-    m = (motivo or "").lower()
-    return any(x in m for x in ["clash", "interfer", "conflit", "colis", "colisão", "interferência", "interferencia"])
-
-# -----------------------------------------------------------------------------
-# DB (SQLite)
-# -----------------------------------------------------------------------------
-def db_conn() -> sqlite3.Connection:
-    con = sqlite3.connect(DB_PATH, check_same_thread=False)
-    con.row_factory = sqlite3.Row
-    return con
-
-def init_db() -> None:
-    with db_conn() as con:
-        con.execute("""
-        CREATE TABLE IF NOT EXISTS projects (
-            project_id TEXT PRIMARY KEY,
-            tenant_id TEXT NOT NULL,
-            user_id TEXT NOT NULL,
-            empreendimento TEXT NOT NULL,
-            disciplina TEXT NOT NULL,
-            created_at_iso TEXT NOT NULL,
-            created_at_br TEXT NOT NULL,
-            status TEXT NOT NULL,
-            engine_version TEXT NOT NULL,
-            doc_id TEXT NOT NULL,
-            file_hash TEXT NOT NULL,
-            original_name TEXT NOT NULL,
-            file_type TEXT NOT NULL,
-            file_size_bytes INTEGER NOT NULL,
-            total_original INTEGER NOT NULL,
-            total_otimizado INTEGER NOT NULL,
-            economia_itens INTEGER NOT NULL,
-            eficiencia_num REAL NOT NULL,
-            confianca_label TEXT NOT NULL,
-            confianca_score INTEGER NOT NULL
-        );
-        """)
-        con.execute("""
-        CREATE INDEX IF NOT EXISTS idx_projects_tenant_created
-        ON projects(tenant_id, created_at_iso DESC);
-        """)
-        con.execute("""
-        CREATE TABLE IF NOT EXISTS project_files (
-            project_id TEXT PRIMARY KEY,
-            tenant_id TEXT NOT NULL,
-            ifc_original_path TEXT,
-            ifc_otimizado_path TEXT,
-            evid_pdf_path TEXT,
-            relatorio_pdf_path TEXT,
-            recomendacoes_json_path TEXT,
-            props_json_path TEXT,
-            FOREIGN KEY(project_id) REFERENCES projects(project_id)
-        );
-        """)
-        con.commit()
-
-init_db()
-
-def upsert_project(row: dict, files: dict) -> None:
-    with db_conn() as con:
-        con.execute("""
-        INSERT INTO projects (
-            project_id, tenant_id, user_id, empreendimento, disciplina,
-            created_at_iso, created_at_br, status, engine_version, doc_id,
-            file_hash, original_name, file_type, file_size_bytes,
-            total_original, total_otimizado, economia_itens, eficiencia_num,
-            confianca_label, confianca_score
-        )
-        VALUES (
-            :project_id, :tenant_id, :user_id, :empreendimento, :disciplina,
-            :created_at_iso, :created_at_br, :status, :engine_version, :doc_id,
-            :file_hash, :original_name, :file_type, :file_size_bytes,
-            :total_original, :total_otimizado, :economia_itens, :eficiencia_num,
-            :confianca_label, :confianca_score
-        )
-        ON CONFLICT(project_id) DO UPDATE SET
-            status=excluded.status,
-            total_original=excluded.total_original,
-            total_otimizado=excluded.total_otimizado,
-            economia_itens=excluded.economia_itens,
-            eficiencia_num=excluded.eficiencia_num,
-            confianca_label=excluded.confianca_label,
-            confianca_score=excluded.confianca_score;
-        """, row)
-
-        con.execute("""
-        INSERT INTO project_files (
-            project_id, tenant_id,
-            ifc_original_path, ifc_otimizado_path, evid_pdf_path,
-            relatorio_pdf_path, recomendacoes_json_path, props_json_path
-        )
-        VALUES (
-            :project_id, :tenant_id,
-            :ifc_original_path, :ifc_otimizado_path, :evid_pdf_path,
-            :relatorio_pdf_path, :recomendacoes_json_path, :props_json_path
-        )
-        ON CONFLICT(project_id) DO UPDATE SET
-            ifc_original_path=excluded.ifc_original_path,
-            ifc_otimizado_path=excluded.ifc_otimizado_path,
-            evid_pdf_path=excluded.evid_pdf_path,
-            relatorio_pdf_path=excluded.relatorio_pdf_path,
-            recomendacoes_json_path=excluded.recomendacoes_json_path,
-            props_json_path=excluded.props_json_path;
-        """, files)
-        con.commit()
-
-def carregar_dados(tenant_id: str) -> pd.DataFrame:
-    with db_conn() as con:
+def dados_tenant(fn: Callable[..., Any], tenant_id: str, *args) -> Any:
+    """
+    Resultado de fn(tenant_id, *args) guardado no session_state, válido enquanto a versão do
+    tenant não mudar. Trate o retorno como somente leitura (é compartilhado entre reruns).
+    """
+    cache = st.session_state.setdefault("dados_cache", {})
+    versao = versao_tenant(tenant_id)
+    key = (fn.__name__, tenant_id, json.dumps(args, default=str, sort_keys=True))
+    hit = cache.get(key)
+    if hit is not None and hit[0] == versao:
+        return hit[1]
+    if len(cache) >= DADOS_CACHE_MAX:
+        cache.clear()
+    val = fn(tenant_id, *args)
+    cache[key] = (versao, val)
+    return val
+
+def carregar_dados(tenant_id: str) -> "pd.DataFrame":
+    import pandas as pd
+    with DB.read("carregar_dados") as con:
         rows = con.execute("""
             SELECT p.*, f.ifc_original_path, f.ifc_otimizado_path, f.evid_pdf_path,
                    f.relatorio_pdf_path, f.recomendacoes_json_path, f.props_json_path
@@ -306,852 +169,369 @@ def carregar_dados(tenant_id: str) -> pd.DataFrame:
         return pd.DataFrame()
     return pd.DataFrame([dict(r) for r in rows])
 
-def carregar_por_project(project_id: str, tenant_id: str) -> Optional[dict]:
-    with db_conn() as con:
-        r = con.execute("""
+def carregar_resumo(tenant_id: str) -> Optional[dict]:
+    with DB.read("carregar_resumo") as con:
+        r = con.execute("SELECT * FROM tenant_summary WHERE tenant_id=?", (tenant_id,)).fetchone()
+    if not r or not r["n_projetos"]:
+        return None
+    n = int(r["n_projetos"])
+    return {
+        "n_projetos": n,
+        "economia_itens": int(r["economia_itens"]),
+        "eficiencia_media": float(r["eficiencia_soma"]) / n,
+        "confianca_media": float(r["confianca_soma"]) / n,
+    }
+
+def carregar_resumo_empreendimentos(tenant_id: str) -> "pd.DataFrame":
+    import pandas as pd
+    with DB.read("carregar_resumo_empreendimentos") as con:
+        rows = con.execute("""
+            SELECT empreendimento, economia_itens, n_projetos FROM empreendimento_summary
+            WHERE tenant_id=? ORDER BY economia_itens DESC
+        """, (tenant_id,)).fetchall()
+    return pd.DataFrame([dict(r) for r in rows], columns=["empreendimento", "economia_itens", "n_projetos"])
+
+def carregar_recentes(tenant_id: str, limit: int = 15) -> "pd.DataFrame":
+    import pandas as pd
+    with DB.read("carregar_recentes") as con:
+        rows = con.execute("""
+            SELECT * FROM projects WHERE tenant_id=?
+            ORDER BY created_at_iso DESC LIMIT ?
+        """, (tenant_id, int(limit))).fetchall()
+    return pd.DataFrame([dict(r) for r in rows])
+
+# Listagem paginada (keyset em (created_at_iso DESC, project_id DESC) sobre idx_projects_tenant_created_id):
+# cada página é uma busca no índice a partir do cursor — custo independente do tamanho do histórico.
+PAGE_SIZE = int(os.environ.get("QUANTIX_PAGE_SIZE", "20") or 20)
+
+def listar_projetos(
+    tenant_id: str,
+    filtros: Optional[dict] = None,
+    cursor: Optional[Tuple[str, str]] = None,
+    limit: int = PAGE_SIZE,
+) -> Tuple[List[dict], Optional[Tuple[str, str]]]:
+    """
+    Uma página de projetos (com caminhos de artefatos), mais recentes primeiro.
+    filtros: empreendimento, disciplina, status, data_ini/data_fim (date), confianca_min.
+    cursor: (created_at_iso, project_id) do último item da página anterior.
+    Retorna (linhas, cursor da próxima página ou None).
+    """
+    f = filtros or {}
+    where = ["p.tenant_id = ?"]
+    args: List[Any] = [tenant_id]
+    if f.get("empreendimento"):
+        where.append("p.empreendimento = ?")
+        args.append(f["empreendimento"])
+    if f.get("disciplina"):
+        where.append("p.disciplina = ?")
+        args.append(f["disciplina"])
+    if f.get("status"):
+        where.append("p.status = ?")
+        args.append(f["status"])
+    if f.get("data_ini"):
+        where.append("p.created_at_iso >= ?")
+        args.append(f["data_ini"].isoformat())
+    if f.get("data_fim"):
+        where.append("p.created_at_iso < ?")
+        args.append((f["data_fim"] + timedelta(days=1)).isoformat())
+    if f.get("confianca_min"):
+        where.append("p.confianca_score >= ?")
+        args.append(int(f["confianca_min"]))
+    if cursor:
+        where.append("p.created_at_iso <= ? AND NOT (p.created_at_iso = ? AND p.project_id >= ?)")
+        args.extend([cursor[0], cursor[0], cursor[1]])
+    with DB.read("listar_projetos") as con:
+        rows = con.execute(f"""
             SELECT p.*, f.ifc_original_path, f.ifc_otimizado_path, f.evid_pdf_path,
                    f.relatorio_pdf_path, f.recomendacoes_json_path, f.props_json_path
             FROM projects p
             LEFT JOIN project_files f ON f.project_id = p.project_id
-            WHERE p.project_id = ? AND p.tenant_id = ?
-            LIMIT 1
-        """, (project_id, tenant_id)).fetchone()
-    return dict(r) if r else None
+            WHERE {" AND ".join(where)}
+            ORDER BY p.created_at_iso DESC, p.project_id DESC
+            LIMIT ?
+        """, (*args, int(limit) + 1)).fetchall()
+    out = [dict(r) for r in rows[:limit]]
+    nxt = (out[-1]["created_at_iso"], out[-1]["project_id"]) if len(rows) > limit else None
+    return out, nxt
+
+def listar_empreendimentos(tenant_id: str) -> List[str]:
+    with DB.read("listar_empreendimentos") as con:
+        rows = con.execute(
+            "SELECT empreendimento FROM empreendimento_summary WHERE tenant_id=? ORDER BY empreendimento", (tenant_id,)
+        ).fetchall()
+    return [r["empreendimento"] for r in rows]
 
 def excluir_projeto(project_id: str, tenant_id: str) -> None:
-    rec = carregar_por_project(project_id, tenant_id)
-    if not rec:
+    if not remover_projeto(project_id, tenant_id):
         st.error("Projeto não encontrado.")
         return
-
-    for k in ["ifc_original_path","ifc_otimizado_path","evid_pdf_path","relatorio_pdf_path","recomendacoes_json_path","props_json_path"]:
-        p = rec.get(k)
-        if p:
-            try:
-                pp = Path(str(p))
-                if pp.exists():
-                    pp.unlink()
-            except Exception:
-                pass
-
-    try:
-        proj_dir = ARTIFACTS_DIR / project_id
-        if proj_dir.exists():
-            try:
-                proj_dir.rmdir()
-            except Exception:
-                pass
-    except Exception:
-        pass
-
-    with db_conn() as con:
-        con.execute("DELETE FROM project_files WHERE project_id=? AND tenant_id=?", (project_id, tenant_id))
-        con.execute("DELETE FROM projects WHERE project_id=? AND tenant_id=?", (project_id, tenant_id))
-        con.commit()
     st.success("Projeto excluído.")
     st.rerun()
 
 # -----------------------------------------------------------------------------
-# PROPRIEDADES PROFISSIONAIS (tipadas)
-# -----------------------------------------------------------------------------
-PRO_FIELDS = {
-    "Eletrica": [
-        {"key":"tensao_sistema", "label":"Tensão do sistema", "type":"select",
-         "options":["127/220", "220/380", "220 monofásico", "127 monofásico"], "weight":0.10},
-        {"key":"padrao_entrada", "label":"Padrão de entrada", "type":"select",
-         "options":["Monofásico", "Bifásico", "Trifásico"], "weight":0.10},
-        {"key":"corrente_geral_a", "label":"Disjuntor geral (A)", "type":"number", "min":10.0, "max":1000.0, "weight":0.10, "step":5.0},
-        {"key":"demanda_kw", "label":"Demanda estimada (kW)", "type":"number", "min":0.5, "max":5000.0, "weight":0.12, "step":0.5},
-        {"key":"fator_demanda", "label":"Fator de demanda (0–1)", "type":"number", "min":0.1, "max":1.0, "weight":0.08, "step":0.05},
-        {"key":"criterio_balanceamento", "label":"Critério de balanceamento", "type":"text", "weight":0.12},
-        {"key":"circuitos_criticos", "label":"Circuitos críticos (ex.: chuveiro/ar)", "type":"text", "weight":0.08},
-        {"key":"padrao_cabos", "label":"Padrão de cabos (ex.: cobre 750V)", "type":"text", "weight":0.08},
-        {"key":"nrm_referencia", "label":"Norma/Referência (ex.: NBR 5410)", "type":"text", "weight":0.07},
-        {"key":"observacoes", "label":"Observações do projeto", "type":"text", "weight":0.15},
-    ],
-    "Hidraulica": [
-        {"key":"sistema", "label":"Sistema", "type":"select",
-         "options":["Água fria", "Água quente", "Água fria + quente", "Esgoto + ventilação"], "weight":0.10},
-        {"key":"pressao_mca", "label":"Pressão disponível (mca)", "type":"number", "min":1.0, "max":200.0, "weight":0.12, "step":1.0},
-        {"key":"altura_manometrica_m", "label":"Altura manométrica (m)", "type":"number", "min":0.0, "max":300.0, "weight":0.08, "step":1.0},
-        {"key":"vazao_lmin", "label":"Vazão de projeto (L/min)", "type":"number", "min":0.1, "max":5000.0, "weight":0.10, "step":1.0},
-        {"key":"reservatorio_l", "label":"Reservatório (L)", "type":"number", "min":0.0, "max":1e7, "weight":0.08, "step":100.0},
-        {"key":"material_tubos", "label":"Material de tubulação", "type":"select",
-         "options":["PVC", "PPR", "PEX", "Cobre", "Ferro galvanizado", "Outro"], "weight":0.10},
-        {"key":"criterio_perda_carga", "label":"Critério de perda de carga", "type":"select",
-         "options":["Darcy-Weisbach", "Hazen-Williams", "Tabela fabricante"], "weight":0.10},
-        {"key":"tipo_esgoto", "label":"Tipo de esgoto", "type":"select",
-         "options":["Primário", "Secundário", "Misto"], "weight":0.08},
-        {"key":"nrm_referencia", "label":"Norma/Referência (ex.: NBR 8160)", "type":"text", "weight":0.07},
-        {"key":"observacoes", "label":"Observações do projeto", "type":"text", "weight":0.17},
-    ],
-    "Estrutural": [
-        {"key":"sistema_estrutural", "label":"Sistema estrutural", "type":"select",
-         "options":["Concreto armado", "Metálica", "Mista", "Pré-moldado"], "weight":0.08},
-        {"key":"fck_mpa", "label":"fck (MPa)", "type":"number", "min":10.0, "max":100.0, "weight":0.12, "step":1.0},
-        {"key":"aco_classe", "label":"Classe do aço", "type":"select",
-         "options":["CA-50", "CA-60", "ASTM A572", "ASTM A36", "Outro"], "weight":0.08},
-        {"key":"cargas_kn", "label":"Cargas principais (kN) (resumo)", "type":"text", "weight":0.10},
-        {"key":"vento_categoria", "label":"Vento (categoria/região)", "type":"text", "weight":0.06},
-        {"key":"solo_spt", "label":"Solo / SPT (resumo)", "type":"text", "weight":0.12},
-        {"key":"cobrimento_mm", "label":"Cobrimento (mm)", "type":"number", "min":5.0, "max":100.0, "weight":0.08, "step":1.0},
-        {"key":"classe_agressividade", "label":"Classe de agressividade", "type":"select",
-         "options":["I", "II", "III", "IV"], "weight":0.06},
-        {"key":"criterio_flecha", "label":"Critério de flecha/serviço", "type":"text", "weight":0.08},
-        {"key":"nrm_referencia", "label":"Norma/Referência (ex.: NBR 6118/15575)", "type":"text", "weight":0.07},
-        {"key":"observacoes", "label":"Observações do projeto", "type":"text", "weight":0.15},
-    ],
-}
-
-def props_path(tenant_id: str, project_id: str, disciplina: str) -> Path:
-    return PROPS_DIR / f"PROPS_{safe_filename(disciplina)}_{project_id}.json"
-
-def load_props(tenant_id: str, project_id: str, disciplina: str) -> dict:
-    p = props_path(tenant_id, project_id, disciplina)
-    if p.exists():
-        try:
-            return json.loads(p.read_text(encoding="utf-8"))
-        except Exception:
-            return {}
-    return {}
-
-def save_props(tenant_id: str, project_id: str, disciplina: str, props: dict) -> None:
-    props_path(tenant_id, project_id, disciplina).write_text(
-        json.dumps(props, ensure_ascii=False, indent=2), encoding="utf-8"
-    )
-
-def props_score_weighted(props: dict, disciplina: str) -> float:
-    fields = PRO_FIELDS.get(disciplina, [])
-    if not fields:
-        return 0.0
-    got = 0.0
-    total = 0.0
-    for f in fields:
-        w = float(f.get("weight", 0.0))
-        total += w
-        v = props.get(f["key"])
-        if v is None or str(v).strip() == "":
-            continue
-        got += w
-    return got / total if total > 0 else 0.0
-
-# -----------------------------------------------------------------------------
-# EXTRAÇÃO + IDs + CHANGE LOG
+# FILA DE JOBS (pipeline em background; executar_job em quantix/engine.py)
 # -----------------------------------------------------------------------------
-def processar_mapa(conteudo: str, mapa: Dict[str, Dict[str, str]], seed: int) -> Dict[str, Dict[str, Any]]:
-    digest = hashlib.sha256(str(seed).encode("utf-8")).digest()
-
-    def det_uniform(a: float, b: float, i: int) -> float:
-        x = digest[i % len(digest)] / 255.0
-        return a + (b - a) * x
-
-    resultados: Dict[str, Dict[str, Any]] = {}
-    found = False
-    for idx, (classe, info) in enumerate(mapa.items()):
-        count = len(re.findall(rf"=\s*{re.escape(classe)}\s*\(", conteudo))
-        if count > 0:
-            found = True
-            fator = det_uniform(0.84, 0.96, idx)
-            qtd = int(count * fator)
-            resultados[classe] = {
-                "nome": info["nome"],
-                "antes": int(count),
-                "depois": int(qtd),
-                "defeito": info["defeito"],
-                "ciencia": info["ciencia"],
-            }
-    if not found:
-        resultados["GENERIC"] = {
-            "nome": "Elementos Gerais",
-            "antes": 100,
-            "depois": 95,
-            "defeito": "Modelo sem classes esperadas (ou IFC exportado incompleto)",
-            "ciencia": "Revisar export IFC e mapping por disciplina.",
-        }
-    return resultados
-
-def extrair_eletrica(file_bytes: bytes, seed: int) -> Dict[str, Any]:
-    txt = decode_ifc_text(file_bytes)
-    mapa = {
-        "IFCCABLESEGMENT": {"nome":"Cabos (segmentos)", "defeito":"Roteamento redundante", "ciencia":"Heurística de grafo + consolidação"},
-        "IFCFLOWTERMINAL": {"nome":"Pontos (tomadas/terminais)", "defeito":"Distribuição de circuitos", "ciencia":"Balanceamento por demanda"},
-        "IFCJUNCTIONBOX": {"nome":"Caixas de passagem", "defeito":"Excesso de nós", "ciencia":"Redução de pontos e melhoria de manutenção"},
-        "IFCFLOWSEGMENT": {"nome":"Eletrodutos", "defeito":"Conflitos em trajeto", "ciencia":"Compatibilização e redução de interferências"},
-        "IFCDISTRIBUTIONELEMENT": {"nome":"Quadros", "defeito":"Dimensionamento/organização", "ciencia":"Agrupamento e reserva técnica"},
-    }
-    return processar_mapa(txt, mapa, seed)
-
-def extrair_hidraulica(file_bytes: bytes, seed: int) -> Dict[str, Any]:
-    txt = decode_ifc_text(file_bytes)
-    mapa = {
-        "IFCPIPESEGMENT": {"nome":"Tubos (segmentos)", "defeito":"Trajeto longo/perda de carga", "ciencia":"Otimização de traçado"},
-        "IFCPIPEFITTING": {"nome":"Conexões", "defeito":"Perdas localizadas altas", "ciencia":"Redução de conexões"},
-        "IFCFLOWCONTROLLER": {"nome":"Registros/Válvulas", "defeito":"Acessibilidade", "ciencia":"Reposicionamento para manutenção"},
-        "IFCWASTETERMINAL": {"nome":"Pontos de esgoto", "defeito":"Ventilação insuficiente", "ciencia":"Revisão de ventilação/declividade"},
-        "IFCSANITARYTERMINAL": {"nome":"Aparelhos sanitários", "defeito":"Compatibilização hidráulica", "ciencia":"Checagem de alimentação e descarga"},
-    }
-    return processar_mapa(txt, mapa, seed)
+@st.cache_resource(show_spinner=False)
+def job_worker_pool() -> JobWorkerPool:
+    # uma instância por processo do servidor; sobrevive a reruns e a refresh do navegador
+    return JobWorkerPool(JOB_QUEUE, executar_job)
 
-def extrair_estrutural(file_bytes: bytes, seed: int) -> Dict[str, Any]:
-    txt = decode_ifc_text(file_bytes)
-    s = (len(txt) + seed) % 100
-    return {
-        "IFCFOOTING": {"nome":"Fundações", "antes": 40 + (s % 8), "depois": 40 + (s % 8),
-                      "defeito":"Checagem exige sondagem/cargas", "ciencia":"Validar SPT x cargas nodais (dados reais)."},
-        "IFCBEAM_COLUMN": {"nome":"Vigas/Pilares", "antes": 900 + s, "depois": 860 + s,
-                           "defeito":"Consumo potencialmente otimável", "ciencia":"Depende de seções/cargas."},
-        "IFC_CLASH": {"nome":"Clash estrutura x MEP/arquitetura", "antes": 15 + (s % 4), "depois": 0,
-                      "defeito":"Interferência geométrica", "ciencia":"Coordenação de modelos e ajustes."},
-        "IFCSLAB": {"nome":"Lajes", "antes": 30, "depois": 30,
-                    "defeito":"Acústica depende de parâmetros", "ciencia":"Necessário especificar camadas/massa."},
-    }
-
-@st.cache_data(show_spinner=False)
-def analisar_ifc(disciplina: str, file_bytes: bytes, file_hash: str) -> Dict[str, Any]:
-    seed = int(file_hash[:8], 16)
-    if disciplina == "Eletrica":
-        return extrair_eletrica(file_bytes, seed)
-    if disciplina == "Hidraulica":
-        return extrair_hidraulica(file_bytes, seed)
-    return extrair_estrutural(file_bytes, seed)
-
-def parse_ifc_entity_ids(ifc_text: str) -> Dict[str, List[str]]:
-    out: Dict[str, List[str]] = {}
-    for m in re.finditer(r"(#\d+)\s*=\s*([A-Z0-9_]+)\s*\(", ifc_text):
-        eid, cls = m.group(1), m.group(2)
-        out.setdefault(cls, []).append(eid)
-    return out
-
-def build_change_log(dados_ifc: dict, ids_map: Dict[str, List[str]]) -> List[Dict[str, Any]]:
-    changes: List[Dict[str, Any]] = []
-    for cls, info in (dados_ifc or {}).items():
-        antes = int(info.get("antes", 0))
-        depois = int(info.get("depois", 0))
-        delta = max(0, antes - depois)
-        if delta <= 0:
-            continue
-        ids = ids_map.get(cls, [])
-        pick = ids[: min(delta, len(ids))]
-        for eid in pick:
-            motivo = str(info.get("defeito", ""))
-            changes.append({
-                "ifc_id": eid,
-                "classe": cls,
-                "produto": info.get("nome", cls),
-                "acao": "OTIMIZAÇÃO APLICADA (Pset QUANTIX)",
-                "motivo": motivo,
-                "referencia": info.get("ciencia", ""),
-                "tag_visual": "RED" if is_conflict_motive(motivo) else "ORANGE",
-            })
-    return changes
-
-def calcular_metricas(dados_ifc: Dict[str, Any]) -> Tuple[int,int,int,float]:
-    t_antes = sum(int(d.get("antes",0)) for d in (dados_ifc or {}).values())
-    t_depois = sum(int(d.get("depois",0)) for d in (dados_ifc or {}).values())
-    econ = t_antes - t_depois
-    eff = (econ / t_antes) if t_antes > 0 else 0.0
-    return t_antes, t_depois, econ, float(max(0.0, min(1.0, eff)))
-
-# -----------------------------------------------------------------------------
-# CONFIANÇA 0–100 (ATINGÍVEL)
-# -----------------------------------------------------------------------------
-def confidence_0_100(
-    dados_ifc: dict,
-    props: dict,
-    disciplina: str,
-    has_ids: bool,
-    optimization_applied: bool
-) -> Tuple[int, str, Dict[str,int]]:
-    if not dados_ifc:
-        ifc_pts = 5
-    elif "GENERIC" in dados_ifc and len(dados_ifc) == 1:
-        ifc_pts = 15
-    else:
-        n = len(dados_ifc)
-        ifc_pts = min(40, 20 + n * 5)
-
-    pc = props_score_weighted(props, disciplina)
-    props_pts = int(round(pc * 40))
-
-    ids_pts = 10 if has_ids else 0
-    opt_pts = 10 if optimization_applied else 0
-
-    total = max(0, min(100, ifc_pts + props_pts + ids_pts + opt_pts))
-    label = "Alta" if total >= 80 else ("Média" if total >= 50 else "Baixa")
-    breakdown = {"IFC": ifc_pts, "Props": props_pts, "IDs": ids_pts, "Otim": opt_pts}
-    return total, label, breakdown
+job_worker_pool()  # inicia os workers no 1º script run do processo (drena jobs pendentes de antes do restart)
 
 # -----------------------------------------------------------------------------
-# IFC OTIMIZADO (ifcopenshell) + GROUP + STYLE MAP
+# UI (Topo)
 # -----------------------------------------------------------------------------
-def try_import_ifcopenshell():
-    try:
-        import ifcopenshell  # type: ignore
-        import ifcopenshell.api  # type: ignore
-        return ifcopenshell
-    except Exception:
-        return None
-
-def _get_or_create_pset(ifcopenshell, model, ent, pset_name: str):
-    # Dedup de Pset: se já existir, retorna o existente; senão cria.
-    try:
-        psets = getattr(ent, "IsDefinedBy", None)
-        if psets:
-            for rel in psets:
-                try:
-                    propdef = getattr(rel, "RelatingPropertyDefinition", None)
-                    if propdef and getattr(propdef, "Name", None) == pset_name:
-                        return propdef
-                except Exception:
-                    continue
-    except Exception:
-        pass
-
-    import ifcopenshell.api  # type: ignore
-    return ifcopenshell.api.run("pset.add_pset", model, product=ent, name=pset_name)
-
-def _ensure_quantix_styles(ifcopenshell, model):
-    """
-    Cria estilos (laranja/vermelho) usando ifcopenshell.api, se disponível.
-    Retorna dict com {"ORANGE": style_obj, "RED": style_obj} (pode falhar e retornar {}).
-    """
-    styles = {}
-    try:
-        import ifcopenshell.api  # type: ignore
-
-        # ORANGE
-        style_orange = ifcopenshell.api.run("style.add_style", model, name="Quantix_Optimized_Orange")
-        try:
-            ifcopenshell.api.run(
-                "style.add_surface_style",
-                model,
-                style=style_orange,
-                ifc_class="IfcSurfaceStyleShading",
-                attributes={"SurfaceColour": {"Red": 1.0, "Green": 0.62, "Blue": 0.0}}
-            )
-        except Exception:
-            # alguns builds usam Rendering em vez de Shading
-            ifcopenshell.api.run(
-                "style.add_surface_style",
-                model,
-                style=style_orange,
-                ifc_class="IfcSurfaceStyleRendering",
-                attributes={"SurfaceColour": {"Red": 1.0, "Green": 0.62, "Blue": 0.0}}
-            )
-
-        # RED
-        style_red = ifcopenshell.api.run("style.add_style", model, name="Quantix_Optimized_Red")
-        try:
-            ifcopenshell.api.run(
-                "style.add_surface_style",
-                model,
-                style=style_red,
-                ifc_class="IfcSurfaceStyleShading",
-                attributes={"SurfaceColour": {"Red": 1.0, "Green": 0.15, "Blue": 0.15}}
-            )
-        except Exception:
-            ifcopenshell.api.run(
-                "style.add_surface_style",
-                model,
-                style=style_red,
-                ifc_class="IfcSurfaceStyleRendering",
-                attributes={"SurfaceColour": {"Red": 1.0, "Green": 0.15, "Blue": 0.15}}
-            )
-
-        styles["ORANGE"] = style_orange
-        styles["RED"] = style_red
-    except Exception:
-        return {}
-    return styles
-
-def _assign_style_to_product(ifcopenshell, model, product, style_obj) -> bool:
-    try:
-        import ifcopenshell.api  # type: ignore
-        ifcopenshell.api.run("style.assign_style", model, product=product, style=style_obj)
-        return True
-    except Exception:
-        return False
-
-def apply_optimizations_ifc(
-    ifc_in_path: Path,
-    ifc_out_path: Path,
-    disciplina: str,
-    change_log: List[Dict[str, Any]],
-    empreendimento: str,
-    props: dict,
-    tenant_id: str,
-    project_id: str
-) -> Tuple[bool, str]:
-    ifcopenshell = try_import_ifcopenshell()
-    if ifcopenshell is None:
-        return False, "ifcopenshell não instalado no servidor (pip install ifcopenshell)."
-
-    try:
-        model = ifcopenshell.open(str(ifc_in_path))
-        import ifcopenshell.api  # type: ignore
-
-        # carimbo no projeto
-        try:
-            proj = model.by_type("IfcProject")[0]
-            stamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            proj.Description = (proj.Description or "") + f" | QUANTIX OTIMIZADO {stamp} | {tenant_id}/{project_id}"
-        except Exception:
-            pass
-
-        compact = "; ".join([f"{k}={v}" for k, v in props.items() if str(v).strip()][:12])[:250]
-
-        optimized_elements: List[Any] = []
-        optimized_ids: set = set()
-
-        # prepara estilos (pode falhar e ficar vazio)
-        styles = _ensure_quantix_styles(ifcopenshell, model)
-
-        for ch in change_log:
-            try:
-                eid_num = int(str(ch["ifc_id"]).replace("#", ""))
-                ent = model.by_id(eid_num)
-                if not ent:
-                    continue
-
-                # evita duplicar
-                if eid_num in optimized_ids:
-                    continue
-                optimized_ids.add(eid_num)
-                optimized_elements.append(ent)
-
-                # PSET
-                pset = _get_or_create_pset(ifcopenshell, model, ent, "Pset_QuantixOptimization")
-
-                tag_visual = str(ch.get("tag_visual", "ORANGE")).upper()
-                if tag_visual not in ("ORANGE", "RED"):
-                    tag_visual = "ORANGE"
-
-                ifcopenshell.api.run("pset.edit_pset", model, pset=pset, properties={
-                    "TenantId": tenant_id,
-                    "ProjectId": project_id,
-                    "QuantixProject": empreendimento,
-                    "Disciplina": disciplina,
-                    "IFC_ID": str(ch.get("ifc_id","")),
-                    "Produto": str(ch.get("produto","")),
-                    "Acao": str(ch.get("acao","")),
-                    "Motivo": str(ch.get("motivo","")),
-                    "Referencia": str(ch.get("referencia","")),
-                    "ContextoCliente": compact,
-                    "EngineVersion": ENGINE_VERSION,
-                    "QuantixOptimized": "TRUE",
-                    "QuantixVisualTag": tag_visual,
-                    "Timestamp": now_iso(),
-                })
-
-                # Description-tag (busca textual)
-                try:
-                    ent.Description = (ent.Description or "") + f" | QUANTIX:{ch['ifc_id']}:{project_id}:{tag_visual}"
-                except Exception:
-                    pass
-
-                # STYLE MAP (se styles existir e o viewer suportar)
-                if styles and tag_visual in styles:
-                    _assign_style_to_product(ifcopenshell, model, ent, styles[tag_visual])
+h1, h2 = st.columns([8,2])
+with h1:
+    st.markdown("# <span style='color:#00E5FF'>QUANTI</span><span style='color:#FF9F00'>X</span>", unsafe_allow_html=True)
+with h2:
+    st.markdown(f'<div class="user-badge">🏢 {TENANT_ID} • 👤 {USER_ID}</div>', unsafe_allow_html=True)
+st.markdown("---")
 
-            except Exception:
-                continue
+JOB_STAGE_LABEL = {
+    "": "Na fila", "upload": "Upload", "indice": "Índice", "analise": "Análise", "ifc": "IFC OTIMIZADO",
+    "json": "JSON", "pdf": "PDF", "db": "Banco", "fim": "Concluído",
+}
 
-        # 1) UPGRADE: Grupo com todos otimizados
-        try:
-            if optimized_elements:
-                group = model.create_entity(
-                    "IfcGroup",
-                    GlobalId=ifcopenshell.guid.new(),
-                    Name="Quantix_Optimized_Elements",
-                    Description=f"Elementos otimizados automaticamente pelo Quantix Engine | {tenant_id}/{project_id}"
-                )
-                model.create_entity(
-                    "IfcRelAssignsToGroup",
-                    GlobalId=ifcopenshell.guid.new(),
-                    RelatedObjects=optimized_elements,
-                    RelatingGroup=group
-                )
-        except Exception:
-            pass
+LOTES_VISIVEIS = 3
 
-        model.write(str(ifc_out_path))
+def _render_lote(tenant_id: str, batch_id: str) -> None:
+    jobs = JOB_QUEUE.list_batch(batch_id, tenant_id)
+    if not jobs:
+        return
+    r = batch_summary(jobs)
+    p0 = jobs[0]["payload"]
+    paralelo = f" • soma por arquivo {r['soma_s']:.0f}s ({r['soma_s'] / r['wall_s']:.1f}x)" if r["wall_s"] > 0 and not r["ativos"] else ""
+    st.markdown(
+        f"**📦 Lote {p0.get('empreendimento','-')} ({p0.get('disciplina','-')})** — "
+        f"{r['concluidos']}/{r['n']} concluído(s), {r['erros']} erro(s), {r['ativos']} em andamento • "
+        f"tempo total {r['wall_s']:.0f}s{paralelo}"
+    )
+    linhas = []
+    for j in jobs:
+        res = j.get("result") or {}
+        status = res.get("status") or j["status"]
+        linhas.append({
+            "arquivo": j["payload"].get("upload", {}).get("name", "-"),
+            "status": status,
+            "etapa": JOB_STAGE_LABEL.get(j["stage"], j["stage"]),
+            "progresso": float(j["progress"]),
+            "tempo (s)": res.get("elapsed_s"),
+            "mensagem": "; ".join(res.get("warnings") or []) or j["message"],
+        })
+    st.dataframe(
+        linhas, hide_index=True, use_container_width=True,
+        column_config={"progresso": st.column_config.ProgressColumn("progresso", min_value=0.0, max_value=1.0)},
+    )
 
-        if styles:
-            return True, "IFC OTIMIZADO gerado: Pset + Grupo (Quantix_Optimized_Elements) + Mapa visual (laranja/vermelho)."
-        return True, "IFC OTIMIZADO gerado: Pset + Grupo (Quantix_Optimized_Elements). (Mapa visual não aplicado neste ambiente.)"
+def _render_jobs(tenant_id: str) -> None:
+    jobs = JOB_QUEUE.list_for_tenant(tenant_id, limit=10)
+    ativos = set(JOB_QUEUE.active_ids(tenant_id))
+    vistos = st.session_state.get("jobs_ativos", set())
+    st.session_state["jobs_ativos"] = ativos
+    terminados = vistos - ativos
+    if terminados:
+        # algum job desta sessão terminou: rerun completo para atualizar Dashboard/Portfólio/DOCS
+        st.session_state["jobs_terminados"] = st.session_state.get("jobs_terminados", set()) | terminados
+        st.rerun()
 
-    except Exception as e:
-        return False, f"Falha ao escrever IFC: {e}"
+    flash = st.session_state.pop("jobs_flash", None)
+    if flash:
+        st.success(flash)
+    for batch_id in st.session_state.get("lotes", [])[-LOTES_VISIVEIS:][::-1]:
+        _render_lote(tenant_id, batch_id)
+    for j in jobs:
+        if j.get("batch_id") or j["job_id"] not in st.session_state.get("jobs_terminados", set()):
+            continue
+        nome = f"{j['payload'].get('empreendimento','-')} ({j['payload'].get('disciplina','-')})"
+        res = j.get("result") or {}
+        if j["status"] == "error":
+            st.error(f"{nome}: falha no processamento — {j['message']}")
+        elif res.get("status") == "done_with_warning":
+            st.warning(f"{nome}: {'; '.join(res.get('warnings') or [j['message']])}")
+        else:
+            st.success(f"{nome}: {j['message']} Veja em DOCS para baixar IFC OTIMIZADO, JSON técnico e relatório PDF.")
+    st.session_state["jobs_terminados"] = set()
+    avulsos = [j for j in jobs if j["job_id"] in ativos and not j.get("batch_id")]
+    if not avulsos:
+        return
+    st.markdown(f"**⏳ Processamentos em andamento ({len(avulsos)})**")
+    for j in avulsos:
+        p = j["payload"]
+        etapa = JOB_STAGE_LABEL.get(j["stage"], j["stage"])
+        st.progress(
+            float(j["progress"]),
+            text=f"{p.get('empreendimento','-')} • {p.get('disciplina','-')} • {p.get('upload',{}).get('name','-')} — {etapa}: {j['message']}",
+        )
 
-# -----------------------------------------------------------------------------
-# PDF
-# -----------------------------------------------------------------------------
-class PDFReport(FPDF):
-    def __init__(self, doc_id: str, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self._doc_id = doc_id
-
-    def header(self):
-        self.set_font("Arial", "B", 12)
-        self.cell(0, 10, "QUANTIX | RELATORIO PROFISSIONAL", 0, 1, "C")
-        self.set_draw_color(0, 229, 255)
-        self.line(10, 20, 200, 20)
-        self.ln(12)
-
-    def footer(self):
-        self.set_y(-15)
-        self.set_font("Arial", "I", 8)
-        self.set_text_color(128)
-        self.cell(0, 10, f"Pagina {self.page_no()} | Doc ID: {self._doc_id}", 0, 0, "C")
-
-def gerar_pdf(
-    empreendimento: str,
-    disciplina: str,
-    original_name: str,
-    file_hash: str,
-    props: dict,
-    dados_ifc: dict,
-    change_log: list,
-    metrics: Tuple[int,int,int,float],
-    conf: Tuple[int,str,Dict[str,int]],
-    evid_path: Optional[Path],
-    out_dir: Path,
-    doc_id: str,
-    tenant_id: str,
-    project_id: str,
-) -> Path:
-    t_antes, t_depois, econ, eff = metrics
-    conf_score, conf_label, breakdown = conf
-
-    pdf = PDFReport(doc_id=doc_id)
-    pdf.add_page()
-    pdf.set_auto_page_break(auto=True, margin=15)
-
-    pdf.set_font("Arial", "B", 16)
-    pdf.cell(0, 10, pdf_safe_text(f"PROJETO: {empreendimento.upper()}", 120), ln=True)
-    pdf.set_font("Arial", "I", 11)
-    pdf.cell(0, 8, pdf_safe_text(f"Disciplina: {disciplina} | Confiança: {conf_label} ({conf_score}/100)", 120), ln=True)
-    pdf.ln(2)
-
-    pdf.set_font("Arial", "", 9)
-    pdf.set_fill_color(245,245,245)
-    pdf.cell(0, 8, pdf_safe_text(f"Data: {today_br()} | Arquivo: {original_name} | Hash: {file_hash[:12]}..."), 1, 1, "L", fill=True)
-    pdf.cell(0, 8, pdf_safe_text(f"Tenant/Project: {tenant_id}/{project_id} | Engine: {ENGINE_VERSION}", 140), 1, 1, "L", fill=True)
-    if evid_path:
-        pdf.cell(0, 8, pdf_safe_text(f"Evidência: {evid_path.name}", 140), 1, 1, "L", fill=True)
-    pdf.ln(4)
-
-    pdf.set_font("Arial", "B", 12)
-    pdf.cell(0, 8, "1) Contexto informado (propriedades)", ln=True)
-    pdf.set_font("Arial", "", 9)
-
-    if props:
-        for k, v in list(props.items())[:18]:
-            if str(v).strip():
-                pdf.set_x(pdf.l_margin)
-                pdf.multi_cell(0, 5, f"- {pdf_safe_text(k, 60)}: {pdf_safe_text(v, 220)}")
-    else:
-        pdf.set_x(pdf.l_margin)
-        pdf.multi_cell(0, 5, "Não informado.")
-    pdf.ln(2)
-
-    pdf.set_font("Arial", "B", 12)
-    pdf.cell(0, 8, "2) Indicadores", ln=True)
-    pdf.set_font("Arial", "", 10)
-    pdf.set_x(pdf.l_margin)
-    pdf.multi_cell(0, 6, pdf_safe_text(
-        f"Total original: {t_antes} | Total otimizado: {t_depois} | Economia: {econ} | Eficiência: {eff*100:.1f}%", 220
-    ))
-    pdf.set_font("Arial", "", 9)
-    pdf.set_x(pdf.l_margin)
-    pdf.multi_cell(0, 5, pdf_safe_text(
-        f"Breakdown confiança: IFC={breakdown['IFC']} | Props={breakdown['Props']} | IDs={breakdown['IDs']} | Otim={breakdown['Otim']}", 220
-    ))
-
-    pdf.ln(2)
-    pdf.set_font("Arial", "B", 12)
-    pdf.cell(0, 8, "3) Diagnóstico resumido", ln=True)
-
-    pdf.set_font("Arial", "B", 8)
-    pdf.set_fill_color(230)
-    pdf.cell(88, 7, "Elemento", 1, 0, "L", 1)
-    pdf.cell(20, 7, "Antes", 1, 0, "C", 1)
-    pdf.cell(20, 7, "Depois", 1, 0, "C", 1)
-    pdf.cell(62, 7, "Motivo", 1, 1, "L", 1)
-
-    pdf.set_font("Arial", "", 8)
-    for _k, info in (dados_ifc or {}).items():
-        pdf.cell(88, 7, pdf_safe_text(info.get("nome","N/A"), 45), 1)
-        pdf.cell(20, 7, str(info.get("antes",0)), 1, 0, "C")
-        pdf.cell(20, 7, str(info.get("depois",0)), 1, 0, "C")
-        pdf.cell(62, 7, pdf_safe_text(info.get("defeito",""), 34), 1, 1, "L")
-
-    pdf.ln(4)
-    pdf.set_font("Arial", "B", 12)
-    pdf.cell(0, 8, "4) Registro de mudanças aplicadas no IFC (por #id)", ln=True)
-    pdf.set_font("Arial", "", 9)
-    pdf.set_x(pdf.l_margin)
-    pdf.multi_cell(0, 5, "Itens marcados no IFC OTIMIZADO via PropertySet e agrupados em 'Quantix_Optimized_Elements'.")
-
-    pdf.set_font("Arial", "B", 8)
-    pdf.set_fill_color(230)
-    pdf.cell(16, 7, "IFC", 1, 0, "C", 1)
-    pdf.cell(50, 7, "Produto", 1, 0, "L", 1)
-    pdf.cell(40, 7, "Ação", 1, 0, "L", 1)
-    pdf.cell(84, 7, "Motivo (tag)", 1, 1, "L", 1)
-
-    pdf.set_font("Arial", "", 8)
-    if change_log:
-        for ch in change_log[:45]:
-            pdf.cell(16, 7, pdf_safe_text(ch.get("ifc_id",""), 8), 1)
-            pdf.cell(50, 7, pdf_safe_text(ch.get("produto",""), 28), 1)
-            pdf.cell(40, 7, pdf_safe_text(ch.get("acao",""), 22), 1)
-            motivo_tag = f"{pdf_safe_text(ch.get('motivo',''), 40)} [{ch.get('tag_visual','ORANGE')}]"
-            pdf.cell(84, 7, pdf_safe_text(motivo_tag, 46), 1, 1)
-    else:
-        pdf.cell(0, 7, "Sem mudanças aplicadas (sem IDs encontrados ou sem economia).", 1, 1)
-
-    pdf.ln(6)
-    pdf.set_font("Arial", "I", 9)
-    pdf.set_x(pdf.l_margin)
-    pdf.multi_cell(0, 5,
-        "Obs.: Nesta versão, a otimização altera o IFC com metadados rastreáveis (Pset/Description), "
-        "e cria um grupo com os elementos otimizados. O mapa visual tenta aplicar estilos (laranja/vermelho) "
-        "para facilitar revisão em viewers."
-    )
+def painel_jobs(tenant_id: str) -> None:
+    # polling só enquanto houver job ativo (fragment reexecuta sozinho a cada 2s)
+    ativo = bool(JOB_QUEUE.active_ids(tenant_id))
+    st.fragment(run_every=2 if ativo else None)(_render_jobs)(tenant_id)
 
-    out = out_dir / f"RELATORIO_{safe_filename(disciplina)}_{safe_filename(empreendimento)}_{file_hash[:8]}_{project_id[:8]}.pdf"
-    pdf.output(str(out))
-    return out
+painel_jobs(TENANT_ID)
 
 # -----------------------------------------------------------------------------
-# JSON
+# LISTAGENS PAGINADAS (Portfólio / DOCS)
 # -----------------------------------------------------------------------------
-def gerar_json(
-    empreendimento: str,
-    disciplina: str,
-    file_meta: dict,
-    props: dict,
-    dados_ifc: dict,
-    change_log: list,
-    metrics: tuple,
-    conf: tuple,
-    tenant_id: str,
-    user_id: str,
-    project_id: str,
-    doc_id: str,
-) -> dict:
-    t_antes, t_depois, econ, eff = metrics
-    conf_score, conf_label, breakdown = conf
-
-    recs = []
-    for cls, info in (dados_ifc or {}).items():
-        a = int(info.get("antes",0))
-        d = int(info.get("depois",0))
-        recs.append({
-            "classe": cls,
-            "produto": info.get("nome",cls),
-            "antes": a,
-            "depois": d,
-            "economia": a-d,
-            "motivo": info.get("defeito",""),
-            "referencia": info.get("ciencia",""),
-        })
-    recs.sort(key=lambda x: x["economia"], reverse=True)
+STATUS_OPCOES = ["done", "done_with_warning", "processing", "error"]
 
+def filtros_listagem(key: str) -> dict:
+    c1, c2, c3, c4 = st.columns([2, 2, 3, 2])
+    disc = c1.selectbox("Disciplina", ["Todas", "Eletrica", "Hidraulica", "Estrutural"], key=f"{key}_f_disc")
+    status = c2.selectbox("Status", ["Todos"] + STATUS_OPCOES, key=f"{key}_f_status")
+    datas = c3.date_input("Período", value=(), key=f"{key}_f_datas")
+    conf_min = c4.number_input("Confiança mín.", min_value=0, max_value=100, value=0, step=5, key=f"{key}_f_conf")
+    datas = tuple(datas) if isinstance(datas, (list, tuple)) else (datas,)
     return {
-        "produto": "QUANTIX Professional",
-        "engine_version": ENGINE_VERSION,
-        "tenant_id": tenant_id,
-        "user_id": user_id,
-        "project_id": project_id,
-        "doc_id": doc_id,
-        "empreendimento": empreendimento,
-        "disciplina": disciplina,
-        "data_iso": now_iso(),
-        "arquivo": file_meta,
-        "propriedades_cliente": props,
-        "indicadores": {
-            "total_original": t_antes,
-            "total_otimizado": t_depois,
-            "economia_itens": econ,
-            "eficiencia_pct": round(eff*100,2),
-        },
-        "confianca": {
-            "score": conf_score,
-            "nivel": conf_label,
-            "breakdown": breakdown,
-        },
-        "recomendacoes_resumo": recs[:250],
-        "registro_mudancas_aplicadas": change_log[:800],
-        "visual_map": {
-            "group_name": "Quantix_Optimized_Elements",
-            "tags": {
-                "ORANGE": "Otimizado (geral)",
-                "RED": "Conflito/Interferência (prioridade)",
-            }
-        }
-    }
-
-# -----------------------------------------------------------------------------
-# PIPELINE SALVAR
-# -----------------------------------------------------------------------------
-def salvar_projeto(tenant_id: str, user_id: str, empreendimento: str, disciplina: str, uploaded_file, props: dict) -> None:
-    file_bytes = uploaded_file.getvalue()
-    original_name = uploaded_file.name
-    file_hash = file_sha256(file_bytes)
-    project_id = make_project_id()
-    doc_id = make_doc_id(project_id, file_hash)
-
-    proj_dir = ARTIFACTS_DIR / project_id
-    proj_dir.mkdir(parents=True, exist_ok=True)
-
-    evid_path: Optional[Path] = None
-    ifc_original_path: Optional[Path] = None
-    ifc_otimizado_path: Optional[Path] = None
-
-    dados_ifc: dict = {}
-    change_log: list = []
-    has_ids = False
-    optimization_applied = False
-    status = "processing"
-
-    ppath = props_path(tenant_id, project_id, disciplina)
-    save_props(tenant_id, project_id, disciplina, props)
-
-    if is_pdf(original_name):
-        evid_path = proj_dir / f"EVIDENCIA_{safe_filename(disciplina)}_{safe_filename(original_name)}_{file_hash[:8]}.pdf"
-        evid_path.write_bytes(file_bytes)
-        status = "done"  # sem IFC
-    else:
-        ifc_original_path = proj_dir / f"ORIGINAL_{safe_filename(disciplina)}_{safe_filename(original_name)}_{file_hash[:8]}.ifc"
-        ifc_original_path.write_bytes(file_bytes)
-
-        with st.spinner(f"Processando IFC ({disciplina})..."):
-            time.sleep(0.1)
-            dados_ifc = analisar_ifc(disciplina, file_bytes, file_hash)
-
-        ifc_text = decode_ifc_text(file_bytes)
-        ids_map = parse_ifc_entity_ids(ifc_text)
-        has_ids = any(len(v) > 0 for v in ids_map.values())
-        change_log = build_change_log(dados_ifc, ids_map)
-
-        ifc_otimizado_path = proj_dir / f"OTIMIZADO_{safe_filename(disciplina)}_{safe_filename(original_name)}_{file_hash[:8]}.ifc"
-        ok, msg = apply_optimizations_ifc(
-            ifc_original_path, ifc_otimizado_path,
-            disciplina, change_log, empreendimento, props,
-            tenant_id=tenant_id, project_id=project_id
-        )
-        if ok:
-            optimization_applied = True
-            st.success(msg)
-            status = "done"
-        else:
-            st.warning(msg)
-            ifc_otimizado_path = ifc_original_path
-            status = "done_with_warning"
-
-    metrics = calcular_metricas(dados_ifc)
-    conf = confidence_0_100(dados_ifc, props, disciplina, has_ids=has_ids, optimization_applied=optimization_applied)
-
-    file_meta = {
-        "nome_original": original_name,
-        "hash_sha256": file_hash,
-        "tipo": "PDF" if is_pdf(original_name) else "IFC",
-        "tamanho_bytes": len(file_bytes),
+        "disciplina": None if disc == "Todas" else disc,
+        "status": None if status == "Todos" else status,
+        "data_ini": datas[0] if len(datas) > 0 else None,
+        "data_fim": datas[1] if len(datas) > 1 else (datas[0] if datas else None),
+        "confianca_min": int(conf_min),
     }
 
-    obj = gerar_json(
-        empreendimento, disciplina, file_meta, props, dados_ifc, change_log, metrics, conf,
-        tenant_id=tenant_id, user_id=user_id, project_id=project_id, doc_id=doc_id
+def _pag_ir(key: str, cursor: Optional[Tuple[str, str]], delta: int) -> None:
+    pag = st.session_state[key]
+    if delta > 0:
+        if cursor is None:
+            return
+        pag["cursores"] = pag["cursores"][: pag["i"] + 1] + [cursor]
+    pag["i"] = max(0, pag["i"] + delta)
+
+def pagina_projetos(key: str, tenant_id: str, filtros: dict) -> List[dict]:
+    """Carrega só a página atual; cursores das páginas visitadas ficam no session_state."""
+    pkey = f"pag_{key}_{tenant_id}"
+    sig = json.dumps(filtros, default=str, sort_keys=True)
+    pag = st.session_state.get(pkey)
+    if pag is None or pag["sig"] != sig:
+        pag = st.session_state[pkey] = {"sig": sig, "cursores": [None], "i": 0}
+    rows, nxt = dados_tenant(listar_projetos, tenant_id, filtros, pag["cursores"][pag["i"]])
+
+    c1, c2, c3 = st.columns([1, 2, 1])
+    c1.button("◀ Anterior", key=f"{key}_prev", disabled=pag["i"] == 0, on_click=_pag_ir, args=(pkey, None, -1))
+    c2.caption(f"Página {pag['i'] + 1} • {len(rows)} projeto(s) nesta página")
+    c3.button("Próxima ▶", key=f"{key}_next", disabled=nxt is None, on_click=_pag_ir, args=(pkey, nxt, 1))
+    return rows
+
+# Downloads sob demanda: o botão só registra um callable; o arquivo é lido do disco quando o usuário
+# clica, em vez de a cada rerun para todos os artefatos da página.
+# Sem streaming em blocos: o Streamlit converte o retorno do callable em bytes e o guarda inteiro no
+# MemoryMediaFileStorage antes de servir, e o /app/static (enableStaticServing) não tem autenticação,
+# limita a 200 MB e serve .ifc/.gz como text/plain — não serve para artefatos de tenant. Por isso uma
+# leitura única (read_bytes): bytes passam sem cópia pelo media manager, então há um só buffer por clique.
+# IFCs .ifc.gz são servidos como estão (comprimidos): menos bytes no download, sem descomprimir no servidor.
+DOWNLOAD_MIME = {".pdf": "application/pdf", ".json": "application/json", ".ifc": "application/x-step", ".gz": "application/gzip"}
+
+def ler_artefato(path: Path) -> Callable[[], bytes]:
+    return lambda: Path(path).read_bytes()
+
+def nome_download(rec: Dict[str, Any], path: Optional[str]) -> Optional[str]:
+    """Blobs são nomeados pelo hash; no download voltam ao nome legível ORIGINAL_/EVIDENCIA_."""
+    if not path or not BLOBS.contains(path):
+        return None
+    pp = Path(str(path))
+    prefixo = "EVIDENCIA" if pp.suffix.lower() == ".pdf" else "ORIGINAL"
+    return (
+        f"{prefixo}_{safe_filename(str(rec.get('disciplina', '')))}_"
+        f"{safe_filename(str(rec.get('original_name', '')))}_{str(rec.get('file_hash', ''))[:8]}{''.join(pp.suffixes).lower()}"
     )
 
-    rec_path = proj_dir / f"RECOMENDACOES_{safe_filename(disciplina)}_{safe_filename(empreendimento)}_{file_hash[:8]}_{project_id[:8]}.json"
-    rec_path.write_text(json.dumps(obj, ensure_ascii=False, indent=2), encoding="utf-8")
-
-    pdf_path = gerar_pdf(
-        empreendimento, disciplina, original_name, file_hash, props, dados_ifc, change_log,
-        metrics, conf, evid_path, out_dir=proj_dir, doc_id=doc_id, tenant_id=tenant_id, project_id=project_id
+def botao_download(col, label: str, path: Optional[str], key: str, file_name: Optional[str] = None) -> None:
+    if not path:
+        return
+    pp = Path(str(path))
+    if not pp.exists():
+        return
+    col.download_button(
+        label, ler_artefato(pp), file_name=file_name or pp.name,
+        mime=DOWNLOAD_MIME.get(pp.suffix.lower(), "application/octet-stream"), key=key,
     )
 
-    t_antes, t_depois, econ, eff = metrics
-    conf_score, conf_label, _breakdown = conf
-
-    proj_row = {
-        "project_id": project_id,
-        "tenant_id": tenant_id,
-        "user_id": user_id,
-        "empreendimento": empreendimento,
-        "disciplina": disciplina,
-        "created_at_iso": now_iso(),
-        "created_at_br": today_br(),
-        "status": status,
-        "engine_version": ENGINE_VERSION,
-        "doc_id": doc_id,
-        "file_hash": file_hash,
-        "original_name": original_name,
-        "file_type": "PDF" if is_pdf(original_name) else "IFC",
-        "file_size_bytes": int(len(file_bytes)),
-        "total_original": int(t_antes),
-        "total_otimizado": int(t_depois),
-        "economia_itens": int(econ),
-        "eficiencia_num": float(eff),
-        "confianca_label": conf_label,
-        "confianca_score": int(conf_score),
-    }
-
-    files_row = {
-        "project_id": project_id,
-        "tenant_id": tenant_id,
-        "ifc_original_path": str(ifc_original_path) if ifc_original_path else None,
-        "ifc_otimizado_path": str(ifc_otimizado_path) if ifc_otimizado_path else None,
-        "evid_pdf_path": str(evid_path) if evid_path else None,
-        "relatorio_pdf_path": str(pdf_path),
-        "recomendacoes_json_path": str(rec_path),
-        "props_json_path": str(ppath),
-    }
-
-    upsert_project(proj_row, files_row)
-    st.success("Concluído. Veja em DOCS para baixar IFC OTIMIZADO, JSON técnico e relatório PDF.")
-
 # -----------------------------------------------------------------------------
-# UI (Topo)
+# FRAGMENTOS: cada aba reexecuta sozinha quando seus widgets mudam (sem rerun do app inteiro)
 # -----------------------------------------------------------------------------
-h1, h2 = st.columns([8,2])
-with h1:
-    st.markdown("# <span style='color:#00E5FF'>QUANTI</span><span style='color:#FF9F00'>X</span>", unsafe_allow_html=True)
-with h2:
-    st.markdown(f'<div class="user-badge">🏢 {TENANT_ID} • 👤 {USER_ID}</div>', unsafe_allow_html=True)
-st.markdown("---")
+def fragmento(nome: str):
+    """
+    st.fragment + tempo de execução em st.session_state["rerun_stats"][nome].
+    `nome` aceita format com os argumentos posicionais (ex.: "upload_{2}").
+    """
+    def deco(fn):
+        @functools.wraps(fn)
+        def timed(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                stats = st.session_state.setdefault("rerun_stats", {})
+                stats[nome.format(*args)] = (time.perf_counter() - t0) * 1000
+        return st.fragment(timed)
+    return deco
 
 tabs = st.tabs(["🚀 Dashboard","⚡ Elétrica","💧 Hidráulica","🏗️ Estrutural","📂 Portfólio","📝 DOCS","🧬 DNA"])
 
 # -----------------------------------------------------------------------------
 # Dashboard
 # -----------------------------------------------------------------------------
-with tabs[0]:
-    df = carregar_dados(TENANT_ID)
-    if df.empty:
+@fragmento("dashboard")
+def tab_dashboard() -> None:
+    resumo = dados_tenant(carregar_resumo, TENANT_ID)
+    if resumo is None:
         st.info("Aguardando processamento. Faça upload em Elétrica/Hidráulica/Estrutural.")
         st.caption(f"Tenant: {TENANT_ID} | Engine: {ENGINE_VERSION}")
     else:
         c1,c2,c3,c4 = st.columns(4)
-        c1.metric("Impactos (itens)", int(df["economia_itens"].sum()))
-        c2.metric("Eficiência média", f"{float(df['eficiencia_num'].mean()*100):.1f}%")
-        c3.metric("Confiança média", f"{float(df['confianca_score'].mean()):.0f}/100")
-        c4.metric("Projetos", len(df))
+        c1.metric("Impactos (itens)", resumo["economia_itens"])
+        c2.metric("Eficiência média", f"{resumo['eficiencia_media']*100:.1f}%")
+        c3.metric("Confiança média", f"{resumo['confianca_media']:.0f}/100")
+        c4.metric("Projetos", resumo["n_projetos"])
         st.markdown("---")
 
-        agg = df.groupby("empreendimento", as_index=False)["economia_itens"].sum().sort_values("economia_itens", ascending=False)
+        agg = dados_tenant(carregar_resumo_empreendimentos, TENANT_ID)
         st.bar_chart(agg.set_index("empreendimento")["economia_itens"])
 
-        show = df.sort_values("created_at_iso", ascending=False).head(15).copy()
+        show = dados_tenant(carregar_recentes, TENANT_ID, 15).copy()
         show["eficiencia_%"] = (show["eficiencia_num"]*100).round(1).astype(str)+"%"
         st.dataframe(
             show[["empreendimento","disciplina","created_at_br","economia_itens","eficiencia_%","confianca_label","confianca_score","original_name","status","doc_id"]],
             use_container_width=True
         )
 
+    uso = dados_tenant(uso_disco_tenant, TENANT_ID)
+    with st.expander("💾 Uso de disco", expanded=False):
+        d1, d2, d3, d4 = st.columns(4)
+        d1.metric("Uploads (lógico)", f"{uso['bytes_logicos']/1e6:.1f} MB", help=f"{uso['referencias']} referência(s)")
+        d2.metric("Uploads (físico)", f"{uso['bytes_fisicos']/1e6:.1f} MB", help=f"{uso['blobs']} blob(s) distintos")
+        d3.metric("Economia (dedup + compressão)", f"{(uso['bytes_logicos'] - uso['bytes_fisicos'])/1e6:.1f} MB")
+        d4.metric("Artefatos gerados", f"{uso['bytes_derivados']/1e6:.1f} MB")
+        st.caption(f"Exclusivo deste tenant no store: {uso['bytes_exclusivos']/1e6:.1f} MB")
+
+    cs = ANALYSIS_CACHE.stats()
+    st.caption(
+        f"Cache de análise: {cs['hits']} hits • {cs['misses']} misses • {cs['evictions']} evictions • "
+        f"{cs['entries']} entradas ({cs['size_bytes']/1e6:.1f}/{cs['max_bytes']/1e6:.0f} MB)"
+    )
+    mc = next((j["result"]["model_cache"] for j in JOB_QUEUE.list_for_tenant(TENANT_ID)
+               if (j.get("result") or {}).get("model_cache")), None)
+    if mc:
+        st.caption(
+            f"Cache de modelos IFC (worker do último job): {mc['hits']} hits / {mc['misses']} misses "
+            f"({mc['hit_rate']:.0%}) • {mc['forks']} forks • {mc.get('auxiliar', 0)} via processo auxiliar • "
+            f"{mc['sem_fork']} sem fork • "
+            f"parse economizado {mc['parse_s_saved']:.1f}s"
+        )
+    rs = st.session_state.get("rerun_stats") or {}
+    if rs:
+        st.caption("Último rerun (ms): " + " • ".join(f"{k} {v:.0f}" for k, v in sorted(rs.items())))
+    db_stats = DB.stats()
+    if db_stats:
+        st.caption("SQLite (latência por query, neste processo): " + " • ".join(
+            f"{name} {v['avg_ms']:.1f} ms méd / {v['max_ms']:.1f} máx (n={v['n']})" for name, v in db_stats.items()
+        ))
+
+with tabs[0]:
+    tab_dashboard()
+
 # -----------------------------------------------------------------------------
 # PATCH: render_props_form (number_input nunca abaixo do min)
 # -----------------------------------------------------------------------------
@@ -1217,6 +597,48 @@ def render_props_form(tenant_id: str, disciplina: str, ui_project_id: str, key_p
 
     return props
 
+def _upload_file_id(file_obj) -> str:
+    return getattr(file_obj, "file_id", None) or f"{file_obj.name}:{getattr(file_obj, 'size', '')}"
+
+def upload_spool_memo(file_obj, key: str) -> Dict[str, Any]:
+    """Spool + hash uma vez por arquivo no widget; reruns reaproveitam o arquivo em disco e o digest."""
+    memos = st.session_state.setdefault(f"upload_spool_{TENANT_ID}_{key}", {})
+    fid = _upload_file_id(file_obj)
+    memo = memos.get(fid)
+    if memo and Path(memo["path"]).exists():
+        return memo
+    limpar_spool_antigo(UPLOADS_DIR)
+    memo = spool_upload(file_obj, UPLOADS_DIR)
+    memo["file_id"] = fid
+    memos[fid] = memo
+    return memo
+
+def podar_spool_memo(key: str, file_objs: List[Any]) -> None:
+    # arquivos removidos do uploader saem do memo (o spool em disco expira por idade)
+    memos = st.session_state.get(f"upload_spool_{TENANT_ID}_{key}", {})
+    vivos = {_upload_file_id(f) for f in file_objs}
+    for fid in [f for f in memos if f not in vivos]:
+        memos.pop(fid, None)
+
+def previa_upload_memo(upload: Dict[str, Any], disciplina: str) -> Dict[str, Any]:
+    """
+    Entradas pesadas da prévia de confiança (histograma por classe + has_ids), calculadas uma vez
+    por arquivo e disciplina e guardadas no memo do upload (mesmo file_id/hash). Só o resumo fica
+    na sessão, não o ids_map; mudanças nas props não refazem a análise.
+    """
+    previas = upload.setdefault("previas", {})
+    memo = previas.get(disciplina)
+    if memo is None or memo.get("hash") != upload["hash"]:
+        # só a varredura: o clash geométrico do Estrutural roda no job, fora da thread do Streamlit
+        dados, ids_map = analisar_ifc_arquivo(disciplina, Path(upload["path"]), upload["hash"], clash=False)
+        memo = previas[disciplina] = {
+            "hash": upload["hash"],
+            "dados": dados,
+            "has_ids": any(len(v) > 0 for v in ids_map.values()),
+        }
+    return memo
+
+@fragmento("upload_{2}")
 def upload_form(title: str, disciplina: str, key: str, descricao: str):
     st.header(title)
     colA, colB = st.columns([1,2])
@@ -1225,14 +647,16 @@ def upload_form(title: str, disciplina: str, key: str, descricao: str):
         st.info(descricao)
         st.caption(f"Tenant: {TENANT_ID} • Usuário: {USER_ID}")
     with colB:
-        file_obj = st.file_uploader(
-            "Envie IFC (gera IFC OTIMIZADO rastreável) ou PDF (apenas evidência)",
-            type=["ifc","pdf"],
+        file_objs = st.file_uploader(
+            "Envie IFC/IFCZIP (gera IFC OTIMIZADO rastreável) ou PDF (apenas evidência) — um ou vários arquivos",
+            type=IFC_UPLOAD_TYPES + ["pdf"],
+            accept_multiple_files=True,
             key=f"up_{key}"
-        )
+        ) or []
 
-    if not file_obj or not nome:
-        st.caption("Preencha o Empreendimento e selecione um arquivo.")
+    podar_spool_memo(key, file_objs)
+    if not file_objs or not nome:
+        st.caption("Preencha o Empreendimento e selecione um ou mais arquivos.")
         return
 
     ui_key = f"ui_project_{TENANT_ID}_{key}"
@@ -1243,31 +667,60 @@ def upload_form(title: str, disciplina: str, key: str, descricao: str):
 
     props = render_props_form(TENANT_ID, disciplina, ui_project_id, key_prefix=f"prop_{key}")
 
-    file_bytes = file_obj.getvalue()
-    file_hash = file_sha256(file_bytes)
+    uploads = []
+    for file_obj in file_objs:
+        try:
+            uploads.append(upload_spool_memo(file_obj, key))
+        except Exception as e:
+            st.error(f"Não foi possível ler {file_obj.name} ({type(e).__name__}): {e}")
+    if not uploads:
+        return
+
+    if len(uploads) > 1:
+        # lote: a análise de cada arquivo roda no processamento (em paralelo), não na prévia
+        st.dataframe(
+            [
+                {"arquivo": u["name"], "tipo": "PDF" if is_pdf(u["name"]) else "IFC", "tamanho (MB)": round(u["size"] / 1e6, 2)}
+                for u in uploads
+            ],
+            hide_index=True, use_container_width=True,
+        )
+        st.caption("As mesmas propriedades valem para todos os arquivos do lote; a confiança é calculada por arquivo.")
+        if st.button(f"💾 Processar {len(uploads)} arquivos", key=f"btn_{key}"):
+            batch_id = enfileirar_lote(TENANT_ID, USER_ID, nome, disciplina, uploads, props)
+            job_worker_pool().notify()
+            st.session_state.pop(ui_key, None)
+            st.session_state.setdefault("lotes", []).append(batch_id)
+            st.session_state["jobs_flash"] = f"Lote '{nome}' ({disciplina}) com {len(uploads)} arquivos enviado para processamento."
+            st.rerun()
+        return
 
+    upload = uploads[0]
     dados_prev = {}
     has_ids = False
-    if is_ifc(file_obj.name):
+    if is_ifc(upload["name"]):
         try:
-            dados_prev = analisar_ifc(disciplina, file_bytes, file_hash)
-            ids_map = parse_ifc_entity_ids(decode_ifc_text(file_bytes))
-            has_ids = any(len(v)>0 for v in ids_map.values())
+            previa = previa_upload_memo(upload, disciplina)
+            dados_prev, has_ids = previa["dados"], previa["has_ids"]
         except Exception:
             pass
 
+    # só isto depende das props: roda a cada alteração do formulário
     conf_preview = confidence_0_100(dados_prev, props, disciplina, has_ids=has_ids, optimization_applied=False)
     st.caption(
         f"Prévia de confiança: **{conf_preview[1]} ({conf_preview[0]}/100)** — "
         f"IFC={conf_preview[2]['IFC']} Props={conf_preview[2]['Props']} IDs={conf_preview[2]['IDs']} Otim=0"
     )
 
-    if is_pdf(file_obj.name):
+    if is_pdf(upload["name"]):
         st.warning("PDF é apenas evidência. Para gerar IFC OTIMIZADO rastreável, envie um arquivo .IFC.")
 
     if st.button("💾 Processar", key=f"btn_{key}"):
-        salvar_projeto(TENANT_ID, USER_ID, nome, disciplina, file_obj, props)
+        enfileirar_projeto(TENANT_ID, USER_ID, nome, disciplina, upload, props)
+        job_worker_pool().notify()
         st.session_state.pop(ui_key, None)
+        st.session_state["jobs_flash"] = f"'{nome}' ({disciplina}) enviado para processamento. Acompanhe o andamento acima; ao concluir, veja em DOCS."
+        st.rerun()
 
 # Disciplinas (UPLOAD FUNCIONA)
 with tabs[1]:
@@ -1295,13 +748,16 @@ with tabs[3]:
     )
 
 # Portfólio
-with tabs[4]:
-    df = carregar_dados(TENANT_ID)
-    if df.empty:
+@fragmento("portfolio")
+def tab_portfolio() -> None:
+    if dados_tenant(carregar_resumo, TENANT_ID) is None:
         st.info("Nenhum projeto ainda. Faça upload em uma das Engines.")
     else:
-        dfv = df.sort_values("created_at_iso", ascending=False).reset_index(drop=True)
-        for _, row in dfv.iterrows():
+        filtros = filtros_listagem("port")
+        rows = pagina_projetos("port", TENANT_ID, filtros)
+        if not rows:
+            st.caption("Nenhum projeto com esses filtros.")
+        for row in rows:
             c1,c2,c3,c4,c5 = st.columns([4,2,2,2,1])
             c1.write(f"**{row['empreendimento']}** ({row.get('disciplina','-')})")
             c2.write(f"Economia: **{int(row['economia_itens'])}**")
@@ -1310,20 +766,26 @@ with tabs[4]:
             if c5.button("🗑️", key=f"del_{row['project_id']}"):
                 excluir_projeto(str(row["project_id"]), TENANT_ID)
 
+with tabs[4]:
+    tab_portfolio()
+
 # DOCS
-with tabs[5]:
-    df = carregar_dados(TENANT_ID)
-    if df.empty:
+@fragmento("docs")
+def tab_docs() -> None:
+    empreendimentos = dados_tenant(listar_empreendimentos, TENANT_ID)
+    if not empreendimentos:
         st.info("Sem documentos ainda. Faça upload e processe um IFC/PDF.")
     else:
-        empreendimentos = sorted(df["empreendimento"].unique())
         sel = st.selectbox("Empreendimento:", empreendimentos, key="docs_emp")
-        projetos = df[df["empreendimento"] == sel].sort_values("created_at_iso", ascending=False)
+        filtros = dict(filtros_listagem("docs"), empreendimento=sel)
 
         st.info("No BIMcollab ZOOM, procure por 'Groups' → 'Quantix_Optimized_Elements' e/ou filtre pelo Pset 'Pset_QuantixOptimization'. "
                 "Mapa visual: laranja=otimizado, vermelho=conflito/interferência (se o viewer suportar estilos).")
 
-        for _, d in projetos.iterrows():
+        projetos = pagina_projetos("docs", TENANT_ID, filtros)
+        if not projetos:
+            st.caption("Nenhum projeto com esses filtros.")
+        for d in projetos:
             st.markdown(
                 f"**Disciplina:** {d.get('disciplina','-')} — **Data:** {d.get('created_at_br','-')} — "
                 f"**Eficiência:** {float(d.get('eficiencia_num',0))*100:.1f}% — "
@@ -1333,27 +795,54 @@ with tabs[5]:
 
             c1,c2,c3,c4 = st.columns(4)
 
-            pdfp = d.get("relatorio_pdf_path")
-            if pdfp and Path(str(pdfp)).exists():
-                with open(str(pdfp), "rb") as f:
-                    c1.download_button("📥 Relatório PDF", f, file_name=Path(str(pdfp)).name, key=f"dl_pdf_{d['project_id']}")
+            botao_download(c1, "📥 Relatório PDF", d.get("relatorio_pdf_path"), f"dl_pdf_{d['project_id']}")
+            botao_download(c2, "🧾 JSON técnico", d.get("recomendacoes_json_path"), f"dl_json_{d['project_id']}")
+            botao_download(c3, "📦 IFC OTIMIZADO", d.get("ifc_otimizado_path"), f"dl_ifc_{d['project_id']}",
+                           nome_download(d, d.get("ifc_otimizado_path")))
+            botao_download(c4, "🧷 Evidência (PDF)", d.get("evid_pdf_path"), f"dl_evd_{d['project_id']}",
+                           nome_download(d, d.get("evid_pdf_path")))
 
-            recp = d.get("recomendacoes_json_path")
-            if recp and Path(str(recp)).exists():
-                with open(str(recp), "rb") as f:
-                    c2.download_button("🧾 JSON técnico", f, file_name=Path(str(recp)).name, key=f"dl_json_{d['project_id']}")
-
-            ifcp = d.get("ifc_otimizado_path")
-            if ifcp and Path(str(ifcp)).exists():
-                with open(str(ifcp), "rb") as f:
-                    c3.download_button("📦 IFC OTIMIZADO", f, file_name=Path(str(ifcp)).name, key=f"dl_ifc_{d['project_id']}")
+            st.divider()
 
-            evp = d.get("evid_pdf_path")
-            if evp and Path(str(evp)).exists():
-                with open(str(evp), "rb") as f:
-                    c4.download_button("🧷 Evidência (PDF)", f, file_name=Path(str(evp)).name, key=f"dl_evd_{d['project_id']}")
+        with st.expander("🔎 Índice de entidades (busca por #id / diff de revisões)"):
+            ifc_rows = [r for r in projetos if r.get("ifc_original_path") and Path(str(r["ifc_original_path"])).exists()]
+            if not ifc_rows:
+                st.caption("Nenhum IFC original salvo nesta página.")
+            else:
+                labels = {f"{r['doc_id']} • {r['disciplina']} • {r['created_at_br']} • {r['original_name']}": r for r in ifc_rows}
+                sel_a = st.selectbox("Revisão", list(labels), key="idx_rev_a")
+                rec_a = labels[sel_a]
+                path_a = Path(str(rec_a["ifc_original_path"]))
+                idx_a = abrir_indice_entidades(path_a, str(rec_a.get("file_hash", "")))
+
+                eid_in = st.text_input("Buscar #id", key="idx_eid")
+                if idx_a is not None and eid_in.strip().lstrip("#").isdigit():
+                    eid = int(eid_in.strip().lstrip("#"))
+                    hit = idx_a.lookup(eid)
+                    if hit:
+                        st.write(f"`{hit['ifc_id']}` {hit['classe']} • GlobalId `{hit['guid'] or '-'}` • offset {hit['offset']}")
+                        st.code((idx_a.read_entity(path_a, eid) or "")[:600])
+                    else:
+                        st.caption("#id não encontrado.")
+
+                outros = [k for k in labels if k != sel_a]
+                if outros:
+                    sel_b = st.selectbox("Comparar com (revisão anterior)", outros, key="idx_rev_b")
+                    rec_b = labels[sel_b]
+                    idx_b = abrir_indice_entidades(Path(str(rec_b["ifc_original_path"])), str(rec_b.get("file_hash", "")))
+                    if idx_a is not None and idx_b is not None and st.button("Comparar revisões (GlobalId)", key="idx_diff"):
+                        diff = diff_entity_indexes(idx_b, idx_a)
+                        rows = [
+                            {"classe": c, "adicionados": d["adicionados"], "removidos": d["removidos"], "mantidos": d["mantidos"]}
+                            for c, d in diff.items() if d["adicionados"] or d["removidos"]
+                        ]
+                        if rows:
+                            st.dataframe(rows, use_container_width=True)
+                        else:
+                            st.success("Sem diferenças de GlobalId entre as revisões.")
 
-            st.divider()
+with tabs[5]:
+    tab_docs()
 
 # DNA (mantido)
 with tabs[6]:
@@ -1458,4 +947,7 @@ with tabs[6]:
     st.markdown("</div>", unsafe_allow_html=True)
     st.markdown("</div>", unsafe_allow_html=True)
 
-    st.caption("QUANTIX Strategic Engine | Evidência • Rastreabilidade • Profissional")
\ No newline at end of file
+    st.caption("QUANTIX Strategic Engine | Evidência • Rastreabilidade • Profissional")
+
+# tempo do rerun completo (os fragmentos registram o próprio tempo em rerun_stats)
+st.session_state.setdefault("rerun_stats", {})["app"] = (time.perf_counter() - _T_RERUN) * 1000
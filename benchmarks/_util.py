@@ -0,0 +1,56 @@
+# benchmarks/_util.py — helpers compartilhados pelos benchmarks do QUANTIX
+#
+# Uso: python benchmarks/bench_<nome>.py [arquivo.ifc]
+# Sem arquivo, gera um IFC sintético (texto STEP) com ~N entidades.
+
+import os
+import sys
+import time
+import tempfile
+import importlib
+from pathlib import Path
+from typing import Callable, Tuple, Any
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+_SYNTH_CLASSES = [
+    "IFCPIPESEGMENT", "IFCPIPEFITTING", "IFCFLOWCONTROLLER", "IFCSANITARYTERMINAL",
+    "IFCCABLESEGMENT", "IFCFLOWTERMINAL", "IFCWALL", "IFCCARTESIANPOINT",
+    "IFCDIRECTION", "IFCAXIS2PLACEMENT3D", "IFCLOCALPLACEMENT", "IFCPROPERTYSINGLEVALUE",
+]
+
+def load_engine():
+    """Importa quantix.engine (sem Streamlit), com quantix_data num diretório temporário."""
+    work = Path(tempfile.mkdtemp(prefix="quantix_bench_"))
+    os.chdir(work)
+    os.environ["QUANTIX_DATA_DIR"] = str(work / "quantix_data")
+    return importlib.import_module("quantix.engine")
+
+def synthetic_ifc(n_entities: int = 600_000) -> bytes:
+    lines = [
+        "ISO-10303-21;", "HEADER;",
+        "FILE_DESCRIPTION(('ViewDefinition [CoordinationView]'),'2;1');",
+        "FILE_SCHEMA(('IFC4'));", "ENDSEC;", "DATA;",
+    ]
+    for i in range(1, n_entities + 1):
+        cls = _SYNTH_CLASSES[i % len(_SYNTH_CLASSES)]
+        lines.append(f"#{i}= {cls}('2O2Fr$t4X7Zf8NOew3FL{i % 10}',#{max(1, i - 1)},'Elem {i}',$,$,(0.,0.,{i}.),$);")
+    lines += ["ENDSEC;", "END-ISO-10303-21;", ""]
+    return "\n".join(lines).encode("utf-8")
+
+def read_input(default_entities: int = 600_000) -> Tuple[str, bytes]:
+    if len(sys.argv) > 1:
+        p = Path(sys.argv[1])
+        return p.name, p.read_bytes()
+    return f"synthetic({default_entities})", synthetic_ifc(default_entities)
+
+def best_of(fn: Callable[[], Any], repeat: int = 3) -> Tuple[float, Any]:
+    best = float("inf")
+    out = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, out
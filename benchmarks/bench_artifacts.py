@@ -0,0 +1,63 @@
+# Benchmark: artefato IFC em texto puro x .ifc.gz em blocos (quantix.artifact_io)
+# tamanho em disco, tempo de escrita, leitura sequencial (scanner) e leitura aleatória (lookup por #id)
+#
+#   python benchmarks/bench_artifacts.py [modelo.ifc]
+
+import random
+import shutil
+import tempfile
+from pathlib import Path
+
+from _util import read_input, best_of
+
+from quantix.artifact_io import compress_file, open_artifact
+from quantix.entity_index import EntityIndex, build_entity_index
+from quantix.step_scan import scan_ifc_file
+
+LEVELS = (1, 6, 9)
+LOOKUPS = 2000
+
+def main() -> None:
+    name, data = read_input()
+    work = Path(tempfile.mkdtemp(prefix="quantix_bench_art_"))
+    src = work / "modelo.ifc"
+    src.write_bytes(data)
+
+    print(f"arquivo: {name} ({len(data)/1e6:.1f} MB)")
+    print(f"{'formato':<14}{'disco (MB)':>12}{'razão':>8}{'escrita (ms)':>14}{'scan (ms)':>11}{'lookup (µs)':>13}")
+
+    variantes = [("texto", work / "raw.ifc", lambda: shutil.copyfile(src, work / "raw.ifc"))]
+    for level in LEVELS:
+        dst = work / f"l{level}.ifc.gz"
+        variantes.append((f"gz nível {level}", dst, lambda d=dst, l=level: compress_file(src, d, l)))
+
+    baseline = None
+    for label, path, write in variantes:
+        t_write, _ = best_of(write)
+        size = path.stat().st_size
+        t_scan, scan = best_of(lambda: scan_ifc_file(path, workers=1))
+        if baseline is None:
+            baseline = scan
+        assert scan == baseline, f"{label}: scan divergiu do texto puro"
+
+        idx = EntityIndex(build_entity_index(path))
+        ids = [int(i) for i in idx._section("sorted_ids")]
+        rng = random.Random(7)
+        sample = [rng.choice(ids) for _ in range(LOOKUPS)] if ids else []
+
+        def lookups() -> None:
+            with open_artifact(path) as fp:
+                for eid in sample:
+                    fp.seek(idx.lookup(eid)["offset"])
+                    fp.readline()
+
+        t_look, _ = best_of(lookups)
+        print(
+            f"{label:<14}{size/1e6:>12.2f}{len(data)/size:>7.1f}x{t_write*1000:>14.1f}"
+            f"{t_scan*1000:>11.1f}{t_look/max(1, len(sample))*1e6:>13.1f}"
+        )
+
+    shutil.rmtree(work, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
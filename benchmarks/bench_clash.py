@@ -0,0 +1,95 @@
+# Benchmark: clash estrutura x MEP/arquitetura (quantix/clash.py)
+#
+#   python benchmarks/bench_clash.py [modelo.ifc] [--n 120000] [--threads 8]
+#
+# - broad phase (sweep-and-prune) sobre N caixas sintéticas de um prédio (pilares, vigas e lajes num
+#   grid de 6 m; tubos, dutos e paredes espalhados), comparada com a força bruta numa amostra
+# - com um IFC: detectar_clashes completo, com o tempo de cada etapa (AABB no iterator, broad, narrow)
+#   para 1 thread e para --threads (padrão QUANTIX_CLASH_THREADS)
+
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from _util import load_engine, best_of
+
+def caixas_predio(n: int, seed: int = 7):
+    """~n caixas (lo_estrutura, hi_estrutura, lo_outros, hi_outros) num prédio sintético: grid 6 m, pé-direito 3 m."""
+    rng = np.random.default_rng(seed)
+    n_est = n // 2
+    lado = max(2, int(round((n_est / 4) ** (1 / 3) * 1.6)))
+    andares = max(1, n_est // (4 * lado * lado))
+    i, j, f = np.meshgrid(np.arange(lado), np.arange(lado), np.arange(andares), indexing="ij")
+    x, y, z = (i.ravel() * 6.0, j.ravel() * 6.0, f.ravel() * 3.0)
+    pilar = (np.c_[x - .15, y - .15, z], np.c_[x + .15, y + .15, z + 2.5])
+    viga_x = (np.c_[x + .15, y - .1, z + 2.5], np.c_[x + 5.85, y + .1, z + 3.0])
+    viga_y = (np.c_[x - .1, y + .15, z + 2.5], np.c_[x + .1, y + 5.85, z + 3.0])
+    laje = (np.c_[x + .15, y + .15, z + 3.0], np.c_[x + 5.85, y + 5.85, z + 3.2])
+    lo_e = np.vstack([pilar[0], viga_x[0], viga_y[0], laje[0]])
+    hi_e = np.vstack([pilar[1], viga_x[1], viga_y[1], laje[1]])
+    # outros: tubos/dutos/paredes ao longo de x ou y em alturas variadas (parte na altura das vigas)
+    m = n - len(lo_e)
+    ext = np.array([lado * 6.0, lado * 6.0, andares * 3.0])
+    c = rng.uniform(0, 1, (m, 3)) * ext
+    c[:, 2] = np.floor(c[:, 2] / 3.0) * 3.0 + rng.choice([2.7, 2.1, 1.8, 1.2], m)
+    comp = rng.uniform(1.0, 6.0, m)
+    sec = rng.uniform(0.05, 0.4, m)
+    ao_longo_x = rng.random(m) < 0.5
+    meia = np.where(ao_longo_x[:, None], np.c_[comp, sec, sec], np.c_[sec, comp, sec]) / 2
+    lo_o, hi_o = c - meia, c + meia
+    return lo_e, hi_e, lo_o, hi_o
+
+def forca_bruta(lo_a, hi_a, lo_b, hi_b, tol, bloco: int = 100):
+    out = set()
+    for k in range(0, len(lo_b), bloco):
+        lb, hb = lo_b[k:k + bloco], hi_b[k:k + bloco]
+        ov = (np.minimum(hi_a[:, None], hb[None]) - np.maximum(lo_a[:, None], lb[None])).min(axis=2)
+        out |= {(int(a), int(b) + k) for a, b in zip(*np.nonzero(ov > tol))}
+    return out
+
+def main() -> None:
+    args = list(sys.argv[1:])
+    n = 120_000
+    threads = None
+    for flag in ("--n", "--threads"):
+        if flag in args:
+            i = args.index(flag)
+            if flag == "--n":
+                n = int(args[i + 1])
+            else:
+                threads = int(args[i + 1])
+            del args[i:i + 2]
+    engine = load_engine()
+    from quantix.clash import CLASH_TOL_M, CLASH_THREADS, pares_candidatos, detectar_clashes
+
+    lo_e, hi_e, lo_o, hi_o = caixas_predio(n)
+    print(f"broad phase: {len(lo_e)} estrutura x {len(lo_o)} outros (tol {CLASH_TOL_M * 1000:.0f} mm)")
+    dt, (i, j) = best_of(lambda: pares_candidatos(lo_e, hi_e, lo_o, hi_o, tol=CLASH_TOL_M), repeat=3)
+    print(f"  sweep-and-prune {dt * 1000:9.1f} ms   {len(i)} pares candidatos")
+    k = min(len(lo_o), 2000)
+    esperado = forca_bruta(lo_e, hi_e, lo_o[:k], hi_o[:k], CLASH_TOL_M)
+    confere = set(zip(i[j < k].tolist(), j[j < k].tolist())) == esperado
+    print(f"  confere com força bruta nos {k} primeiros outros: {'ok' if confere else 'DIVERGE'}")
+
+    if not args:
+        return
+    ifcopenshell = engine.try_import_ifcopenshell()
+    if ifcopenshell is None:
+        sys.exit("ifcopenshell não instalado")
+    import ifcopenshell.geom  # noqa: F401
+    src = Path(args[0]).resolve()
+    t0 = time.perf_counter()
+    model = ifcopenshell.open(str(src))
+    print(f"\n{src.name}: parse {time.perf_counter() - t0:.2f}s")
+    print(f"{'threads':>8}{'produtos':>10}{'aabb s':>9}{'broad s':>9}{'narrow s':>10}{'cand.':>8}{'pares':>8}{'elem.':>7}")
+    for nt in sorted({1, threads or CLASH_THREADS}):
+        t0 = time.perf_counter()
+        r = detectar_clashes(ifcopenshell, model, threads=nt)
+        tt = r["tempos"]
+        print(f"{nt:>8}{r['n_produtos']:>10}{tt['aabb_s']:>9.2f}{tt['broad_s']:>9.3f}{tt['narrow_s']:>10.2f}"
+              f"{r['n_candidatos']:>8}{len(r['pares']):>8}{len(r['elementos']):>7}   total {time.perf_counter() - t0:.2f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# Benchmark: leituras/escritas concorrentes no SQLite — conexão nova por chamada (journal padrão)
+# x pool WAL do quantix.db (leitores reaproveitados + escritor único)
+#
+#   python benchmarks/bench_db.py [threads] [projetos]
+
+import sys
+import time
+import sqlite3
+import tempfile
+import threading
+from pathlib import Path
+
+import _util  # noqa: F401  (coloca a raiz do repo no sys.path)
+from quantix.db import SQLitePool
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS projects (
+    project_id TEXT PRIMARY KEY, tenant_id TEXT NOT NULL, created_at_iso TEXT NOT NULL,
+    empreendimento TEXT NOT NULL, economia_itens INTEGER NOT NULL, status TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_projects_tenant_created_id ON projects(tenant_id, created_at_iso DESC, project_id DESC);
+"""
+READ_SQL = "SELECT * FROM projects WHERE tenant_id=? ORDER BY created_at_iso DESC"
+WRITE_SQL = "INSERT OR REPLACE INTO projects VALUES (?, ?, ?, ?, ?, ?)"
+
+def seed(path: Path, n: int) -> None:
+    con = sqlite3.connect(path)
+    con.executescript(SCHEMA)
+    con.executemany(WRITE_SQL, [(f"p{i}", f"t{i % 10}", f"2026-01-01T00:{i % 60:02d}:{i % 59:02d}", f"E{i % 7}", i % 50, "done")
+                                for i in range(n)])
+    con.commit()
+    con.close()
+
+def workload(read, write, threads: int, rounds: int = 30) -> float:
+    def run(k: int) -> None:
+        for r in range(rounds):
+            read(f"t{k % 10}")
+            if r % 10 == 0:
+                write((f"w{k}_{r}", f"t{k % 10}", "2026-02-01T00:00:00", "E", 1, "done"))
+    ts = [threading.Thread(target=run, args=(k,)) for k in range(threads)]
+    t0 = time.perf_counter()
+    for t in ts:
+        t.start()
+    for t in ts:
+        t.join()
+    return time.perf_counter() - t0
+
+def main() -> None:
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 24
+    n = int(sys.argv[2]) if len(sys.argv) > 2 else 20_000
+    work = Path(tempfile.mkdtemp())
+
+    # 1) conexão nova por chamada, journal DELETE
+    p1 = work / "direct.db"
+    seed(p1, n)
+
+    def read_direct(t):
+        con = sqlite3.connect(p1, timeout=30)
+        con.row_factory = sqlite3.Row
+        con.execute(READ_SQL, (t,)).fetchall()
+        con.close()
+
+    def write_direct(row):
+        with sqlite3.connect(p1, timeout=30) as con:
+            con.execute(WRITE_SQL, row)
+            con.commit()
+
+    # 2) pool WAL
+    p2 = work / "pool.db"
+    seed(p2, n)
+    pool = SQLitePool(p2)
+
+    def read_pool(t):
+        with pool.read("listar") as con:
+            con.execute(READ_SQL, (t,)).fetchall()
+
+    def write_pool(row):
+        with pool.write("gravar") as con:
+            con.execute(WRITE_SQL, row)
+
+    t_direct = workload(read_direct, write_direct, threads)
+    t_pool = workload(read_pool, write_pool, threads)
+    print(f"{threads} threads, {n} projetos")
+    print(f"conexão por chamada: {t_direct*1000:8.1f} ms")
+    print(f"pool WAL:            {t_pool*1000:8.1f} ms  ({t_direct / t_pool:.1f}x)")
+    for name, v in pool.stats().items():
+        print(f"  {name:8} n={v['n']:5} méd {v['avg_ms']:6.2f} ms  máx {v['max_ms']:7.2f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# Benchmark: IFC OTIMIZADO via ifcopenshell (open/edit/write) x patch de linhas STEP,
+# cada um com Pset por elemento e Pset compartilhado (QUANTIX_PSET_MODE=element/shared),
+# e a re-otimização da saída ifcopenshell (Pset_QuantixOptimization já presente)
+#
+#   python benchmarks/bench_ifc_writer.py modelo.ifc [Hidraulica]
+
+import sys
+import tempfile
+import tracemalloc
+import time
+from pathlib import Path
+
+from _util import load_engine
+
+def run(fn):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    out = fn()
+    dt = time.perf_counter() - t0
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return dt, peak, out
+
+def main() -> None:
+    if len(sys.argv) < 2:
+        sys.exit("uso: python benchmarks/bench_ifc_writer.py modelo.ifc [disciplina]")
+    src = Path(sys.argv[1]).resolve()
+    disciplina = sys.argv[2] if len(sys.argv) > 2 else "Hidraulica"
+    engine = load_engine()
+    from quantix.model_cache import ModelCache
+
+    # parse a cada execução, no próprio processo (o ganho do cache é medido em bench_model_cache.py)
+    engine.MODEL_CACHE = ModelCache(max_bytes=0)
+    work = Path(tempfile.mkdtemp())
+    ifc_in = work / "ORIGINAL_bench.ifc"
+    ifc_in.write_bytes(src.read_bytes())
+    file_hash = engine.file_sha256(ifc_in.read_bytes())
+
+    engine.abrir_indice_entidades(ifc_in, file_hash)
+    dados, ids_map = engine.analisar_ifc_arquivo(disciplina, ifc_in, file_hash)
+    change_log = engine.build_change_log(dados, ids_map)
+    args = (disciplina, change_log, "Bench", {"obs": "bench"})
+
+    # tracemalloc não enxerga a memória C++ do ifcopenshell; o pico abaixo é só o lado Python
+    print(f"arquivo: {src.name} ({ifc_in.stat().st_size/1e6:.1f} MB) | elementos alterados: {len(change_log)}")
+    tempos = {}
+    for shared in (False, True):
+        modo = "shared" if shared else "element"
+        out_ios = work / f"OUT_ios_{modo}.ifc"
+        out_stp = work / f"OUT_step_{modo}.ifc"
+        t_ios, m_ios, r_ios = run(lambda: engine.apply_optimizations_ifc(
+            ifc_in, out_ios, *args, tenant_id="bench", project_id="p1", shared_psets=shared))
+        t_stp, m_stp, r_stp = run(lambda: engine.apply_optimizations_step(
+            ifc_in, out_stp, *args, tenant_id="bench", project_id="p1",
+            engine_version=engine.ENGINE_VERSION, shared_psets=shared))
+        tempos[modo] = (t_ios, t_stp)
+        for nome, t, m, r, out in (("ifcopenshell", t_ios, m_ios, r_ios, out_ios),
+                                   ("patch STEP", t_stp, m_stp, r_stp, out_stp)):
+            tam = out.stat().st_size / 1e6 if out.exists() else 0.0
+            print(f"[{modo:7}] {nome:12}: {t*1000:9.1f} ms | pico Python {m/1e6:6.1f} MB | saída {tam:7.2f} MB | {r[1]}")
+    # re-otimização do próprio OTIMIZADO: só o caminho ifcopenshell (dedup de Pset pelo índice inverso)
+    for modo in ("element", "shared"):
+        src2 = work / f"OUT_ios_{modo}.ifc"
+        out2 = work / f"OUT_reopt_{modo}.ifc"
+        t, m, r = run(lambda: engine.apply_optimizations_ifc(
+            src2, out2, *args, tenant_id="bench", project_id="p2", shared_psets=(modo == "shared")))
+        print(f"[{modo:7}] re-otimização: {t*1000:9.1f} ms | pico Python {m/1e6:6.1f} MB | {r[1]}")
+    if tempos["element"][1] > 0:
+        print(f"speedup patch STEP x ifcopenshell (element): {tempos['element'][0] / tempos['element'][1]:.1f}x")
+    if tempos["shared"][0] > 0:
+        print(f"speedup shared x element (ifcopenshell): {tempos['element'][0] / tempos['shared'][0]:.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+# Benchmark: pico de memória — texto decodificado x bytes x leitura em blocos do arquivo salvo
+#
+#   python benchmarks/bench_memory.py [modelo.ifc]
+
+import gc
+import time
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+from _util import load_engine, read_input
+
+def measure(fn):
+    gc.collect()
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    out = fn()
+    dt = time.perf_counter() - t0
+    _cur, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return dt, peak, out
+
+def main() -> None:
+    engine = load_engine()
+    from quantix.step_scan import scan_ifc_entities, scan_ifc_bytes
+    name, data = read_input()
+    path = Path(tempfile.mkdtemp()) / "ORIGINAL_bench.ifc"
+    path.write_bytes(data)
+
+    t_txt, m_txt, ref = measure(lambda: scan_ifc_entities(engine.decode_ifc_text(data)))
+    t_b, m_b, by_bytes = measure(lambda: scan_ifc_bytes(data))
+    t_f, m_f, by_file = measure(lambda: engine.scan_ifc_file(path))
+
+    assert by_bytes == ref and by_file == ref, "contagens divergentes entre caminhos"
+    n_ids = sum(ref["counts"].values())
+
+    print(f"arquivo: {name} ({len(data)/1e6:.1f} MB, {n_ids} entidades)")
+    print(f"{'caminho':<28}{'tempo (ms)':>12}{'pico (MB)':>12}")
+    print(f"{'decode_ifc_text + str':<28}{t_txt*1000:>12.1f}{m_txt/1e6:>12.1f}")
+    print(f"{'scan_ifc_bytes':<28}{t_b*1000:>12.1f}{m_b/1e6:>12.1f}")
+    print(f"{'scan_ifc_file (blocos)':<28}{t_f*1000:>12.1f}{m_f/1e6:>12.1f}")
+    print("obs.: o pico restante é dominado pelo ids_map (proporcional ao nº de entidades, não ao tamanho do texto).")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+# Benchmark: IFC OTIMIZADO (caminho ifcopenshell) repetido sobre o mesmo arquivo,
+# sem cache (parse a cada job) x cache de modelos por processo (parse 1x + cópia copy-on-write por job)
+#
+#   python benchmarks/bench_model_cache.py modelo.ifc [Hidraulica] [repetições]
+
+import sys
+import time
+from pathlib import Path
+
+from _util import load_engine
+
+def main() -> None:
+    if len(sys.argv) < 2:
+        sys.exit("uso: python benchmarks/bench_model_cache.py modelo.ifc [disciplina] [repetições]")
+    src = Path(sys.argv[1]).resolve()
+    disciplina = sys.argv[2] if len(sys.argv) > 2 else "Hidraulica"
+    repeat = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+    engine = load_engine()
+    from quantix.model_cache import ModelCache, pode_fork
+
+    file_hash = engine.file_sha256(src.read_bytes())
+    engine.abrir_indice_entidades(src, file_hash)
+    dados, ids_map = engine.analisar_ifc_arquivo(disciplina, src, file_hash)
+    change_log = engine.build_change_log(dados, ids_map)
+    work = Path.cwd()
+
+    print(f"arquivo: {src.name} ({src.stat().st_size/1e6:.1f} MB) | elementos alterados: {len(change_log)} | "
+          f"fork: {'sim' if pode_fork() else 'não'}")
+    for shared in (False, True):
+        modo = "shared" if shared else "element"
+        for nome, cache in (("sem cache", ModelCache(max_bytes=0)), ("com cache", ModelCache())):
+            engine.MODEL_CACHE = cache
+            tempos = []
+            for i in range(repeat):
+                t0 = time.perf_counter()
+                ok, msg = engine.apply_optimizations_ifc(
+                    src, work / f"OUT_{modo}_{i}.ifc", disciplina, change_log, "Bench", {"obs": "bench"},
+                    tenant_id="bench", project_id=f"p{i}", shared_psets=shared, file_hash=file_hash)
+                tempos.append(time.perf_counter() - t0)
+                if not ok:
+                    sys.exit(msg)
+            s = cache.stats()
+            print(f"[{modo:7}] {nome}: 1º {tempos[0]*1000:7.0f} ms | demais (méd) "
+                  f"{sum(tempos[1:])/max(1, len(tempos) - 1)*1000:7.0f} ms | hits {s['hits']} misses {s['misses']} ({s['hit_rate']:.0%}) "
+                  f"forks {s['forks']} sem fork {s['sem_fork']} | evictions {s['evictions']} | parse {s['parse_s']:.2f}s, economizado {s['parse_s_saved']:.2f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+# Benchmark: scan sequencial x scan paralelo em faixas (process pool)
+#
+#   python benchmarks/bench_parallel.py [modelo.ifc]
+#   QUANTIX_SCAN_WORKERS=8 python benchmarks/bench_parallel.py
+
+import os
+import tempfile
+from pathlib import Path
+
+from _util import read_input, best_of
+from quantix.step_scan import scan_ifc_file, SCAN_WORKERS
+
+def main() -> None:
+    name, data = read_input(default_entities=2_000_000)
+    path = Path(tempfile.mkdtemp()) / "ORIGINAL_bench.ifc"
+    path.write_bytes(data)
+    del data
+
+    t_seq, ref = best_of(lambda: scan_ifc_file(path, workers=1), repeat=2)
+    print(f"arquivo: {name} ({os.path.getsize(path)/1e6:.1f} MB) | cpu_count={os.cpu_count()}")
+    print(f"{'workers':<10}{'tempo (ms)':>12}{'speedup':>10}")
+    print(f"{1:<10}{t_seq*1000:>12.1f}{1.0:>9.2f}x")
+    for w in sorted({2, 4, SCAN_WORKERS} - {1}):
+        t, out = best_of(lambda: scan_ifc_file(path, workers=w, min_parallel_bytes=0), repeat=2)
+        assert out == ref, f"scan paralelo ({w}) divergiu do sequencial"
+        print(f"{w:<10}{t*1000:>12.1f}{t_seq / t:>9.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+# Benchmark: latência de rerun do app (AppTest) com N projetos no tenant
+#
+#   python benchmarks/bench_rerun.py [app_joal.py] [projetos] [reruns]
+#
+# Mede o rerun completo do script e, se o app registrar, o custo de cada fragmento
+# (st.session_state["rerun_stats"]) — o que um rerun restrito ao fragmento executa.
+
+import os
+import sys
+import time
+import logging
+import tempfile
+import importlib.util
+from pathlib import Path
+
+from _util import REPO_ROOT
+
+def main() -> None:
+    app_path = Path(sys.argv[1]).resolve() if len(sys.argv) > 1 else REPO_ROOT / "app_joal.py"
+    n = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    reruns = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+    logging.disable(logging.WARNING)
+    os.chdir(tempfile.mkdtemp(prefix="quantix_bench_"))
+    sys.path.insert(0, str(app_path.parent))
+
+    spec = importlib.util.spec_from_file_location("app_bench", app_path)
+    app = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(app)
+    from quantix.engine import upsert_project  # mesmo DATA_DIR (cwd) que o app acabou de abrir
+    files = dict(ifc_original_path=None, ifc_otimizado_path=None, evid_pdf_path=None,
+                 relatorio_pdf_path=None, recomendacoes_json_path=None, props_json_path=None)
+    for i in range(n):
+        pid = f"bench{i:06d}"
+        upsert_project(dict(
+            project_id=pid, tenant_id="demo", user_id="u", empreendimento=f"Emp {i % 40}",
+            disciplina=("Eletrica", "Hidraulica", "Estrutural")[i % 3],
+            created_at_iso=f"2026-01-{1 + i % 28:02d}T{i % 24:02d}:{i % 60:02d}:00", created_at_br="-",
+            status="done", engine_version="bench", doc_id=f"D{i}", file_hash="h", original_name="x.ifc",
+            file_type="IFC", file_size_bytes=1, total_original=100, total_otimizado=90, economia_itens=10,
+            eficiencia_num=0.1, confianca_label="Alta", confianca_score=80,
+        ), dict(files, project_id=pid, tenant_id="demo"))
+
+    from streamlit.testing.v1 import AppTest
+    at = AppTest.from_file(str(app_path), default_timeout=300)
+    at.run()
+    times = []
+    for _ in range(reruns):
+        t0 = time.perf_counter()
+        at.run()
+        times.append(time.perf_counter() - t0)
+    if at.exception:
+        print("exceções:", [e.value for e in at.exception])
+    times.sort()
+    print(f"{app_path} | {n} projetos | {reruns} reruns")
+    print(f"rerun completo: mediana {times[len(times) // 2] * 1000:8.1f} ms | mín {times[0] * 1000:8.1f} ms")
+    stats = at.session_state["rerun_stats"] if "rerun_stats" in at.session_state else {}
+    for nome, ms in sorted(stats.items()):
+        print(f"  {nome:12} {ms:8.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+# Benchmark: varredura por classe (legado) x scan_ifc_entities (passada única)
+#
+#   python benchmarks/bench_scanner.py [modelo.ifc]
+
+import re
+from typing import Dict, List
+
+from _util import load_engine, read_input, best_of
+
+HIDRAULICA = ["IFCPIPESEGMENT", "IFCPIPEFITTING", "IFCFLOWCONTROLLER", "IFCWASTETERMINAL", "IFCSANITARYTERMINAL"]
+
+def legacy(txt: str) -> Dict[str, List[str]]:
+    # processar_mapa: um findall por classe + parse_ifc_entity_ids: mais uma varredura
+    for classe in HIDRAULICA:
+        len(re.findall(rf"=\s*{re.escape(classe)}\s*\(", txt))
+    out: Dict[str, List[str]] = {}
+    for m in re.finditer(r"(#\d+)\s*=\s*([A-Z0-9_]+)\s*\(", txt):
+        out.setdefault(m.group(2), []).append(m.group(1))
+    return out
+
+def main() -> None:
+    engine = load_engine()
+    from quantix.step_scan import scan_ifc_entities
+    name, data = read_input()
+    txt = engine.decode_ifc_text(data)
+
+    t_old, ids_old = best_of(lambda: legacy(txt))
+    t_new, scan = best_of(lambda: scan_ifc_entities(txt))
+
+    assert scan["ids"] == ids_old, "scan_ifc_entities divergiu do caminho legado"
+    for classe in HIDRAULICA:
+        assert scan["counts"].get(classe, 0) == len(re.findall(rf"=\s*{re.escape(classe)}\s*\(", txt))
+
+    print(f"arquivo: {name} ({len(data)/1e6:.1f} MB)")
+    print(f"legado (findall x{len(HIDRAULICA)} + finditer): {t_old*1000:8.1f} ms")
+    print(f"scan_ifc_entities (1 passada):          {t_new*1000:8.1f} ms")
+    print(f"speedup: {t_old / t_new:.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+# Benchmark: cold start — custo de import (processo novo) e latência do primeiro paint do app
+#
+#   python benchmarks/bench_startup.py [app_joal.py] [projetos] [repetições] [--csv historico.csv]
+#
+# Cada medição roda num interpretador novo (nada em sys.modules):
+# - import de cada dependência pesada isolada e de quantix.engine / quantix.cli
+# - 1º script run do app via AppTest (tenant vazio e com N projetos) + um rerun já quente
+# e registra quais dependências pesadas cada caminho carregou. --csv acrescenta uma linha por
+# medição com ENGINE_VERSION + commit, para acompanhar release a release.
+
+import os
+import re
+import sys
+import csv
+import json
+import subprocess
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+from _util import REPO_ROOT
+
+HEAVY = ("pandas", "numpy", "fpdf", "ifcopenshell", "pyarrow")
+MODULES = ("streamlit", "pandas", "numpy", "fpdf", "ifcopenshell", "quantix.engine", "quantix.cli")
+
+_IMPORT_CHILD = """
+import sys, time, json
+t0 = time.perf_counter()
+import {mod}
+dt = time.perf_counter() - t0
+print(json.dumps({{"s": dt, "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+_PAINT_CHILD = """
+import sys, time, json, logging, subprocess
+logging.disable(logging.WARNING)
+sys.path.insert(0, {root!r})
+n = {n}
+if n:
+    # base semeada num processo à parte: o processo medido começa sem nada importado
+    subprocess.run([sys.executable, "-c", {seed!r}], check=True)
+t0 = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+heavy_antes = [m for m in {heavy!r} if m in sys.modules]
+at = AppTest.from_file({app!r}, default_timeout=300)
+t1 = time.perf_counter()
+at.run()
+t2 = time.perf_counter()
+at.run()
+t3 = time.perf_counter()
+print(json.dumps({{
+    "processo_s": t2 - t0, "primeiro_run_s": t2 - t1, "rerun_s": t3 - t2,
+    "heavy": [m for m in {heavy!r} if m in sys.modules and m not in heavy_antes],
+    "erros": [str(e.value) for e in at.exception],
+}}))
+"""
+
+_SEED_CHILD = """
+import sys
+sys.path.insert(0, {root!r})
+from quantix.engine import upsert_project
+files = dict(ifc_original_path=None, ifc_otimizado_path=None, evid_pdf_path=None,
+             relatorio_pdf_path=None, recomendacoes_json_path=None, props_json_path=None)
+for i in range({n}):
+    pid = f"boot{{i:06d}}"
+    upsert_project(dict(
+        project_id=pid, tenant_id="demo", user_id="u", empreendimento=f"Emp {{i % 40}}",
+        disciplina=("Eletrica", "Hidraulica", "Estrutural")[i % 3],
+        created_at_iso=f"2026-01-{{1 + i % 28:02d}}T{{i % 24:02d}}:{{i % 60:02d}}:00", created_at_br="-",
+        status="done", engine_version="bench", doc_id=f"D{{i}}", file_hash="h", original_name="x.ifc",
+        file_type="IFC", file_size_bytes=1, total_original=100, total_otimizado=90, economia_itens=10,
+        eficiencia_num=0.1, confianca_label="Alta", confianca_score=80,
+    ), dict(files, project_id=pid, tenant_id="demo"))
+"""
+
+def _engine_version() -> str:
+    # lido do fonte: importar quantix.engine aqui criaria quantix_data no diretório atual
+    m = re.search(r'^ENGINE_VERSION = "([^"]+)"', (REPO_ROOT / "quantix" / "engine.py").read_text(encoding="utf-8"), re.M)
+    return m.group(1) if m else "-"
+
+def _child(code: str, cwd: Path) -> dict:
+    env = dict(os.environ, QUANTIX_DATA_DIR=str(cwd / "quantix_data"), PYTHONPATH=str(REPO_ROOT))
+    out = subprocess.run([sys.executable, "-c", code], cwd=cwd, env=env, capture_output=True, text=True, timeout=600)
+    if out.returncode != 0:
+        raise RuntimeError(out.stderr[-2000:])
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def _melhor(fn, repeat: int) -> dict:
+    runs = [fn() for _ in range(repeat)]
+    chave = "s" if "s" in runs[0] else "primeiro_run_s"
+    return min(runs, key=lambda r: r[chave])
+
+def _commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True,
+                              text=True).stdout.strip() or "-"
+    except Exception:
+        return "-"
+
+def main() -> None:
+    args = list(sys.argv[1:])
+    csv_path = None
+    if "--csv" in args:
+        i = args.index("--csv")
+        csv_path = Path(args[i + 1])
+        del args[i:i + 2]
+    app_path = Path(args[0]).resolve() if len(args) > 0 else REPO_ROOT / "app_joal.py"
+    n = int(args[1]) if len(args) > 1 else 200
+    repeat = int(args[2]) if len(args) > 2 else 3
+
+    engine_version = _engine_version()
+    linhas = []
+    commit = _commit()
+    print(f"engine {engine_version} @ {commit} | python {sys.version.split()[0]} | melhor de {repeat}")
+    print(f"{'import (processo novo)':<26}{'ms':>9}   dependências pesadas carregadas")
+    for mod in MODULES:
+        try:
+            r = _melhor(lambda: _child(_IMPORT_CHILD.format(mod=mod, heavy=HEAVY), Path(tempfile.mkdtemp())), repeat)
+        except RuntimeError as e:
+            print(f"{mod:<26}{'falhou':>9}   {str(e).strip().splitlines()[-1]}")
+            continue
+        print(f"{mod:<26}{r['s'] * 1000:>9.1f}   {', '.join(r['heavy']) or '-'}")
+        linhas.append(("import", mod, r["s"], "+".join(r["heavy"])))
+
+    print()
+    print(f"{'primeiro paint':<26}{'processo':>10}{'1º run':>10}{'rerun':>10}   carregadas pelo app")
+    for label, projetos in (("tenant vazio", 0), (f"{n} projetos", n)):
+        seed = _SEED_CHILD.format(root=str(REPO_ROOT), n=projetos)
+        code = _PAINT_CHILD.format(root=str(REPO_ROOT), app=str(app_path), n=projetos, heavy=HEAVY, seed=seed)
+        r = _melhor(lambda: _child(code, Path(tempfile.mkdtemp(prefix="quantix_bench_"))), repeat)
+        if r["erros"]:
+            print("exceções:", r["erros"])
+        print(f"{label:<26}{r['processo_s'] * 1000:>10.0f}{r['primeiro_run_s'] * 1000:>10.0f}{r['rerun_s'] * 1000:>10.0f}"
+              f"   {', '.join(r['heavy']) or '-'}")
+        linhas.append(("primeiro_paint", label, r["primeiro_run_s"], "+".join(r["heavy"])))
+        linhas.append(("rerun", label, r["rerun_s"], ""))
+
+    if csv_path:
+        novo = not csv_path.exists()
+        with open(csv_path, "a", newline="", encoding="utf-8") as f:
+            w = csv.writer(f)
+            if novo:
+                w.writerow(["data", "engine_version", "commit", "medida", "alvo", "ms", "carregadas"])
+            agora = datetime.now().isoformat(timespec="seconds")
+            for medida, alvo, s, heavy in linhas:
+                w.writerow([agora, engine_version, commit, medida, alvo, round(s * 1000, 1), heavy])
+        print(f"\nhistórico: {csv_path}")
+
+if __name__ == "__main__":
+    main()
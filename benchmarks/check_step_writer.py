@@ -0,0 +1,250 @@
+# Verificação: IFC OTIMIZADO do patch STEP (apply_optimizations_step) x caminho ifcopenshell
+# (apply_optimizations_ifc), nos modos Pset por elemento e compartilhado
+#
+#   python benchmarks/check_step_writer.py [modelo.ifc ...] [--disciplina Hidraulica]
+#
+# - sem arquivo: modelos sintéticos IFC2X3 e IFC4 (ifcopenshell.api) com geometria própria,
+#   IfcMappedItem (tipo com tags mistas: estilo por instância; tipo com todas as instâncias ORANGE:
+#   estilo na geometria de origem), elemento sem geometria e textos com acento, aspas, barra
+#   invertida e fora do BMP (\X2\, \X4\)
+# - com arquivos: change log real (analisar_ifc_arquivo + build_change_log) sobre cada modelo
+# Compara, relendo as duas saídas com ifcopenshell: contagens de Pset_QuantixOptimization,
+# IfcRelDefinesByProperties, IfcGroup, IfcRelAssignsToGroup e IfcStyledItem; Description-tag e
+# propriedades por elemento (exceto Timestamp); membros do grupo; item -> estilo/cor; carimbo do projeto;
+# no IFC2X3, estilo sempre embrulhado em IfcPresentationStyleAssignment e OwnerHistory presente.
+# Código de saída 1 se qualquer comparação divergir (para rodar em CI / antes de mexer no writer).
+
+import re
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List
+
+from _util import load_engine
+
+TEXTO = "Tubulação Ø50 'PVC' \\ 1/2\" — ç 🚰"
+
+def modelo_sintetico(ifcopenshell, schema: str, destino: Path) -> List[Dict[str, Any]]:
+    """Grava o modelo em `destino` e devolve o change log (ifc_id, tag_visual, textos)."""
+    import ifcopenshell.api
+
+    run = ifcopenshell.api.run
+    model = run("project.create_file", version=schema)
+    # OwnerHistory (obrigatório no IFC2X3): usuário/aplicação fixos para o ifcopenshell.api
+    pessoa = run("owner.add_person", model, identification="QX", family_name="Quantix")
+    org = run("owner.add_organisation", model, identification="QX", name="Quantix")
+    usuario = run("owner.add_person_and_organisation", model, person=pessoa, organisation=org)
+    aplicacao = run("owner.add_application", model)
+    ifcopenshell.api.owner.settings.get_user = lambda f: usuario
+    ifcopenshell.api.owner.settings.get_application = lambda f: aplicacao
+    run("root.create_entity", model, ifc_class="IfcProject", name=f"Projeto {TEXTO}")
+    run("unit.assign_unit", model)
+    ctx = run("context.add_context", model, context_type="Model")
+    body = run("context.add_context", model, context_type="Model", context_identifier="Body",
+               target_view="MODEL_VIEW", parent=ctx)
+
+    def parede(nome: str, comprimento: float):
+        rep = run("geometry.add_wall_representation", model, context=body,
+                  length=comprimento, height=3.0, thickness=0.2)
+        el = run("root.create_entity", model, ifc_class="IfcWall", name=nome)
+        run("geometry.assign_representation", model, product=el, representation=rep)
+        return el
+
+    proprias = [parede(f"Parede {i}", 2.0 + i) for i in range(4)]
+    proprias[0].Description = TEXTO
+    proprias[1].Description = "já com 'descrição'"
+
+    # tipo com RepresentationMap: as instâncias recebem IfcMappedItem
+    tipo = run("root.create_entity", model, ifc_class="IfcWallType", name="Tipo mapeado")
+    rep = run("geometry.add_wall_representation", model, context=body, length=5.0, height=3.0, thickness=0.3)
+    run("geometry.assign_representation", model, product=tipo, representation=rep)
+    mapeadas = [run("root.create_entity", model, ifc_class="IfcWall", name=f"Instância {i}") for i in range(3)]
+    run("type.assign_type", model, related_objects=mapeadas, relating_type=tipo)
+
+    # segundo tipo: todas as instâncias no change log, todas ORANGE
+    uniforme = run("root.create_entity", model, ifc_class="IfcWallType", name="Tipo uniforme")
+    rep = run("geometry.add_wall_representation", model, context=body, length=4.0, height=3.0, thickness=0.2)
+    run("geometry.assign_representation", model, product=uniforme, representation=rep)
+    uniformes = [run("root.create_entity", model, ifc_class="IfcWall", name=f"Uniforme {i}") for i in range(2)]
+    run("type.assign_type", model, related_objects=uniformes, relating_type=uniforme)
+
+    sem_geometria = run("root.create_entity", model, ifc_class="IfcBuildingElementProxy", name="Sem geometria")
+    model.write(str(destino))
+
+    alvo = proprias + mapeadas + [sem_geometria]
+    change_log = [
+        {
+            "ifc_id": f"#{el.id()}",
+            # instâncias do tipo com o mesmo produto: no modo shared dividem o Pset
+            "produto": f"{'Tipo mapeado' if el in mapeadas else el.Name} | {TEXTO}",
+            "acao": "CLASH DETECTADO" if k % 3 == 1 else "OTIMIZAR",
+            "motivo": "Motivo ç \\X2\\ literal",
+            "referencia": "NBR 5626 'água fria'",
+            # mapeadas: RED e ORANGE no mesmo tipo -> cada IfcMappedItem com o próprio estilo
+            "tag_visual": "RED" if k % 3 == 1 else "ORANGE",
+        }
+        for k, el in enumerate(alvo)
+    ]
+    change_log += [
+        {"ifc_id": f"#{el.id()}", "produto": f"Tipo uniforme | {TEXTO}", "acao": "OTIMIZAR",
+         "motivo": "Motivo", "referencia": "NBR 5626", "tag_visual": "ORANGE"}
+        for el in uniformes
+    ]
+    change_log.append(dict(change_log[0]))  # duplicado: ignorado pelos dois writers
+    change_log.append({"ifc_id": "#999999", "produto": "inexistente", "tag_visual": "RED"})
+    return change_log
+
+def _props(pset) -> Dict[str, Any]:
+    out = {}
+    for p in pset.HasProperties or ():
+        v = p.NominalValue
+        out[p.Name] = v.wrappedValue if v is not None else None
+    return out
+
+def _nome_estilo(style) -> str:
+    if style.is_a("IfcPresentationStyleAssignment"):
+        return ",".join(_nome_estilo(s) for s in style.Styles)
+    return style.Name or ""
+
+def _cor(model, nome: str):
+    for st in model.by_type("IfcSurfaceStyle"):
+        if st.Name == nome:
+            for s in st.Styles:
+                c = s.SurfaceColour
+                return (round(c.Red, 6), round(c.Green, 6), round(c.Blue, 6))
+    return None
+
+def resumo(ifcopenshell, path: Path, quantix_pset: str, quantix_group: str) -> Dict[str, Any]:
+    model = ifcopenshell.open(str(path))
+    psets = [p for p in model.by_type("IfcPropertySet") if p.Name == quantix_pset]
+    pset_ids = {p.id() for p in psets}
+    rels = [r for r in model.by_type("IfcRelDefinesByProperties")
+            if r.RelatingPropertyDefinition.id() in pset_ids]
+    grupos = [g for g in model.by_type("IfcGroup") if g.Name == quantix_group]
+    grupo_ids = {g.id() for g in grupos}
+    rels_grupo = [r for r in model.by_type("IfcRelAssignsToGroup") if r.RelatingGroup.id() in grupo_ids]
+
+    por_elemento: Dict[int, Dict[str, Any]] = {}
+    for r in rels:
+        props = _props(r.RelatingPropertyDefinition)
+        props.pop("Timestamp", None)
+        for el in r.RelatedObjects:
+            por_elemento.setdefault(el.id(), {"psets": []})["psets"].append(tuple(sorted(props.items())))
+    for el_id, info in por_elemento.items():
+        info["psets"].sort()
+        info["description"] = model.by_id(el_id).Description
+
+    estilos: Dict[int, List[str]] = {}
+    sem_psa = 0
+    for si in model.by_type("IfcStyledItem"):
+        nomes = [_nome_estilo(s) for s in si.Styles]
+        if not any(n.startswith("Quantix_") for n in nomes) or si.Item is None:
+            continue
+        if model.schema == "IFC2X3" and not all(s.is_a("IfcPresentationStyleAssignment") for s in si.Styles):
+            sem_psa += 1
+        estilos.setdefault(si.Item.id(), []).extend(nomes)
+
+    # IFC2X3: OwnerHistory obrigatório em Pset/Rel/Group
+    sem_owner = sum(1 for e in psets + rels + grupos + rels_grupo if e.OwnerHistory is None) \
+        if model.schema == "IFC2X3" else 0
+    proj = model.by_type("IfcProject")[0].Description or ""
+    return {
+        "contagens": {
+            "Pset_QuantixOptimization": len(psets),
+            "IfcRelDefinesByProperties": len(rels),
+            "IfcGroup": len(grupos),
+            "IfcRelAssignsToGroup": len(rels_grupo),
+            "IfcStyledItem": sum(len(v) for v in estilos.values()),
+        },
+        "elementos": por_elemento,
+        "grupo": sorted(el.id() for r in rels_grupo for el in r.RelatedObjects),
+        "estilos": {k: sorted(v) for k, v in estilos.items()},
+        "cores": {n: _cor(model, n) for n in ("Quantix_Optimized_Orange", "Quantix_Optimized_Red")
+                  if any(n in v for v in estilos.values())},
+        "projeto": re.sub(r"\d{4}-\d\d-\d\d \d\d:\d\d:\d\d", "<stamp>", proj),
+        "estilo_sem_assignment_2x3": sem_psa,
+        "sem_owner_2x3": sem_owner,
+        "owner_histories": len(model.by_type("IfcOwnerHistory")),
+    }
+
+def comparar(nome: str, a: Dict[str, Any], b: Dict[str, Any]) -> List[str]:
+    erros = []
+    for chave in ("contagens", "grupo", "estilos", "cores", "projeto"):
+        if a[chave] != b[chave]:
+            erros.append(f"{nome}: {chave} diverge\n    ifcopenshell: {a[chave]}\n    patch STEP:   {b[chave]}")
+    for el_id in sorted(set(a["elementos"]) | set(b["elementos"])):
+        ea, eb = a["elementos"].get(el_id), b["elementos"].get(el_id)
+        if ea != eb:
+            erros.append(f"{nome}: #{el_id} diverge\n    ifcopenshell: {ea}\n    patch STEP:   {eb}")
+    for lado, r in (("ifcopenshell", a), ("patch STEP", b)):
+        if r["sem_owner_2x3"]:
+            erros.append(f"{nome}: {lado} com {r['sem_owner_2x3']} Pset/Rel/Group sem OwnerHistory (IFC2X3)")
+        if r["estilo_sem_assignment_2x3"]:
+            erros.append(f"{nome}: {lado} com {r['estilo_sem_assignment_2x3']} IfcStyledItem sem "
+                         "IfcPresentationStyleAssignment (IFC2X3)")
+    return erros
+
+def verificar(engine, ifcopenshell, nome: str, ifc_in: Path, disciplina: str,
+              change_log: List[Dict[str, Any]], work: Path) -> List[str]:
+    erros: List[str] = []
+    args = (disciplina, change_log, f"Empreendimento {TEXTO}", {"obs": TEXTO, "vazio": " "})
+    for shared in (False, True):
+        modo = "shared" if shared else "element"
+        out_ios = work / f"{ifc_in.stem}_ios_{modo}.ifc"
+        out_stp = work / f"{ifc_in.stem}_step_{modo}.ifc"
+        ok_a, msg_a = engine.apply_optimizations_ifc(
+            ifc_in, out_ios, *args, tenant_id="t'1", project_id="p/ç", shared_psets=shared)
+        ok_b, msg_b = engine.apply_optimizations_step(
+            ifc_in, out_stp, *args, tenant_id="t'1", project_id="p/ç",
+            engine_version=engine.ENGINE_VERSION, shared_psets=shared)
+        rotulo = f"{nome} [{modo}]"
+        if not (ok_a and ok_b):
+            erros.append(f"{rotulo}: writer falhou\n    ifcopenshell: {msg_a}\n    patch STEP:   {msg_b}")
+            continue
+        raw = out_stp.read_bytes()
+        if not raw.isascii():
+            erros.append(f"{rotulo}: patch STEP gravou bytes fora de ASCII (esperado \\X2\\/\\X4\\)")
+        a = resumo(ifcopenshell, out_ios, engine.QUANTIX_PSET, engine.QUANTIX_GROUP)
+        b = resumo(ifcopenshell, out_stp, engine.QUANTIX_PSET, engine.QUANTIX_GROUP)
+        diff = comparar(rotulo, a, b)
+        erros += diff
+        print(f"{rotulo:32} {'DIVERGE' if diff else 'ok'}  {b['contagens']} "
+              f"IfcOwnerHistory {a['owner_histories']}/{b['owner_histories']}")
+    return erros
+
+def main() -> None:
+    args = list(sys.argv[1:])
+    disciplina = "Hidraulica"
+    if "--disciplina" in args:
+        i = args.index("--disciplina")
+        disciplina = args[i + 1]
+        del args[i:i + 2]
+    engine = load_engine()
+    ifcopenshell = engine.try_import_ifcopenshell()
+    if ifcopenshell is None:
+        sys.exit("ifcopenshell não instalado")
+    work = Path(tempfile.mkdtemp(prefix="quantix_check_"))
+
+    erros: List[str] = []
+    if not args:
+        for schema in ("IFC2X3", "IFC4"):
+            ifc_in = work / f"ORIGINAL_{schema}.ifc"
+            change_log = modelo_sintetico(ifcopenshell, schema, ifc_in)
+            erros += verificar(engine, ifcopenshell, schema, ifc_in, disciplina, change_log, work)
+    for arg in args:
+        src = Path(arg).resolve()
+        ifc_in = work / f"ORIGINAL_{src.stem}{''.join(src.suffixes)}"
+        ifc_in.write_bytes(src.read_bytes())
+        file_hash = engine.file_sha256(ifc_in.read_bytes())
+        dados, ids_map = engine.analisar_ifc_arquivo(disciplina, ifc_in, file_hash)
+        change_log = engine.build_change_log(dados, ids_map)
+        erros += verificar(engine, ifcopenshell, src.name, ifc_in, disciplina, change_log, work)
+
+    for e in erros:
+        print(e)
+    if erros:
+        sys.exit(1)
+    print("patch STEP equivalente ao ifcopenshell")
+
+if __name__ == "__main__":
+    main()
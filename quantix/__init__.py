@@ -0,0 +1,2 @@
+# quantix — partes do engine QUANTIX importáveis fora do script Streamlit
+# (workers de process pool precisam de funções em módulo real, não em __main__).
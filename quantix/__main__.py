@@ -0,0 +1,8 @@
+# quantix/__main__.py — python -m quantix process ... (ver quantix/cli.py)
+
+import sys
+
+from quantix.cli import main
+
+if __name__ == "__main__":
+    sys.exit(main())
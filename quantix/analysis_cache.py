@@ -0,0 +1,221 @@
+# quantix/analysis_cache.py — cache persistente de análise IFC (SQLite em quantix_data/)
+#
+# Chave: (file_hash, disciplina, engine_version). Guarda dados_ifc (JSON) e o ids_map
+# compactado (#ids como deltas int64 por classe + zlib). Sobrevive a restart/redeploy.
+# Eviction LRU por tamanho total (QUANTIX_ANALYSIS_CACHE_MB) e contadores hit/miss.
+# Conexões do SQLitePool (quantix.db, WAL); hits não escrevem no banco (last_access/contadores em lote).
+
+import os
+import json
+import time
+import zlib
+import sqlite3
+import threading
+from array import array
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+from quantix.db import get_pool
+
+ANALYSIS_CACHE_MAX_BYTES = int(float(os.environ.get("QUANTIX_ANALYSIS_CACHE_MB", "512")) * 1024 * 1024)
+# last_access/contadores: gravados em lote a cada N registros ou S segundos (não a cada hit)
+ANALYSIS_CACHE_FLUSH_N = int(os.environ.get("QUANTIX_ANALYSIS_CACHE_FLUSH_N", "64") or 64)
+ANALYSIS_CACHE_FLUSH_S = float(os.environ.get("QUANTIX_ANALYSIS_CACHE_FLUSH_S", "30") or 30)
+
+def pack_ids_map(ids_map: Dict[str, List[str]]) -> Tuple[str, bytes]:
+    """ids_map -> (json {classe: n}, blob zlib de deltas int64). '#12' vira 12."""
+    counts: Dict[str, int] = {}
+    deltas = array("q")
+    for cls, ids in ids_map.items():
+        counts[cls] = len(ids)
+        prev = 0
+        for e in ids:
+            n = int(e[1:])
+            deltas.append(n - prev)
+            prev = n
+    return json.dumps(counts, separators=(",", ":")), zlib.compress(deltas.tobytes(), 6)
+
+def unpack_ids_map(counts_json: str, blob: bytes) -> Dict[str, List[str]]:
+    deltas = array("q")
+    deltas.frombytes(zlib.decompress(blob))
+    out: Dict[str, List[str]] = {}
+    pos = 0
+    for cls, n in json.loads(counts_json).items():
+        ids: List[str] = []
+        cur = 0
+        for d in deltas[pos:pos + n]:
+            cur += d
+            ids.append(f"#{cur}")
+        out[cls] = ids
+        pos += n
+    return out
+
+class AnalysisCache:
+    """
+    Tabelas no SQLitePool do próprio arquivo (quantix.db): lookups numa conexão de leitura do pool.
+    last_access e contadores de hit/miss ficam em memória e vão para o banco em lote (a cada
+    ANALYSIS_CACHE_FLUSH_N registros ou ANALYSIS_CACHE_FLUSH_S segundos, e em todo put): um hit
+    não abre transação de escrita. stats() soma o que ainda não foi gravado.
+    """
+
+    def __init__(self, db_path: Path, max_bytes: int = ANALYSIS_CACHE_MAX_BYTES):
+        self.db_path = Path(db_path)
+        self.max_bytes = int(max_bytes)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.pool = get_pool(self.db_path)
+        self._lock = threading.Lock()
+        self._acessos: Dict[Tuple[str, str, str], float] = {}
+        self._contadores: Dict[str, int] = {}
+        self._n_pendentes = 0
+        self._ultimo_flush = time.monotonic()
+        self.pool.once("analysis_cache_schema", self._init_schema)
+
+    def _init_schema(self) -> None:
+        with self.pool.write("analysis_cache_schema") as con:
+            con.execute("""
+            CREATE TABLE IF NOT EXISTS analysis_cache (
+                file_hash TEXT NOT NULL,
+                disciplina TEXT NOT NULL,
+                engine_version TEXT NOT NULL,
+                dados_json TEXT NOT NULL,
+                ids_counts_json TEXT NOT NULL,
+                ids_blob BLOB NOT NULL,
+                size_bytes INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (file_hash, disciplina, engine_version)
+            );
+            """)
+            con.execute("CREATE INDEX IF NOT EXISTS idx_analysis_cache_lru ON analysis_cache(last_access);")
+            con.execute("""
+            CREATE TABLE IF NOT EXISTS analysis_cache_stats (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            );
+            """)
+
+    def _registrar(self, nome: str, key: Optional[Tuple[str, str, str]] = None) -> None:
+        with self._lock:
+            self._contadores[nome] = self._contadores.get(nome, 0) + 1
+            if key is not None:
+                self._acessos[key] = time.time()
+            self._n_pendentes += 1
+            vencido = (self._n_pendentes >= ANALYSIS_CACHE_FLUSH_N
+                       or time.monotonic() - self._ultimo_flush >= ANALYSIS_CACHE_FLUSH_S)
+        if vencido:
+            try:
+                self.flush()
+            except sqlite3.Error:
+                pass  # banco ocupado: fica para o próximo flush
+
+    def _tomar_pendentes(self) -> Tuple[Dict[Tuple[str, str, str], float], Dict[str, int]]:
+        with self._lock:
+            acessos, contadores = self._acessos, self._contadores
+            self._acessos, self._contadores = {}, {}
+            self._n_pendentes = 0
+            self._ultimo_flush = time.monotonic()
+        return acessos, contadores
+
+    def _gravar_pendentes(self, con: sqlite3.Connection, acessos: Dict[Tuple[str, str, str], float],
+                          contadores: Dict[str, int]) -> None:
+        if acessos:
+            con.executemany("""
+                UPDATE analysis_cache SET last_access=MAX(last_access, ?)
+                WHERE file_hash=? AND disciplina=? AND engine_version=?
+            """, [(ts, *key) for key, ts in acessos.items()])
+        for nome, n in contadores.items():
+            self._bump(con, nome, n)
+
+    def flush(self) -> None:
+        """Grava last_access e contadores acumulados numa transação só."""
+        acessos, contadores = self._tomar_pendentes()
+        if not acessos and not contadores:
+            return
+        try:
+            with self.pool.write("analysis_cache_flush") as con:
+                self._gravar_pendentes(con, acessos, contadores)
+        except BaseException:
+            self._devolver(acessos, contadores)
+            raise
+
+    def _devolver(self, acessos: Dict[Tuple[str, str, str], float], contadores: Dict[str, int]) -> None:
+        with self._lock:
+            for key, ts in acessos.items():
+                self._acessos[key] = max(ts, self._acessos.get(key, 0.0))
+            for nome, n in contadores.items():
+                self._contadores[nome] = self._contadores.get(nome, 0) + n
+            self._n_pendentes += len(acessos) + len(contadores)
+
+    def _bump(self, con: sqlite3.Connection, name: str, n: int = 1) -> None:
+        con.execute("""
+            INSERT INTO analysis_cache_stats (name, value) VALUES (?, ?)
+            ON CONFLICT(name) DO UPDATE SET value = value + excluded.value
+        """, (name, n))
+
+    def get(self, file_hash: str, disciplina: str, engine_version: str) -> Optional[Tuple[Dict[str, Any], Dict[str, List[str]]]]:
+        key = (file_hash, disciplina, engine_version)
+        with self.pool.read("analysis_cache_get") as con:
+            r = con.execute("""
+                SELECT dados_json, ids_counts_json, ids_blob FROM analysis_cache
+                WHERE file_hash=? AND disciplina=? AND engine_version=?
+            """, key).fetchone()
+        if r is None:
+            self._registrar("misses")
+            return None
+        self._registrar("hits", key)
+        try:
+            return json.loads(r[0]), unpack_ids_map(r[1], r[2])
+        except Exception:
+            return None
+
+    def put(self, file_hash: str, disciplina: str, engine_version: str,
+            dados_ifc: Dict[str, Any], ids_map: Dict[str, List[str]]) -> None:
+        dados_json = json.dumps(dados_ifc, ensure_ascii=False, separators=(",", ":"))
+        counts_json, blob = pack_ids_map(ids_map)
+        size = len(dados_json.encode("utf-8")) + len(counts_json) + len(blob)
+        now = time.time()
+        # os acessos pendentes entram antes da eviction (o LRU vê os hits recentes)
+        acessos, contadores = self._tomar_pendentes()
+        try:
+            with self.pool.write("analysis_cache_put") as con:
+                self._gravar_pendentes(con, acessos, contadores)
+                con.execute("""
+                    INSERT OR REPLACE INTO analysis_cache (
+                        file_hash, disciplina, engine_version, dados_json,
+                        ids_counts_json, ids_blob, size_bytes, created_at, last_access
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, (file_hash, disciplina, engine_version, dados_json, counts_json, blob, size, now, now))
+                self._evict(con)
+        except BaseException:
+            self._devolver(acessos, contadores)
+            raise
+
+    def _evict(self, con: sqlite3.Connection) -> None:
+        total = int(con.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM analysis_cache").fetchone()[0])
+        if total <= self.max_bytes:
+            return
+        evicted = 0
+        for rowid, size in con.execute("SELECT rowid, size_bytes FROM analysis_cache ORDER BY last_access ASC").fetchall():
+            if total <= self.max_bytes:
+                break
+            con.execute("DELETE FROM analysis_cache WHERE rowid=?", (rowid,))
+            total -= int(size)
+            evicted += 1
+        if evicted:
+            self._bump(con, "evictions", evicted)
+
+    def stats(self) -> Dict[str, int]:
+        with self.pool.read("analysis_cache_stats") as con:
+            out = {name: int(v) for name, v in con.execute("SELECT name, value FROM analysis_cache_stats")}
+            n, total = con.execute("SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM analysis_cache").fetchone()
+        with self._lock:
+            for name, v in self._contadores.items():
+                out[name] = out.get(name, 0) + v
+        return {
+            "hits": out.get("hits", 0),
+            "misses": out.get("misses", 0),
+            "evictions": out.get("evictions", 0),
+            "entries": int(n),
+            "size_bytes": int(total),
+            "max_bytes": self.max_bytes,
+        }
@@ -0,0 +1,242 @@
+# quantix/artifact_io.py — artefatos IFC comprimidos (gzip em blocos) com leitura transparente
+#
+# Formato "<nome>.ifc.gz": sequência de membros gzip independentes de GZ_BLOCK bytes de texto
+# (como BGZF). É um .gz válido — gunzip/7-Zip/navegador abrem direto — e cada membro leva no
+# campo FEXTRA ('QX') o próprio tamanho comprimido, então o índice bloco -> offset é montado
+# lendo só os cabeçalhos/trailers. Com isso:
+# - open_artifact() devolve um arquivo binário seekable em offsets do texto original
+#   (scanner, sidecar .qidx, patch STEP e lookup por #id funcionam sem descomprimir tudo)
+# - só os blocos tocados são descomprimidos (LRU pequeno por leitor)
+# - create_artifact() comprime em streaming na escrita (memória ~ 1 bloco)
+# Arquivos sem o sufixo .gz seguem lidos/escritos em texto puro (artefatos antigos).
+# Uploads .ifczip (ZIP com um .ifc) e .ifc.gz são descomprimidos em streaming por open_ifc_upload.
+
+import io
+import os
+import gzip
+import zlib
+import shutil
+import struct
+import bisect
+import zipfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import BinaryIO, List, Optional, Tuple
+
+ARTIFACT_COMPRESS = os.environ.get("QUANTIX_ARTIFACT_COMPRESS", "1").strip().lower() not in ("0", "false", "no", "")
+ARTIFACT_GZ_LEVEL = int(os.environ.get("QUANTIX_ARTIFACT_GZ_LEVEL", "6") or 6)
+GZ_SUFFIX = ".gz"
+GZ_BLOCK = 256 * 1024
+GZ_CACHE_BLOCKS = 32
+
+# cabeçalho gzip: ID1 ID2 CM=8 FLG=FEXTRA | MTIME=0 | XFL | OS=255 | XLEN | 'QX' SLEN BSIZE(u32)
+_HEADER = struct.Struct("<4sIBBH2sHI")
+_MAGIC = b"\x1f\x8b\x08\x04"
+_TRAILER = 8
+
+def is_compressed(path: Path) -> bool:
+    return str(path).lower().endswith(GZ_SUFFIX)
+
+def compressed_name(name: str) -> str:
+    return name + GZ_SUFFIX if ARTIFACT_COMPRESS else name
+
+def _member(raw: bytes, level: int) -> bytes:
+    co = zlib.compressobj(level, zlib.DEFLATED, -15)
+    body = co.compress(raw) + co.flush()
+    total = _HEADER.size + len(body) + _TRAILER
+    head = _HEADER.pack(_MAGIC, 0, 0, 255, 8, b"QX", 4, total)
+    return head + body + struct.pack("<II", zlib.crc32(raw), len(raw) & 0xFFFFFFFF)
+
+class GzBlockWriter(io.RawIOBase):
+    def __init__(self, fp: BinaryIO, level: int = ARTIFACT_GZ_LEVEL, block: int = GZ_BLOCK):
+        self._fp = fp
+        self._level = level
+        self._block = block
+        self._buf = bytearray()
+        self._members = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self._buf += b
+        while len(self._buf) >= self._block:
+            self._fp.write(_member(bytes(self._buf[: self._block]), self._level))
+            del self._buf[: self._block]
+            self._members += 1
+        return len(b)
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        if self._buf or not self._members:
+            self._fp.write(_member(bytes(self._buf), self._level))
+            self._buf.clear()
+        self._fp.close()
+        super().close()
+
+# (path, size, mtime_ns) -> (offsets comprimidos, offsets no texto, tamanhos no texto)
+_Index = Tuple[List[int], List[int], List[int]]
+_INDEX_CACHE: "OrderedDict[Tuple[str, int, int], _Index]" = OrderedDict()
+_INDEX_LOCK = threading.Lock()
+
+def _block_index(path: Path) -> Optional[_Index]:
+    """Índice dos blocos (só cabeçalhos/trailers); None se não for o formato em blocos."""
+    st = os.stat(path)
+    key = (str(path), st.st_size, st.st_mtime_ns)
+    with _INDEX_LOCK:
+        hit = _INDEX_CACHE.get(key)
+        if hit is not None:
+            _INDEX_CACHE.move_to_end(key)
+            return hit
+    comp: List[int] = []
+    raw: List[int] = []
+    sizes: List[int] = []
+    pos = text = 0
+    with open(path, "rb") as fp:
+        while pos < st.st_size:
+            fp.seek(pos)
+            head = fp.read(_HEADER.size)
+            if len(head) < _HEADER.size:
+                return None
+            magic, _mt, _xfl, _os, xlen, sub, slen, total = _HEADER.unpack(head)
+            if magic != _MAGIC or xlen != 8 or sub != b"QX" or slen != 4:
+                return None
+            fp.seek(pos + total - 4)
+            (isize,) = struct.unpack("<I", fp.read(4))
+            comp.append(pos)
+            raw.append(text)
+            sizes.append(isize)
+            pos += total
+            text += isize
+    out = (comp, raw, sizes)
+    with _INDEX_LOCK:
+        _INDEX_CACHE[key] = out
+        while len(_INDEX_CACHE) > 256:
+            _INDEX_CACHE.popitem(last=False)
+    return out
+
+class GzBlockReader(io.RawIOBase):
+    """Leitura seekable (offsets do texto) sobre o .gz em blocos."""
+
+    def __init__(self, path: Path, index: _Index, cache_blocks: int = GZ_CACHE_BLOCKS):
+        self._fp = open(path, "rb")
+        self._file_size = os.fstat(self._fp.fileno()).st_size
+        self._comp, self._raw, self._sizes = index
+        self._cache: "OrderedDict[int, bytes]" = OrderedDict()
+        self._cache_blocks = cache_blocks
+        self._pos = 0
+        self.size = (self._raw[-1] + self._sizes[-1]) if self._raw else 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += self.size
+        self._pos = max(0, offset)
+        return self._pos
+
+    def _block(self, k: int) -> bytes:
+        data = self._cache.get(k)
+        if data is not None:
+            self._cache.move_to_end(k)
+            return data
+        start = self._comp[k]
+        end = self._comp[k + 1] if k + 1 < len(self._comp) else self._file_size
+        self._fp.seek(start + _HEADER.size)
+        body = self._fp.read(end - start - _HEADER.size - _TRAILER)
+        data = zlib.decompress(body, -15)
+        self._cache[k] = data
+        if len(self._cache) > self._cache_blocks:
+            self._cache.popitem(last=False)
+        return data
+
+    def readinto(self, b) -> int:
+        if self._pos >= self.size:
+            return 0
+        k = bisect.bisect_right(self._raw, self._pos) - 1
+        data = self._block(k)
+        off = self._pos - self._raw[k]
+        n = min(len(b), len(data) - off)
+        b[:n] = data[off:off + n]
+        self._pos += n
+        return n
+
+    def close(self) -> None:
+        if not self.closed:
+            self._fp.close()
+            self._cache.clear()
+        super().close()
+
+def open_artifact(path: Path, buffering: int = 1024 * 1024) -> BinaryIO:
+    """Abre um IFC (texto ou .gz) para leitura binária; offsets são sempre os do texto."""
+    path = Path(path)
+    if not is_compressed(path):
+        return open(path, "rb")
+    index = _block_index(path)
+    if index is None:
+        return gzip.open(path, "rb")  # gzip comum (upload externo): sequencial, seek lento
+    return io.BufferedReader(GzBlockReader(path, index), buffering)
+
+def create_artifact(path: Path, compress: Optional[bool] = None, level: int = ARTIFACT_GZ_LEVEL) -> BinaryIO:
+    """Abre para escrita; compress=None decide pelo sufixo .gz do caminho."""
+    path = Path(path)
+    compress = is_compressed(path) if compress is None else compress
+    if not compress:
+        return open(path, "wb")
+    return io.BufferedWriter(GzBlockWriter(open(path, "wb"), level), GZ_BLOCK)
+
+def artifact_size(path: Path) -> int:
+    """Tamanho do texto IFC (descomprimido)."""
+    path = Path(path)
+    if not is_compressed(path):
+        return os.path.getsize(path)
+    index = _block_index(path)
+    if index is not None:
+        return (index[1][-1] + index[2][-1]) if index[1] else 0
+    with gzip.open(path, "rb") as fp:
+        return fp.seek(0, io.SEEK_END)
+
+def _zip_member(zf: zipfile.ZipFile) -> zipfile.ZipInfo:
+    infos = [i for i in zf.infolist() if not i.is_dir()]
+    ifcs = [i for i in infos if i.filename.lower().endswith(".ifc")]
+    if not ifcs:
+        raise ValueError("ifczip sem arquivo .ifc")
+    return max(ifcs, key=lambda i: i.file_size)
+
+def open_ifc_upload(fp: BinaryIO) -> Tuple[BinaryIO, bool]:
+    """
+    Texto IFC de um upload, em streaming: gzip e ZIP (.ifczip) são detectados pelos bytes
+    iniciais, não pela extensão. Retorna (leitor, veio_comprimido). `fp` precisa ser seekable.
+    """
+    fp.seek(0)
+    head = fp.read(4)
+    fp.seek(0)
+    if head[:2] == b"\x1f\x8b":
+        return gzip.GzipFile(fileobj=fp, mode="rb"), True
+    if head == b"PK\x03\x04":
+        zf = zipfile.ZipFile(fp)
+        return zf.open(_zip_member(zf)), True
+    return fp, False
+
+def compress_file(src: Path, dst: Path, level: int = ARTIFACT_GZ_LEVEL) -> int:
+    """Texto -> .gz em blocos (streaming). Retorna o tamanho gravado."""
+    with open_artifact(src) as fin, create_artifact(dst, True, level) as fout:
+        shutil.copyfileobj(fin, fout, GZ_BLOCK)
+    return os.path.getsize(dst)
+
+def decompress_file(src: Path, dst: Path) -> Path:
+    """Materializa o texto (para ifcopenshell.open, que não lê .gz)."""
+    with open_artifact(src) as fin, open(dst, "wb") as fout:
+        shutil.copyfileobj(fin, fout, GZ_BLOCK)
+    return Path(dst)
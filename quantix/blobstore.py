@@ -0,0 +1,192 @@
+# quantix/blobstore.py — armazenamento endereçado por conteúdo (SHA-256) dos uploads
+#
+# - cada conteúdo existe uma vez em disco: quantix_data/blobs/<hh>/<sha256><ext>
+# - blob_refs liga (projeto, tipo) -> hash; blobs.refcount é mantido por triggers
+# - release(project_id) remove as referências do projeto e apaga só os blobs que
+#   ficaram sem nenhuma referência (junto com o sidecar .qidx, que é derivado do conteúdo)
+# - uso_disco(tenant) separa bytes lógicos (soma por projeto) de físicos (blobs distintos, já comprimidos)
+# - put(..., compress=True) grava o blob como .gz em blocos (quantix.artifact_io); o hash é o do conteúdo original
+# Criação/remoção de arquivo e das linhas acontecem sob o escritor único do pool,
+# então um put concorrente nunca referencia um blob que um release acabou de apagar.
+
+import os
+import uuid
+import shutil
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, Iterable, Optional
+
+from quantix.db import SQLitePool
+from quantix.entity_index import entity_index_path
+from quantix.artifact_io import compress_file, decompress_file, is_compressed
+
+def _now_iso() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+def _materializar(src: Path, dst: Path, compress: bool = False) -> None:
+    # hardlink (O(1)) quando o formato já bate (texto/texto, .gz/.gz); tmp + replace para nunca expor um blob incompleto
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dst.with_name(f"{dst.name}.{uuid.uuid4().hex}.part")
+    if compress and not is_compressed(src):
+        compress_file(src, tmp)
+    elif is_compressed(src) and not compress:
+        decompress_file(src, tmp)
+    else:
+        try:
+            os.link(src, tmp)
+        except Exception:
+            shutil.copyfile(src, tmp)
+    tmp.replace(dst)
+
+class BlobStore:
+    def __init__(self, root: Path, pool: SQLitePool):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.pool = pool
+        pool.once("blobstore_schema", self._init_schema)
+
+    def _init_schema(self) -> None:
+        with self.pool.write("blobstore_schema") as con:
+            con.execute("""
+            CREATE TABLE IF NOT EXISTS blobs (
+                hash TEXT PRIMARY KEY,
+                path TEXT NOT NULL,
+                size_bytes INTEGER NOT NULL,
+                stored_bytes INTEGER NOT NULL DEFAULT 0,
+                refcount INTEGER NOT NULL DEFAULT 0,
+                created_at_iso TEXT NOT NULL
+            );
+            """)
+            con.execute("""
+            CREATE TABLE IF NOT EXISTS blob_refs (
+                project_id TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                tenant_id TEXT NOT NULL,
+                hash TEXT NOT NULL REFERENCES blobs(hash),
+                created_at_iso TEXT NOT NULL,
+                PRIMARY KEY (project_id, kind)
+            );
+            """)
+            cols = {r["name"] for r in con.execute("PRAGMA table_info(blobs)").fetchall()}
+            if "stored_bytes" not in cols:
+                con.execute("ALTER TABLE blobs ADD COLUMN stored_bytes INTEGER NOT NULL DEFAULT 0")
+            con.execute("UPDATE blobs SET stored_bytes = size_bytes WHERE stored_bytes = 0")
+            con.execute("CREATE INDEX IF NOT EXISTS idx_blob_refs_hash ON blob_refs(hash, tenant_id);")
+            con.execute("CREATE INDEX IF NOT EXISTS idx_blob_refs_tenant ON blob_refs(tenant_id, hash);")
+            con.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_blob_refs_ins AFTER INSERT ON blob_refs BEGIN
+                UPDATE blobs SET refcount = refcount + 1 WHERE hash = NEW.hash;
+            END;
+            """)
+            con.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_blob_refs_del AFTER DELETE ON blob_refs BEGIN
+                UPDATE blobs SET refcount = refcount - 1 WHERE hash = OLD.hash;
+            END;
+            """)
+
+    def path_for(self, file_hash: str, suffix: str = "") -> Path:
+        return self.root / file_hash[:2] / f"{file_hash}{suffix.lower()}"
+
+    def contains(self, path: Optional[str]) -> bool:
+        """True se o caminho aponta para dentro do store (não deve ser apagado diretamente)."""
+        if not path:
+            return False
+        try:
+            Path(str(path)).resolve().relative_to(self.root.resolve())
+            return True
+        except ValueError:
+            return False
+
+    def put(self, tenant_id: str, project_id: str, kind: str, src: Path, file_hash: str, size: int,
+            suffix: str = "", compress: bool = False) -> Path:
+        """
+        Referencia o conteúdo de `src` (hash já calculado) para (project_id, kind).
+        Só grava em disco se o hash ainda não existir. Retorna o caminho do blob
+        (um blob já existente mantém o formato com que foi gravado).
+        """
+        dst = self.path_for(file_hash, suffix)
+        if not dst.exists():
+            _materializar(Path(src), dst, compress)
+        with self.pool.write("blob_put") as con:
+            row = con.execute("SELECT path FROM blobs WHERE hash=?", (file_hash,)).fetchone()
+            if row is not None:
+                dst = Path(row["path"])
+            if not dst.exists():
+                # um release concorrente apagou o arquivo entre o exists() e o lock
+                _materializar(Path(src), dst, compress)
+            if row is None:
+                con.execute(
+                    "INSERT INTO blobs (hash, path, size_bytes, stored_bytes, refcount, created_at_iso) VALUES (?, ?, ?, ?, 0, ?)",
+                    (file_hash, str(dst), int(size), dst.stat().st_size, _now_iso()),
+                )
+            old = con.execute(
+                "SELECT hash FROM blob_refs WHERE project_id=? AND kind=?", (project_id, kind)
+            ).fetchone()
+            con.execute("DELETE FROM blob_refs WHERE project_id=? AND kind=?", (project_id, kind))
+            con.execute(
+                "INSERT INTO blob_refs (project_id, kind, tenant_id, hash, created_at_iso) VALUES (?, ?, ?, ?, ?)",
+                (project_id, kind, tenant_id, file_hash, _now_iso()),
+            )
+            if old is not None and old["hash"] != file_hash:
+                self._coletar(con, [old["hash"]])
+        return dst
+
+    def release(self, project_id: str) -> int:
+        """Remove as referências do projeto; retorna quantos blobs foram liberados do disco."""
+        with self.pool.write("blob_release") as con:
+            hashes = [r["hash"] for r in con.execute(
+                "SELECT hash FROM blob_refs WHERE project_id=?", (project_id,)
+            ).fetchall()]
+            if not hashes:
+                return 0
+            con.execute("DELETE FROM blob_refs WHERE project_id=?", (project_id,))
+            return self._coletar(con, hashes)
+
+    def _coletar(self, con, hashes: Iterable[str]) -> int:
+        n = 0
+        for h in set(hashes):
+            row = con.execute("SELECT path, refcount FROM blobs WHERE hash=?", (h,)).fetchone()
+            if row is None or int(row["refcount"]) > 0:
+                continue
+            con.execute("DELETE FROM blobs WHERE hash=?", (h,))
+            p = Path(row["path"])
+            for f in (p, entity_index_path(p)):
+                try:
+                    f.unlink()
+                except FileNotFoundError:
+                    pass
+            try:
+                p.parent.rmdir()
+            except OSError:
+                pass
+            n += 1
+        return n
+
+    def uso_disco(self, tenant_id: str) -> Dict[str, Any]:
+        """
+        Uso do store por tenant:
+        - bytes_logicos: soma do tamanho de cada referência (o que ocuparia sem deduplicação)
+        - bytes_fisicos: blobs distintos referenciados pelo tenant, como estão em disco (comprimidos)
+        - bytes_exclusivos: blobs referenciados só por este tenant (liberados se ele sair)
+        """
+        with self.pool.read("blob_uso_disco") as con:
+            logico = con.execute("""
+                SELECT COUNT(*) AS n, COALESCE(SUM(b.size_bytes), 0) AS bytes
+                FROM blob_refs r JOIN blobs b ON b.hash = r.hash
+                WHERE r.tenant_id=?
+            """, (tenant_id,)).fetchone()
+            fisico = con.execute("""
+                SELECT COUNT(*) AS n, COALESCE(SUM(b.stored_bytes), 0) AS bytes,
+                       COALESCE(SUM(CASE WHEN NOT EXISTS (
+                           SELECT 1 FROM blob_refs o WHERE o.hash = b.hash AND o.tenant_id <> ?
+                       ) THEN b.stored_bytes ELSE 0 END), 0) AS exclusivos
+                FROM blobs b
+                WHERE b.hash IN (SELECT hash FROM blob_refs WHERE tenant_id=?)
+            """, (tenant_id, tenant_id)).fetchone()
+        return {
+            "referencias": int(logico["n"]),
+            "blobs": int(fisico["n"]),
+            "bytes_logicos": int(logico["bytes"]),
+            "bytes_fisicos": int(fisico["bytes"]),
+            "bytes_exclusivos": int(fisico["exclusivos"]),
+        }
@@ -0,0 +1,175 @@
+# quantix/cli.py — processamento em lote sem navegador (cron, worker, linha de comando)
+#
+#   python -m quantix process --tenant X --disciplina Hidraulica arquivos/*.ifc pasta/ --workers 8
+#
+# - diretórios são expandidos (IFC/IFCZIP/.ifc.gz/PDF; --recursive desce nas subpastas)
+# - cada arquivo vira um job salvar_projeto do mesmo lote (batch_id) na fila SQLite; um JobWorkerPool
+#   local com --workers processos drena só esse lote -> mesmas linhas no banco e mesmos artefatos da UI
+#   (os jobs ficam com owner_id deste processo: o pool do servidor, na mesma base, não os pega)
+# - empreendimento: --empreendimento, ou o nome da pasta de cada arquivo
+# - imprime a tabela por arquivo e o tempo de parede; código de saída 1 se algum arquivo falhou
+# Não importa streamlit; quantix.engine só é importado depois de --data-dir (QUANTIX_DATA_DIR).
+
+import os
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Callable, Iterable
+
+from quantix.jobs import JobWorkerPool, JOB_WORKERS, JOB_ACTIVE, batch_summary
+
+DISCIPLINAS = ("Eletrica", "Hidraulica", "Estrutural")
+ENTRADA_SUFIXOS = (".ifc", ".ifczip", ".ifc.gz", ".pdf")
+POLL_S = 0.5
+
+def expandir_entradas(entradas: Iterable[str], recursive: bool = False) -> List[Path]:
+    """Arquivos na ordem dada; diretórios viram seus IFC/PDF (ordenados). Sem duplicatas."""
+    out: List[Path] = []
+    vistos = set()
+    for e in entradas:
+        p = Path(e)
+        if p.is_dir():
+            it = p.rglob("*") if recursive else p.glob("*")
+            achados = sorted(f for f in it if f.is_file() and f.name.lower().endswith(ENTRADA_SUFIXOS))
+        elif p.is_file():
+            achados = [p]
+        else:
+            raise FileNotFoundError(f"entrada não encontrada: {e}")
+        for f in achados:
+            k = f.resolve()
+            if k not in vistos:
+                vistos.add(k)
+                out.append(f)
+    return out
+
+def processar_lote(
+    arquivos: List[Path],
+    tenant_id: str,
+    disciplina: str,
+    user_id: str = "cli",
+    empreendimento: Optional[str] = None,
+    props: Optional[dict] = None,
+    workers: int = JOB_WORKERS,
+    on_job: Optional[Callable[[Dict[str, Any], int, int], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Spool + enqueue de cada arquivo (um lote) e execução local com `workers` processos.
+    Retorna {"batch_id", "jobs", "resumo", "projetos"}; on_job(job, i, n) a cada job terminado.
+    """
+    from quantix import engine
+
+    if disciplina not in DISCIPLINAS:
+        raise ValueError(f"disciplina inválida: {disciplina} (use {', '.join(DISCIPLINAS)})")
+    # mesmos ids da UI: linhas no banco e pasta do tenant (sem '..' / '/' saindo de DATA_DIR)
+    tenant_id = engine.normalize_tenant(tenant_id)
+    user_id = engine.normalize_user(user_id)
+    uploads_dir = engine.tenant_root(tenant_id) / "uploads"
+    batch_id = engine.make_project_id()
+    for f in arquivos:
+        with open(f, "rb") as fp:
+            upload = engine.spool_upload(fp, uploads_dir)
+        emp = empreendimento or f.resolve().parent.name
+        engine.enfileirar_projeto(tenant_id, user_id, emp, disciplina, upload, props or {}, batch_id=batch_id,
+                                  owned=True)
+
+    pool = JobWorkerPool(engine.JOB_QUEUE, engine.executar_job, workers=workers, batch_id=batch_id)
+    vistos = set()
+    try:
+        while True:
+            jobs = engine.JOB_QUEUE.list_batch(batch_id, tenant_id)
+            for j in jobs:
+                if j["status"] not in JOB_ACTIVE and j["job_id"] not in vistos:
+                    vistos.add(j["job_id"])
+                    if on_job:
+                        on_job(j, len(vistos), len(jobs))
+            if len(vistos) == len(jobs):
+                break
+            time.sleep(POLL_S)
+    finally:
+        pool.stop()
+    projetos = {j["job_id"]: engine.carregar_por_project(j["job_id"], tenant_id) for j in jobs}
+    return {"batch_id": batch_id, "jobs": jobs, "resumo": batch_summary(jobs), "projetos": projetos}
+
+def _linhas(res: Dict[str, Any]) -> List[Dict[str, Any]]:
+    out = []
+    for j in res["jobs"]:
+        r = j.get("result") or {}
+        p = res["projetos"].get(j["job_id"]) or {}
+        out.append({
+            "arquivo": j["payload"].get("upload", {}).get("name", "-"),
+            "status": r.get("status") or j["status"],
+            "economia": p.get("economia_itens"),
+            "confianca": p.get("confianca_score"),
+            "tempo_s": r.get("elapsed_s"),
+            "project_id": j["job_id"],
+            "mensagem": "; ".join(r.get("warnings") or []) or j["message"],
+        })
+    return out
+
+def _tabela(linhas: List[Dict[str, Any]]) -> str:
+    cols = ["arquivo", "status", "economia", "confianca", "tempo_s", "project_id", "mensagem"]
+    txt = [[("" if ln[c] is None else str(ln[c])) for c in cols] for ln in linhas]
+    larg = [max([len(c)] + [len(t[i]) for t in txt]) for i, c in enumerate(cols)]
+    larg[-1] = min(larg[-1], 60)
+    fmt = lambda vals: "  ".join(v[:w].ljust(w) for v, w in zip(vals, larg)).rstrip()
+    return "\n".join([fmt(cols), fmt(["-" * w for w in larg])] + [fmt(t) for t in txt])
+
+def cmd_process(args: argparse.Namespace) -> int:
+    if args.data_dir:
+        os.environ["QUANTIX_DATA_DIR"] = str(Path(args.data_dir).resolve())
+    from quantix.engine import normalize_tenant
+
+    args.tenant = normalize_tenant(args.tenant)
+    arquivos = expandir_entradas(args.entradas, args.recursive)
+    if not arquivos:
+        print("nenhum arquivo IFC/IFCZIP/PDF encontrado", file=sys.stderr)
+        return 2
+    props = json.loads(Path(args.props).read_text(encoding="utf-8")) if args.props else {}
+
+    def on_job(j: Dict[str, Any], i: int, n: int) -> None:
+        if args.json:
+            return
+        r = j.get("result") or {}
+        print(f"[{i}/{n}] {r.get('status') or j['status']:<18} {j['payload']['upload']['name']}"
+              f"  {r.get('elapsed_s', '-')}s", flush=True)
+
+    if not args.json:
+        print(f"{len(arquivos)} arquivo(s) • tenant {args.tenant} • {args.disciplina} • {args.workers} worker(s)", flush=True)
+    res = processar_lote(
+        arquivos, args.tenant, args.disciplina, user_id=args.user, empreendimento=args.empreendimento,
+        props=props, workers=args.workers, on_job=on_job,
+    )
+    linhas = _linhas(res)
+    r = res["resumo"]
+    if args.json:
+        print(json.dumps({"batch_id": res["batch_id"], "resumo": r, "arquivos": linhas}, ensure_ascii=False, indent=2))
+    else:
+        print()
+        print(_tabela(linhas))
+        print()
+        print(f"lote {res['batch_id']}: {r['concluidos']}/{r['n']} concluído(s), {r['erros']} erro(s) • "
+              f"tempo total {r['wall_s']:.1f}s (soma por arquivo {r['soma_s']:.1f}s)")
+    return 1 if r["erros"] else 0
+
+def build_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(prog="quantix", description="QUANTIX sem interface (processamento em lote).")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("process", help="processa arquivos/pastas IFC como um lote")
+    p.add_argument("entradas", nargs="+", help="arquivos .ifc/.ifczip/.ifc.gz/.pdf ou pastas")
+    p.add_argument("--tenant", required=True)
+    p.add_argument("--disciplina", required=True, choices=DISCIPLINAS)
+    p.add_argument("--empreendimento", help="padrão: nome da pasta de cada arquivo")
+    p.add_argument("--user", default="cli")
+    p.add_argument("--props", help="JSON com as propriedades do formulário (mesmas chaves da UI)")
+    p.add_argument("--workers", type=int, default=JOB_WORKERS, help=f"processos em paralelo (padrão {JOB_WORKERS})")
+    p.add_argument("--recursive", action="store_true", help="desce nas subpastas")
+    p.add_argument("--data-dir", help="quantix_data a usar (padrão QUANTIX_DATA_DIR ou ./quantix_data)")
+    p.add_argument("--json", action="store_true", help="saída em JSON (resumo + arquivos)")
+    p.set_defaults(fn=cmd_process)
+    return ap
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.fn(args)
@@ -0,0 +1,142 @@
+# quantix/db.py — pool de conexões SQLite (WAL) por processo + escritor único serializado
+#
+# - leituras: até QUANTIX_DB_READERS conexões reaproveitadas (fila), sem reconectar a cada query
+# - escritas: uma conexão dedicada, protegida por lock, em BEGIN IMMEDIATE ... COMMIT;
+#   entre processos (app Streamlit, workers de job, CLI) o lock é um fcntl.lockf em <banco>.lock,
+#   com fila no kernel em vez do busy_timeout do SQLite (sem fcntl, ex. Windows: só o lock por processo)
+# - pragmas: journal_mode=WAL (leitores não bloqueiam o escritor), synchronous, cache_size, mmap_size
+# - latência por query nomeada (n, média, máx) para o painel
+# O módulo é importado uma vez por processo: o pool sobrevive a reruns do script Streamlit.
+
+import os
+import time
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Any, Callable, Iterator, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+DB_READERS = int(os.environ.get("QUANTIX_DB_READERS", "4") or 4)
+DB_CACHE_MB = int(os.environ.get("QUANTIX_DB_CACHE_MB", "32") or 32)
+DB_MMAP_MB = int(os.environ.get("QUANTIX_DB_MMAP_MB", "256") or 256)
+DB_SYNCHRONOUS = os.environ.get("QUANTIX_DB_SYNCHRONOUS", "NORMAL").strip().upper() or "NORMAL"
+DB_BUSY_TIMEOUT_S = 30
+
+class SQLitePool:
+    def __init__(self, db_path: Path, readers: int = DB_READERS):
+        self.db_path = Path(db_path)
+        self.readers = max(1, int(readers))
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._opened = 0
+        self._open_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._lock_fd: Optional[int] = None
+        if fcntl is not None:
+            self._lock_fd = os.open(self.db_path.with_name(self.db_path.name + ".lock"), os.O_RDWR | os.O_CREAT, 0o644)
+        self._writer: sqlite3.Connection = self._connect()
+        self._writer.execute("PRAGMA journal_mode=WAL")
+        self._stats_lock = threading.Lock()
+        self._stats: Dict[str, List[float]] = {}  # nome -> [n, total_s, max_s]
+        self._once_lock = threading.Lock()
+        self._done: Dict[str, Any] = {}
+
+    def _connect(self) -> sqlite3.Connection:
+        con = sqlite3.connect(self.db_path, timeout=DB_BUSY_TIMEOUT_S, check_same_thread=False, isolation_level=None)
+        con.row_factory = sqlite3.Row
+        con.execute(f"PRAGMA synchronous={DB_SYNCHRONOUS}")
+        con.execute(f"PRAGMA cache_size=-{DB_CACHE_MB * 1024}")
+        con.execute(f"PRAGMA mmap_size={DB_MMAP_MB * 1024 * 1024}")
+        con.execute("PRAGMA temp_store=MEMORY")
+        return con
+
+    def _record(self, name: str, dt: float) -> None:
+        with self._stats_lock:
+            s = self._stats.setdefault(name, [0, 0.0, 0.0])
+            s[0] += 1
+            s[1] += dt
+            s[2] = max(s[2], dt)
+
+    @contextmanager
+    def read(self, name: str) -> Iterator[sqlite3.Connection]:
+        """Conexão de leitura emprestada do pool (bloqueia se todas estiverem em uso)."""
+        try:
+            con = self._idle.get_nowait()
+        except queue.Empty:
+            con = None
+            with self._open_lock:
+                if self._opened < self.readers:
+                    self._opened += 1
+                    con = self._connect()
+            if con is None:
+                con = self._idle.get()
+        t0 = time.perf_counter()
+        try:
+            yield con
+        finally:
+            self._record(name, time.perf_counter() - t0)
+            self._idle.put(con)
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        """Lock exclusivo entre processos (lockf é por processo: threads passam antes por _write_lock)."""
+        if self._lock_fd is None:
+            yield
+            return
+        fcntl.lockf(self._lock_fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.lockf(self._lock_fd, fcntl.LOCK_UN)
+
+    @contextmanager
+    def write(self, name: str) -> Iterator[sqlite3.Connection]:
+        """Transação de escrita serializada (um escritor por vez, entre threads e processos)."""
+        with self._write_lock, self._file_lock():
+            t0 = time.perf_counter()
+            con = self._writer
+            con.execute("BEGIN IMMEDIATE")
+            try:
+                yield con
+                con.execute("COMMIT")
+            except BaseException:
+                con.execute("ROLLBACK")
+                raise
+            finally:
+                self._record(name, time.perf_counter() - t0)
+
+    def once(self, name: str, fn: Callable[[], Any]) -> Any:
+        """Executa fn uma única vez por processo para este banco (ex.: DDL do schema)."""
+        with self._once_lock:
+            if name not in self._done:
+                self._done[name] = fn()
+            return self._done[name]
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._stats_lock:
+            return {
+                name: {
+                    "n": int(n),
+                    "avg_ms": round(total / n * 1000, 2) if n else 0.0,
+                    "max_ms": round(mx * 1000, 2),
+                    "total_ms": round(total * 1000, 1),
+                }
+                for name, (n, total, mx) in sorted(self._stats.items())
+            }
+
+_POOLS: Dict[Path, SQLitePool] = {}
+_POOLS_LOCK = threading.Lock()
+
+def get_pool(db_path: Path) -> SQLitePool:
+    """Pool único por arquivo de banco neste processo."""
+    key = Path(db_path).resolve()
+    with _POOLS_LOCK:
+        pool = _POOLS.get(key)
+        if pool is None:
+            pool = _POOLS[key] = SQLitePool(key)
+        return pool
@@ -0,0 +1,1755 @@
+# quantix/engine.py — motor QUANTIX sem UI: dados/DB, análise IFC, escrita do IFC OTIMIZADO, PDF/JSON e fila
+#
+# Extraído de app_joal.py para rodar fora do script Streamlit:
+# - workers de processo (ProcessPoolExecutor spawn) só conseguem importar funções de um módulo real,
+#   não do __main__ do Streamlit; executar_job/salvar_projeto precisam viver aqui
+# - não importa streamlit: o app importa daqui e cuida só da interface
+# - DATA_DIR vem de QUANTIX_DATA_DIR (padrão ./quantix_data, como antes) para o app e os workers
+#   apontarem para o mesmo banco/store
+
+import os
+import re
+import json
+import time
+import uuid
+import hashlib
+import logging
+import functools
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, Any, Optional, Tuple, List
+
+from quantix.step_scan import scan_ifc_file
+from quantix.analysis_cache import AnalysisCache
+from quantix.entity_index import EntityIndex, build_entity_index, entity_index_path
+from quantix.jobs import JobQueue
+from quantix.step_patch import apply_optimizations_step, file_contains
+from quantix.db import get_pool
+from quantix.blobstore import BlobStore
+from quantix.model_cache import MODEL_CACHE
+from quantix.clash import CLASH_ENABLED, CLASH_TOL_M, detectar_clashes
+from quantix.artifact_io import (
+    ARTIFACT_COMPRESS, GZ_SUFFIX, compressed_name, is_compressed, artifact_size, compress_file, decompress_file,
+    create_artifact, open_ifc_upload,
+)
+
+logger = logging.getLogger("quantix")
+
+ENGINE_VERSION = "2026.03.04-multiuser-mvp+pdfsafe+group+stylemap+clash"
+
+# -----------------------------------------------------------------------------
+# DADOS
+# -----------------------------------------------------------------------------
+APP_ROOT = Path(".").resolve()
+DATA_DIR = Path(os.environ.get("QUANTIX_DATA_DIR") or APP_ROOT / "quantix_data").resolve()
+DATA_DIR.mkdir(parents=True, exist_ok=True)
+
+DB_PATH = DATA_DIR / "quantix.db"
+
+# cache de análise compartilhado entre sessões/processos (sobrevive a restart)
+ANALYSIS_CACHE = AnalysisCache(DATA_DIR / "cache" / "analysis_cache.db")
+
+# -----------------------------------------------------------------------------
+# STORAGE por tenant (isolamento)
+# -----------------------------------------------------------------------------
+def normalize_tenant(s: str) -> str:
+    """Id de tenant seguro como nome de pasta: [a-z0-9._-], sem '/' nem '.'/'..' (vazio -> demo)."""
+    s = (s or "").strip().lower()
+    s = re.sub(r"[^a-z0-9._-]+", "-", s).strip("-.")
+    return s or "demo"
+
+def normalize_user(s: str) -> str:
+    s = (s or "").strip().lower()
+    s = re.sub(r"[^a-z0-9@._-]+", "", s)
+    return s or "anon"
+
+def tenant_root(tenant_id: str) -> Path:
+    p = DATA_DIR / "tenants" / normalize_tenant(tenant_id)
+    p.mkdir(parents=True, exist_ok=True)
+    (p / "artefatos").mkdir(parents=True, exist_ok=True)
+    (p / "propriedades").mkdir(parents=True, exist_ok=True)
+    (p / "uploads").mkdir(parents=True, exist_ok=True)
+    return p
+
+# -----------------------------------------------------------------------------
+# UTIL
+# -----------------------------------------------------------------------------
+def now_iso() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+def today_br() -> str:
+    return datetime.now().strftime("%d/%m/%Y")
+
+def safe_filename(s: str, max_len: int = 90) -> str:
+    s = (s or "").strip()
+    s = re.sub(r"[^a-zA-Z0-9._-]+", "_", s).strip("._-")
+    return s[:max_len] if s else "projeto"
+
+def file_sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+UPLOAD_CHUNK = 1024 * 1024
+UPLOAD_SPOOL_MAX_AGE_S = 24 * 3600
+
+def spool_upload(uploaded_file, dest_dir: Path) -> Dict[str, Any]:
+    """
+    Copia o upload para disco em blocos, calculando o SHA-256 incremental (sem getvalue()).
+    O arquivo final é nomeado pelo hash: o mesmo modelo enviado de novo reaproveita o spool.
+    .ifczip / IFC gzipado: o texto é descomprimido em streaming, o hash e o tamanho são os do
+    texto IFC (mesmo hash do .ifc equivalente -> mesmo cache de análise e mesmo blob) e o spool
+    é gravado já em .ifc.gz em blocos (sem o texto inteiro em memória nem em disco).
+    """
+    dest_dir.mkdir(parents=True, exist_ok=True)
+    nome = Path(uploaded_file.name).name  # arquivo local (CLI) chega com o caminho completo
+    h = hashlib.sha256()
+    size = 0
+    tmp = dest_dir / f"{uuid.uuid4().hex}.part"
+    uploaded_file.seek(0)
+    try:
+        src, comprimido = (uploaded_file, False) if is_pdf(nome) else open_ifc_upload(uploaded_file)
+        with create_artifact(tmp, comprimido) as out:
+            while True:
+                buf = src.read(UPLOAD_CHUNK)
+                if not buf:
+                    break
+                h.update(buf)
+                out.write(buf)
+                size += len(buf)
+    except Exception:
+        tmp.unlink(missing_ok=True)
+        raise
+    uploaded_file.seek(0)
+    digest = h.hexdigest()
+    suffix = ".ifc" + GZ_SUFFIX if comprimido else Path(nome).suffix.lower()
+    final = dest_dir / f"{digest}{suffix}"
+    tmp.replace(final)
+    return {"name": nome, "path": str(final), "hash": digest, "size": size}
+
+def limpar_spool_antigo(dest_dir: Path, max_age_s: int = UPLOAD_SPOOL_MAX_AGE_S) -> None:
+    cutoff = time.time() - max_age_s
+    for p in dest_dir.glob("*"):
+        try:
+            if p.is_file() and p.stat().st_mtime < cutoff:
+                p.unlink()
+        except Exception:
+            pass
+
+def decode_ifc_text(file_bytes: bytes) -> str:
+    try:
+        return file_bytes.decode("utf-8", errors="replace")
+    except Exception:
+        return file_bytes.decode("latin-1", errors="replace")
+
+def is_pdf(name: str) -> bool:
+    return name.lower().endswith(".pdf")
+
+# .gz: IFC gzipado (modelo.ifc.gz); o conteúdo é validado por open_ifc_upload, não pela extensão
+IFC_UPLOAD_TYPES = ["ifc", "ifczip", "gz"]
+
+def is_ifc(name: str) -> bool:
+    return name.lower().endswith(tuple(f".{t}" for t in IFC_UPLOAD_TYPES))
+
+def make_project_id() -> str:
+    return uuid.uuid4().hex
+
+def make_doc_id(project_id: str, file_hash: str) -> str:
+    return hashlib.sha1(f"{project_id}|{file_hash}".encode("utf-8")).hexdigest()[:8].upper()
+
+def pdf_safe_text(s: Any, max_len: int = 220) -> str:
+    t = "" if s is None else str(s)
+    t = t.replace("\r", " ").replace("\n", " ").replace("\t", " ")
+    t = t.replace("–", "-").replace("—", "-")
+    t = re.sub(r"\s+", " ", t).strip()
+
+    if len(t) > max_len:
+        t = t[: max_len - 3] + "..."
+
+    if len(t) > 80 and (" " not in t):
+        t = " ".join([t[i:i+32] for i in range(0, len(t), 32)])
+
+    return t
+
+def is_conflict_motive(motivo: str) -> bool:
+    m = (motivo or "").lower()
+    return any(x in m for x in ["clash", "interfer", "conflit", "colis", "colisão", "interferência", "interferencia"])
+
+# -----------------------------------------------------------------------------
+# DB (SQLite)
+# -----------------------------------------------------------------------------
+# pool por processo (WAL + leitores reaproveitados + escritor único); ver quantix/db.py
+DB = get_pool(DB_PATH)
+
+def init_db() -> None:
+    with DB.write("init_db") as con:
+        con.execute("""
+        CREATE TABLE IF NOT EXISTS projects (
+            project_id TEXT PRIMARY KEY,
+            tenant_id TEXT NOT NULL,
+            user_id TEXT NOT NULL,
+            empreendimento TEXT NOT NULL,
+            disciplina TEXT NOT NULL,
+            created_at_iso TEXT NOT NULL,
+            created_at_br TEXT NOT NULL,
+            status TEXT NOT NULL,
+            engine_version TEXT NOT NULL,
+            doc_id TEXT NOT NULL,
+            file_hash TEXT NOT NULL,
+            original_name TEXT NOT NULL,
+            file_type TEXT NOT NULL,
+            file_size_bytes INTEGER NOT NULL,
+            total_original INTEGER NOT NULL,
+            total_otimizado INTEGER NOT NULL,
+            economia_itens INTEGER NOT NULL,
+            eficiencia_num REAL NOT NULL,
+            confianca_label TEXT NOT NULL,
+            confianca_score INTEGER NOT NULL
+        );
+        """)
+        # project_id no índice: a paginação (ORDER BY created_at_iso DESC, project_id DESC) sai
+        # direto do índice, sem B-tree temporária; o índice antigo (sem project_id) é substituído
+        con.execute("DROP INDEX IF EXISTS idx_projects_tenant_created;")
+        con.execute("""
+        CREATE INDEX IF NOT EXISTS idx_projects_tenant_created_id
+        ON projects(tenant_id, created_at_iso DESC, project_id DESC);
+        """)
+        con.execute("""
+        CREATE TABLE IF NOT EXISTS project_files (
+            project_id TEXT PRIMARY KEY,
+            tenant_id TEXT NOT NULL,
+            ifc_original_path TEXT,
+            ifc_otimizado_path TEXT,
+            evid_pdf_path TEXT,
+            relatorio_pdf_path TEXT,
+            recomendacoes_json_path TEXT,
+            props_json_path TEXT,
+            FOREIGN KEY(project_id) REFERENCES projects(project_id)
+        );
+        """)
+        init_resumo(con)
+        init_versoes(con)
+
+# Resumo materializado do Dashboard: agregados por tenant e por empreendimento,
+# mantidos por triggers em projects (insert/update/delete) -> leitura O(1) por tenant.
+_RESUMO_DELTA_SQL = """
+    INSERT INTO tenant_summary (tenant_id, n_projetos, economia_itens, eficiencia_soma, confianca_soma)
+    VALUES ({p}.tenant_id, {s}1, {s}{p}.economia_itens, {s}{p}.eficiencia_num, {s}{p}.confianca_score)
+    ON CONFLICT(tenant_id) DO UPDATE SET
+        n_projetos = n_projetos + excluded.n_projetos,
+        economia_itens = economia_itens + excluded.economia_itens,
+        eficiencia_soma = eficiencia_soma + excluded.eficiencia_soma,
+        confianca_soma = confianca_soma + excluded.confianca_soma;
+    INSERT INTO empreendimento_summary (tenant_id, empreendimento, n_projetos, economia_itens)
+    VALUES ({p}.tenant_id, {p}.empreendimento, {s}1, {s}{p}.economia_itens)
+    ON CONFLICT(tenant_id, empreendimento) DO UPDATE SET
+        n_projetos = n_projetos + excluded.n_projetos,
+        economia_itens = economia_itens + excluded.economia_itens;
+"""
+_RESUMO_LIMPA_SQL = """
+    DELETE FROM empreendimento_summary WHERE tenant_id = OLD.tenant_id AND n_projetos <= 0;
+    DELETE FROM tenant_summary WHERE tenant_id = OLD.tenant_id AND n_projetos <= 0;
+"""
+
+def init_resumo(con) -> None:
+    existia = con.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='tenant_summary'"
+    ).fetchone() is not None
+    con.execute("""
+    CREATE TABLE IF NOT EXISTS tenant_summary (
+        tenant_id TEXT PRIMARY KEY,
+        n_projetos INTEGER NOT NULL,
+        economia_itens INTEGER NOT NULL,
+        eficiencia_soma REAL NOT NULL,
+        confianca_soma REAL NOT NULL
+    );
+    """)
+    con.execute("""
+    CREATE TABLE IF NOT EXISTS empreendimento_summary (
+        tenant_id TEXT NOT NULL,
+        empreendimento TEXT NOT NULL,
+        n_projetos INTEGER NOT NULL,
+        economia_itens INTEGER NOT NULL,
+        PRIMARY KEY (tenant_id, empreendimento)
+    );
+    """)
+    add_new = _RESUMO_DELTA_SQL.format(p="NEW", s="")
+    sub_old = _RESUMO_DELTA_SQL.format(p="OLD", s="-")
+    con.execute(f"CREATE TRIGGER IF NOT EXISTS trg_projects_resumo_ins AFTER INSERT ON projects BEGIN {add_new} END;")
+    con.execute(f"CREATE TRIGGER IF NOT EXISTS trg_projects_resumo_del AFTER DELETE ON projects BEGIN {sub_old} {_RESUMO_LIMPA_SQL} END;")
+    con.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_projects_resumo_upd
+    AFTER UPDATE OF tenant_id, empreendimento, economia_itens, eficiencia_num, confianca_score ON projects
+    BEGIN {sub_old} {add_new} {_RESUMO_LIMPA_SQL} END;
+    """)
+    if not existia:
+        rebuild_resumo(con)
+
+def rebuild_resumo(con) -> None:
+    # recalcula do zero (primeira criação das tabelas ou reparo manual)
+    con.execute("DELETE FROM tenant_summary")
+    con.execute("DELETE FROM empreendimento_summary")
+    con.execute("""
+        INSERT INTO tenant_summary (tenant_id, n_projetos, economia_itens, eficiencia_soma, confianca_soma)
+        SELECT tenant_id, COUNT(*), SUM(economia_itens), SUM(eficiencia_num), SUM(confianca_score)
+        FROM projects GROUP BY tenant_id
+    """)
+    con.execute("""
+        INSERT INTO empreendimento_summary (tenant_id, empreendimento, n_projetos, economia_itens)
+        SELECT tenant_id, empreendimento, COUNT(*), SUM(economia_itens)
+        FROM projects GROUP BY tenant_id, empreendimento
+    """)
+
+# Versão dos dados por tenant: incrementada por trigger a cada escrita em projects (inclusive jobs
+# em outras threads/processos). A UI guarda consultas no session_state e só refaz quando a versão muda.
+def init_versoes(con) -> None:
+    con.execute("""
+    CREATE TABLE IF NOT EXISTS tenant_versions (
+        tenant_id TEXT PRIMARY KEY,
+        version INTEGER NOT NULL
+    );
+    """)
+    bump = """
+        INSERT INTO tenant_versions (tenant_id, version) VALUES ({p}.tenant_id, 1)
+        ON CONFLICT(tenant_id) DO UPDATE SET version = version + 1;
+    """
+    con.execute(f"CREATE TRIGGER IF NOT EXISTS trg_projects_versao_ins AFTER INSERT ON projects BEGIN {bump.format(p='NEW')} END;")
+    con.execute(f"CREATE TRIGGER IF NOT EXISTS trg_projects_versao_upd AFTER UPDATE ON projects BEGIN {bump.format(p='NEW')} END;")
+    con.execute(f"CREATE TRIGGER IF NOT EXISTS trg_projects_versao_del AFTER DELETE ON projects BEGIN {bump.format(p='OLD')} END;")
+
+# DDL uma vez por processo (não a cada rerun: o init pega o lock de escrita)
+DB.once("schema", init_db)
+
+# Uploads (ORIGINAL IFC / evidência PDF) ficam no store por SHA-256: o mesmo arquivo enviado
+# em vários projetos ocupa disco uma vez; remover_projeto só libera o blob sem referências.
+BLOBS = BlobStore(DATA_DIR / "blobs", DB)
+
+def uso_disco_tenant(tenant_id: str) -> Dict[str, Any]:
+    """Store (lógico x físico) + artefatos derivados (OTIMIZADO/PDF/JSON) na pasta do tenant."""
+    uso = BLOBS.uso_disco(tenant_id)
+    derivados = 0
+    for dirpath, _dirs, files in os.walk(tenant_root(tenant_id) / "artefatos"):
+        for f in files:
+            try:
+                derivados += os.stat(os.path.join(dirpath, f)).st_size
+            except OSError:
+                pass
+    uso["bytes_derivados"] = derivados
+    return uso
+
+def versao_tenant(tenant_id: str) -> int:
+    with DB.read("versao_tenant") as con:
+        r = con.execute("SELECT version FROM tenant_versions WHERE tenant_id=?", (tenant_id,)).fetchone()
+    return int(r["version"]) if r else 0
+
+def upsert_project(row: dict, files: dict) -> None:
+    with DB.write("upsert_project") as con:
+        con.execute("""
+        INSERT INTO projects (
+            project_id, tenant_id, user_id, empreendimento, disciplina,
+            created_at_iso, created_at_br, status, engine_version, doc_id,
+            file_hash, original_name, file_type, file_size_bytes,
+            total_original, total_otimizado, economia_itens, eficiencia_num,
+            confianca_label, confianca_score
+        )
+        VALUES (
+            :project_id, :tenant_id, :user_id, :empreendimento, :disciplina,
+            :created_at_iso, :created_at_br, :status, :engine_version, :doc_id,
+            :file_hash, :original_name, :file_type, :file_size_bytes,
+            :total_original, :total_otimizado, :economia_itens, :eficiencia_num,
+            :confianca_label, :confianca_score
+        )
+        ON CONFLICT(project_id) DO UPDATE SET
+            status=excluded.status,
+            total_original=excluded.total_original,
+            total_otimizado=excluded.total_otimizado,
+            economia_itens=excluded.economia_itens,
+            eficiencia_num=excluded.eficiencia_num,
+            confianca_label=excluded.confianca_label,
+            confianca_score=excluded.confianca_score;
+        """, row)
+
+        con.execute("""
+        INSERT INTO project_files (
+            project_id, tenant_id,
+            ifc_original_path, ifc_otimizado_path, evid_pdf_path,
+            relatorio_pdf_path, recomendacoes_json_path, props_json_path
+        )
+        VALUES (
+            :project_id, :tenant_id,
+            :ifc_original_path, :ifc_otimizado_path, :evid_pdf_path,
+            :relatorio_pdf_path, :recomendacoes_json_path, :props_json_path
+        )
+        ON CONFLICT(project_id) DO UPDATE SET
+            ifc_original_path=excluded.ifc_original_path,
+            ifc_otimizado_path=excluded.ifc_otimizado_path,
+            evid_pdf_path=excluded.evid_pdf_path,
+            relatorio_pdf_path=excluded.relatorio_pdf_path,
+            recomendacoes_json_path=excluded.recomendacoes_json_path,
+            props_json_path=excluded.props_json_path;
+        """, files)
+
+def carregar_por_project(project_id: str, tenant_id: str) -> Optional[dict]:
+    with DB.read("carregar_por_project") as con:
+        r = con.execute("""
+            SELECT p.*, f.ifc_original_path, f.ifc_otimizado_path, f.evid_pdf_path,
+                   f.relatorio_pdf_path, f.recomendacoes_json_path, f.props_json_path
+            FROM projects p
+            LEFT JOIN project_files f ON f.project_id = p.project_id
+            WHERE p.project_id = ? AND p.tenant_id = ?
+            LIMIT 1
+        """, (project_id, tenant_id)).fetchone()
+    return dict(r) if r else None
+
+def remover_projeto(project_id: str, tenant_id: str) -> bool:
+    """Apaga artefatos, referências no store e linhas do projeto. False se não existir no tenant."""
+    rec = carregar_por_project(project_id, tenant_id)
+    if not rec:
+        return False
+
+    for k in ["ifc_original_path","ifc_otimizado_path","evid_pdf_path","relatorio_pdf_path","recomendacoes_json_path","props_json_path"]:
+        p = rec.get(k)
+        if p and not BLOBS.contains(p):
+            # projetos antigos: ORIGINAL/evidência ainda dentro da pasta do projeto
+            try:
+                pp = Path(str(p))
+                if pp.exists():
+                    pp.unlink()
+                if k == "ifc_original_path":
+                    sidecar = entity_index_path(pp)
+                    if sidecar.exists():
+                        sidecar.unlink()
+            except Exception:
+                pass
+
+    try:
+        proj_dir = tenant_root(tenant_id) / "artefatos" / project_id
+        if proj_dir.exists():
+            try:
+                proj_dir.rmdir()
+            except Exception:
+                pass
+    except Exception:
+        pass
+
+    BLOBS.release(project_id)
+    with DB.write("excluir_projeto") as con:
+        con.execute("DELETE FROM project_files WHERE project_id=? AND tenant_id=?", (project_id, tenant_id))
+        con.execute("DELETE FROM projects WHERE project_id=? AND tenant_id=?", (project_id, tenant_id))
+    return True
+
+# -----------------------------------------------------------------------------
+# PROPRIEDADES PROFISSIONAIS (tipadas)
+# -----------------------------------------------------------------------------
+PRO_FIELDS = {
+    "Eletrica": [
+        {"key":"tensao_sistema", "label":"Tensão do sistema", "type":"select",
+         "options":["127/220", "220/380", "220 monofásico", "127 monofásico"], "weight":0.10},
+        {"key":"padrao_entrada", "label":"Padrão de entrada", "type":"select",
+         "options":["Monofásico", "Bifásico", "Trifásico"], "weight":0.10},
+        {"key":"corrente_geral_a", "label":"Disjuntor geral (A)", "type":"number", "min":10.0, "max":1000.0, "weight":0.10, "step":5.0},
+        {"key":"demanda_kw", "label":"Demanda estimada (kW)", "type":"number", "min":0.5, "max":5000.0, "weight":0.12, "step":0.5},
+        {"key":"fator_demanda", "label":"Fator de demanda (0–1)", "type":"number", "min":0.1, "max":1.0, "weight":0.08, "step":0.05},
+        {"key":"criterio_balanceamento", "label":"Critério de balanceamento", "type":"text", "weight":0.12},
+        {"key":"circuitos_criticos", "label":"Circuitos críticos (ex.: chuveiro/ar)", "type":"text", "weight":0.08},
+        {"key":"padrao_cabos", "label":"Padrão de cabos (ex.: cobre 750V)", "type":"text", "weight":0.08},
+        {"key":"nrm_referencia", "label":"Norma/Referência (ex.: NBR 5410)", "type":"text", "weight":0.07},
+        {"key":"observacoes", "label":"Observações do projeto", "type":"text", "weight":0.15},
+    ],
+    "Hidraulica": [
+        {"key":"sistema", "label":"Sistema", "type":"select",
+         "options":["Água fria", "Água quente", "Água fria + quente", "Esgoto + ventilação"], "weight":0.10},
+        {"key":"pressao_mca", "label":"Pressão disponível (mca)", "type":"number", "min":1.0, "max":200.0, "weight":0.12, "step":1.0},
+        {"key":"altura_manometrica_m", "label":"Altura manométrica (m)", "type":"number", "min":0.0, "max":300.0, "weight":0.08, "step":1.0},
+        {"key":"vazao_lmin", "label":"Vazão de projeto (L/min)", "type":"number", "min":0.1, "max":5000.0, "weight":0.10, "step":1.0},
+        {"key":"reservatorio_l", "label":"Reservatório (L)", "type":"number", "min":0.0, "max":1e7, "weight":0.08, "step":100.0},
+        {"key":"material_tubos", "label":"Material de tubulação", "type":"select",
+         "options":["PVC", "PPR", "PEX", "Cobre", "Ferro galvanizado", "Outro"], "weight":0.10},
+        {"key":"criterio_perda_carga", "label":"Critério de perda de carga", "type":"select",
+         "options":["Darcy-Weisbach", "Hazen-Williams", "Tabela fabricante"], "weight":0.10},
+        {"key":"tipo_esgoto", "label":"Tipo de esgoto", "type":"select",
+         "options":["Primário", "Secundário", "Misto"], "weight":0.08},
+        {"key":"nrm_referencia", "label":"Norma/Referência (ex.: NBR 8160)", "type":"text", "weight":0.07},
+        {"key":"observacoes", "label":"Observações do projeto", "type":"text", "weight":0.17},
+    ],
+    "Estrutural": [
+        {"key":"sistema_estrutural", "label":"Sistema estrutural", "type":"select",
+         "options":["Concreto armado", "Metálica", "Mista", "Pré-moldado"], "weight":0.08},
+        {"key":"fck_mpa", "label":"fck (MPa)", "type":"number", "min":10.0, "max":100.0, "weight":0.12, "step":1.0},
+        {"key":"aco_classe", "label":"Classe do aço", "type":"select",
+         "options":["CA-50", "CA-60", "ASTM A572", "ASTM A36", "Outro"], "weight":0.08},
+        {"key":"cargas_kn", "label":"Cargas principais (kN) (resumo)", "type":"text", "weight":0.10},
+        {"key":"vento_categoria", "label":"Vento (categoria/região)", "type":"text", "weight":0.06},
+        {"key":"solo_spt", "label":"Solo / SPT (resumo)", "type":"text", "weight":0.12},
+        {"key":"cobrimento_mm", "label":"Cobrimento (mm)", "type":"number", "min":5.0, "max":100.0, "weight":0.08, "step":1.0},
+        {"key":"classe_agressividade", "label":"Classe de agressividade", "type":"select",
+         "options":["I", "II", "III", "IV"], "weight":0.06},
+        {"key":"criterio_flecha", "label":"Critério de flecha/serviço", "type":"text", "weight":0.08},
+        {"key":"nrm_referencia", "label":"Norma/Referência (ex.: NBR 6118/15575)", "type":"text", "weight":0.07},
+        {"key":"observacoes", "label":"Observações do projeto", "type":"text", "weight":0.15},
+    ],
+}
+
+def props_path(tenant_id: str, project_id: str, disciplina: str) -> Path:
+    # por tenant_id: o pipeline também roda nos workers da fila, fora da sessão
+    return tenant_root(tenant_id) / "propriedades" / f"PROPS_{safe_filename(disciplina)}_{project_id}.json"
+
+def load_props(tenant_id: str, project_id: str, disciplina: str) -> dict:
+    p = props_path(tenant_id, project_id, disciplina)
+    if p.exists():
+        try:
+            return json.loads(p.read_text(encoding="utf-8"))
+        except Exception:
+            return {}
+    return {}
+
+def save_props(tenant_id: str, project_id: str, disciplina: str, props: dict) -> None:
+    props_path(tenant_id, project_id, disciplina).write_text(
+        json.dumps(props, ensure_ascii=False, indent=2), encoding="utf-8"
+    )
+
+def props_score_weighted(props: dict, disciplina: str) -> float:
+    fields = PRO_FIELDS.get(disciplina, [])
+    if not fields:
+        return 0.0
+    got = 0.0
+    total = 0.0
+    for f in fields:
+        w = float(f.get("weight", 0.0))
+        total += w
+        v = props.get(f["key"])
+        if v is None or str(v).strip() == "":
+            continue
+        got += w
+    return got / total if total > 0 else 0.0
+
+# -----------------------------------------------------------------------------
+# EXTRAÇÃO + IDs + CHANGE LOG
+# -----------------------------------------------------------------------------
+def processar_mapa(counts: Dict[str, int], mapa: Dict[str, Dict[str, str]], seed: int) -> Dict[str, Dict[str, Any]]:
+    digest = hashlib.sha256(str(seed).encode("utf-8")).digest()
+
+    def det_uniform(a: float, b: float, i: int) -> float:
+        x = digest[i % len(digest)] / 255.0
+        return a + (b - a) * x
+
+    resultados: Dict[str, Dict[str, Any]] = {}
+    found = False
+    for idx, (classe, info) in enumerate(mapa.items()):
+        count = int(counts.get(classe, 0))
+        if count > 0:
+            found = True
+            fator = det_uniform(0.84, 0.96, idx)
+            qtd = int(count * fator)
+            resultados[classe] = {
+                "nome": info["nome"],
+                "antes": int(count),
+                "depois": int(qtd),
+                "defeito": info["defeito"],
+                "ciencia": info["ciencia"],
+            }
+    if not found:
+        resultados["GENERIC"] = {
+            "nome": "Elementos Gerais",
+            "antes": 100,
+            "depois": 95,
+            "defeito": "Modelo sem classes esperadas (ou IFC exportado incompleto)",
+            "ciencia": "Revisar export IFC e mapping por disciplina.",
+        }
+    return resultados
+
+def extrair_eletrica(scan: Dict[str, Any], seed: int) -> Dict[str, Any]:
+    mapa = {
+        "IFCCABLESEGMENT": {"nome":"Cabos (segmentos)", "defeito":"Roteamento redundante", "ciencia":"Heurística de grafo + consolidação"},
+        "IFCFLOWTERMINAL": {"nome":"Pontos (tomadas/terminais)", "defeito":"Distribuição de circuitos", "ciencia":"Balanceamento por demanda"},
+        "IFCJUNCTIONBOX": {"nome":"Caixas de passagem", "defeito":"Excesso de nós", "ciencia":"Redução de pontos e melhoria de manutenção"},
+        "IFCFLOWSEGMENT": {"nome":"Eletrodutos", "defeito":"Conflitos em trajeto", "ciencia":"Compatibilização e redução de interferências"},
+        "IFCDISTRIBUTIONELEMENT": {"nome":"Quadros", "defeito":"Dimensionamento/organização", "ciencia":"Agrupamento e reserva técnica"},
+    }
+    return processar_mapa(scan["counts"], mapa, seed)
+
+def extrair_hidraulica(scan: Dict[str, Any], seed: int) -> Dict[str, Any]:
+    mapa = {
+        "IFCPIPESEGMENT": {"nome":"Tubos (segmentos)", "defeito":"Trajeto longo/perda de carga", "ciencia":"Otimização de traçado"},
+        "IFCPIPEFITTING": {"nome":"Conexões", "defeito":"Perdas localizadas altas", "ciencia":"Redução de conexões"},
+        "IFCFLOWCONTROLLER": {"nome":"Registros/Válvulas", "defeito":"Acessibilidade", "ciencia":"Reposicionamento para manutenção"},
+        "IFCWASTETERMINAL": {"nome":"Pontos de esgoto", "defeito":"Ventilação insuficiente", "ciencia":"Revisão de ventilação/declividade"},
+        "IFCSANITARYTERMINAL": {"nome":"Aparelhos sanitários", "defeito":"Compatibilização hidráulica", "ciencia":"Checagem de alimentação e descarga"},
+    }
+    return processar_mapa(scan["counts"], mapa, seed)
+
+# pares de clash guardados em dados_ifc (JSON/relatório); a contagem e o change log usam todos
+CLASH_DETALHE_MAX = 50
+
+def extrair_estrutural(scan: Dict[str, Any], seed: int, clash: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    s = (int(scan["text_len"]) + seed) % 100
+    dados = {
+        "IFCFOOTING": {"nome":"Fundações", "antes": 40 + (s % 8), "depois": 40 + (s % 8),
+                      "defeito":"Checagem exige sondagem/cargas", "ciencia":"Validar SPT x cargas nodais (dados reais)."},
+        "IFCBEAM_COLUMN": {"nome":"Vigas/Pilares", "antes": 900 + s, "depois": 860 + s,
+                           "defeito":"Consumo potencialmente otimável", "ciencia":"Depende de seções/cargas."},
+        "IFCSLAB": {"nome":"Lajes", "antes": 30, "depois": 30,
+                    "defeito":"Acústica depende de parâmetros", "ciencia":"Necessário especificar camadas/massa."},
+    }
+    # clash só com geometria real (quantix/clash.py): sem ifcopenshell/geometria o item fica de fora
+    if clash is not None:
+        dados["IFC_CLASH"] = {
+            "nome": "Clash estrutura x MEP/arquitetura", "antes": len(clash["elementos"]), "depois": 0,
+            "defeito": "Interferência geométrica",
+            "ciencia": f"{len(clash['pares'])} par(es) com penetração > {CLASH_TOL_M * 1000:.0f} mm; coordenação de modelos e ajustes.",
+            "acao": "CLASH DETECTADO", "tag_visual": "RED",
+            "pares": len(clash["pares"]), "metodo": clash["metodo"],
+            "detalhe": clash["pares"][:CLASH_DETALHE_MAX],
+        }
+    return dados
+
+def _dados_por_disciplina(disciplina: str, scan: Dict[str, Any], file_hash: str,
+                          clash: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    seed = int(file_hash[:8], 16)
+    if disciplina == "Eletrica":
+        return extrair_eletrica(scan, seed)
+    if disciplina == "Hidraulica":
+        return extrair_hidraulica(scan, seed)
+    return extrair_estrutural(scan, seed, clash)
+
+def analisar_clashes(ifc_path: Path, file_hash: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Clash estrutura x MEP/arquitetura do IFC em disco (quantix.clash.detectar_clashes). Usa o modelo
+    parseado do MODEL_CACHE (a geração do IFC otimizado logo depois reaproveita o mesmo parse).
+    None se desligado (QUANTIX_CLASH=0), sem ifcopenshell ou se a geometria falhar.
+    """
+    if not CLASH_ENABLED:
+        return None
+    ifcopenshell = try_import_ifcopenshell()
+    if ifcopenshell is None:
+        return None
+    try:
+        import ifcopenshell.geom  # type: ignore
+        return MODEL_CACHE.executar(
+            _chave_modelo(ifc_path, file_hash),
+            functools.partial(_abrir_modelo, ifc_path),
+            artifact_size(ifc_path),
+            _clashes_do_modelo,
+        )
+    except Exception as e:
+        logger.warning("clash indisponível (%s): %s", ifc_path, e)
+        return None
+
+def _analisar_com_cache(disciplina: str, file_hash: str, scan_fn, ifc_path: Optional[Path] = None,
+                        clash: bool = True) -> Tuple[Dict[str, Any], Dict[str, List[str]]]:
+    # disco primeiro (file_hash, disciplina, ENGINE_VERSION); só varre o IFC em miss.
+    # A chave "Estrutural" só guarda análises com o clash calculado: sem clash por configuração
+    # (QUANTIX_CLASH=0, sem ifcopenshell, sem arquivo em disco) a chave é "Estrutural/sem-clash";
+    # a prévia (clash=False) e um clash que falhou não gravam nada.
+    chave = disciplina
+    quer_clash = False
+    if disciplina == "Estrutural" and clash:
+        quer_clash = ifc_path is not None and CLASH_ENABLED and try_import_ifcopenshell() is not None
+        if not quer_clash:
+            chave = f"{disciplina}/sem-clash"
+    hit = ANALYSIS_CACHE.get(file_hash, chave, ENGINE_VERSION)
+    if hit is not None:
+        return hit
+    scan = scan_fn()
+    ids_map = scan["ids"]
+    resultado_clash = analisar_clashes(ifc_path, file_hash) if quer_clash else None
+    if resultado_clash is not None:
+        # elementos em clash, pior penetração primeiro (o change log pega os `antes` primeiros)
+        ids_map = dict(ids_map, IFC_CLASH=resultado_clash["elementos"])
+    dados = _dados_por_disciplina(disciplina, scan, file_hash, resultado_clash)
+    if chave == "Estrutural" and resultado_clash is None:
+        return dados, ids_map
+    try:
+        ANALYSIS_CACHE.put(file_hash, chave, ENGINE_VERSION, dados, ids_map)
+    except Exception as e:
+        logger.warning("analysis cache put falhou: %s", e)
+    return dados, ids_map
+
+def analisar_ifc_arquivo(disciplina: str, ifc_path: Path, file_hash: str,
+                         clash: bool = True) -> Tuple[Dict[str, Any], Dict[str, List[str]]]:
+    """
+    (dados_ifc, ids_map) de um IFC em disco (spool/ORIGINAL) — entrada única da análise (app, jobs, CLI):
+    usa o sidecar .qidx se existir, senão lê em blocos (uma varredura, sem decode_ifc_text).
+    clash=False: só a varredura (prévia na UI), sem o clash geométrico do Estrutural; devolve a análise
+    completa se ela já estiver no cache.
+    """
+    def scan():
+        idx = EntityIndex.for_ifc(ifc_path, file_hash)
+        return idx.to_scan() if idx is not None else scan_ifc_file(ifc_path)
+    return _analisar_com_cache(disciplina, file_hash, scan, ifc_path, clash)
+
+def abrir_indice_entidades(ifc_path: Path, file_hash: str = "") -> Optional[EntityIndex]:
+    """Sidecar do IFC salvo (cria se faltar ou estiver desatualizado)."""
+    try:
+        idx = EntityIndex.for_ifc(ifc_path, file_hash)
+        if idx is None:
+            idx = EntityIndex(build_entity_index(ifc_path, file_hash=file_hash))
+        return idx
+    except Exception as e:
+        logger.warning("índice de entidades indisponível (%s): %s", ifc_path, e)
+        return None
+
+def build_change_log(dados_ifc: dict, ids_map: Dict[str, List[str]]) -> List[Dict[str, Any]]:
+    changes: List[Dict[str, Any]] = []
+    for cls, info in (dados_ifc or {}).items():
+        antes = int(info.get("antes", 0))
+        depois = int(info.get("depois", 0))
+        delta = max(0, antes - depois)
+        if delta <= 0:
+            continue
+        ids = ids_map.get(cls, [])
+        pick = ids[: min(delta, len(ids))]
+        for eid in pick:
+            motivo = str(info.get("defeito", ""))
+            changes.append({
+                "ifc_id": eid,
+                "classe": cls,
+                "produto": info.get("nome", cls),
+                "acao": info.get("acao") or "OTIMIZAÇÃO APLICADA (Pset QUANTIX)",
+                "motivo": motivo,
+                "referencia": info.get("ciencia", ""),
+                "tag_visual": info.get("tag_visual") or ("RED" if is_conflict_motive(motivo) else "ORANGE"),
+            })
+    return changes
+
+def calcular_metricas(dados_ifc: Dict[str, Any]) -> Tuple[int,int,int,float]:
+    t_antes = sum(int(d.get("antes",0)) for d in (dados_ifc or {}).values())
+    t_depois = sum(int(d.get("depois",0)) for d in (dados_ifc or {}).values())
+    econ = t_antes - t_depois
+    eff = (econ / t_antes) if t_antes > 0 else 0.0
+    return t_antes, t_depois, econ, float(max(0.0, min(1.0, eff)))
+
+# -----------------------------------------------------------------------------
+# CONFIANÇA 0–100 (ATINGÍVEL)
+# -----------------------------------------------------------------------------
+def confidence_0_100(
+    dados_ifc: dict,
+    props: dict,
+    disciplina: str,
+    has_ids: bool,
+    optimization_applied: bool
+) -> Tuple[int, str, Dict[str,int]]:
+    if not dados_ifc:
+        ifc_pts = 5
+    elif "GENERIC" in dados_ifc and len(dados_ifc) == 1:
+        ifc_pts = 15
+    else:
+        n = len(dados_ifc)
+        ifc_pts = min(40, 20 + n * 5)
+
+    pc = props_score_weighted(props, disciplina)
+    props_pts = int(round(pc * 40))
+
+    ids_pts = 10 if has_ids else 0
+    opt_pts = 10 if optimization_applied else 0
+
+    total = max(0, min(100, ifc_pts + props_pts + ids_pts + opt_pts))
+    label = "Alta" if total >= 80 else ("Média" if total >= 50 else "Baixa")
+    breakdown = {"IFC": ifc_pts, "Props": props_pts, "IDs": ids_pts, "Otim": opt_pts}
+    return total, label, breakdown
+
+# -----------------------------------------------------------------------------
+# IFC OTIMIZADO (ifcopenshell) + GROUP + STYLE MAP
+# -----------------------------------------------------------------------------
+# ifcopenshell (+ ifcopenshell.api) só é importado na 1ª escrita de IFC do processo; o resultado
+# (módulo ou indisponível) fica guardado e os helpers recebem o módulo em vez de reimportá-lo.
+_IFCOPENSHELL: Any = None
+
+def try_import_ifcopenshell():
+    global _IFCOPENSHELL
+    if _IFCOPENSHELL is None:
+        try:
+            import ifcopenshell  # type: ignore
+            import ifcopenshell.api  # type: ignore
+            _IFCOPENSHELL = ifcopenshell
+        except Exception:
+            _IFCOPENSHELL = False
+    return _IFCOPENSHELL or None
+
+QUANTIX_PSET = "Pset_QuantixOptimization"
+QUANTIX_GROUP = "Quantix_Optimized_Elements"
+
+def indice_inverso(model, nomes_pset: Optional[set] = None) -> Dict[str, Dict[Any, List[Any]]]:
+    """
+    Uma passada por IfcRelDefinesByProperties, IfcRelAssignsToGroup e IfcStyledItem, antes do loop do
+    change log (em vez de IsDefinedBy/HasAssignments/StyledByItem elemento a elemento):
+    - "psets": {id do elemento: [(rel, pset)]} — só os Psets com nome em nomes_pset, se dado
+    - "grupos": {id do elemento: [(rel, grupo)]} e "grupos_por_nome": {nome: [(rel, grupo)]}
+    - "estilos": {id do item de representação: IfcStyledItem}
+    """
+    psets: Dict[Any, List[Any]] = {}
+    for rel in model.by_type("IfcRelDefinesByProperties"):
+        pset = rel.RelatingPropertyDefinition
+        if pset is None or (nomes_pset is not None and getattr(pset, "Name", None) not in nomes_pset):
+            continue
+        for obj in rel.RelatedObjects or ():
+            psets.setdefault(obj.id(), []).append((rel, pset))
+    grupos: Dict[Any, List[Any]] = {}
+    por_nome: Dict[Any, List[Any]] = {}
+    for rel in model.by_type("IfcRelAssignsToGroup"):
+        grupo = rel.RelatingGroup
+        if grupo is None:
+            continue
+        por_nome.setdefault(grupo.Name, []).append((rel, grupo))
+        for obj in rel.RelatedObjects or ():
+            grupos.setdefault(obj.id(), []).append((rel, grupo))
+    estilos: Dict[Any, List[Any]] = {}
+    for styled in model.by_type("IfcStyledItem"):
+        if styled.Item is not None:
+            estilos.setdefault(styled.Item.id(), []).append(styled)
+    return {"psets": psets, "grupos": grupos, "grupos_por_nome": por_nome, "estilos": estilos}
+
+def _owner_history(ifcopenshell, model):
+    """
+    Um IfcOwnerHistory por execução do writer, compartilhado por Psets, relações e grupo.
+    IFC2X3 sem usuário/aplicação no arquivo (o api recusa): cadeia mínima Quantix, como no patch STEP.
+    IFC4+: None quando o arquivo não tem usuário (OwnerHistory é opcional).
+    """
+    try:
+        return ifcopenshell.api.run("owner.create_owner_history", model)
+    except Exception:
+        if model.schema != "IFC2X3":
+            return None
+    org = model.create_entity("IfcOrganization", Name="Quantix")
+    user = model.create_entity(
+        "IfcPersonAndOrganization",
+        ThePerson=model.create_entity("IfcPerson", FamilyName="Quantix"),
+        TheOrganization=org,
+    )
+    app = model.create_entity(
+        "IfcApplication", ApplicationDeveloper=org, Version=ENGINE_VERSION,
+        ApplicationFullName="Quantix Engine", ApplicationIdentifier="Quantix",
+    )
+    return model.create_entity(
+        "IfcOwnerHistory", OwningUser=user, OwningApplication=app, ChangeAction="ADDED",
+        CreationDate=int(time.time()),
+    )
+
+def _novo_pset(ifcopenshell, model, produtos: List[Any], nome: str, owner=None):
+    """
+    IfcPropertySet + uma IfcRelDefinesByProperties para todos os produtos (na ordem dada).
+    O índice já garantiu que não há Pset com esse nome para reaproveitar, então pset.add_pset
+    (que percorre IsDefinedBy de novo) só é usado para tipos. `owner`: IfcOwnerHistory da execução.
+    """
+    if not all(p.is_a("IfcObject") for p in produtos):
+        pset = ifcopenshell.api.run("pset.add_pset", model, product=produtos[0], name=nome)
+        if len(produtos) > 1:
+            ifcopenshell.api.run("pset.assign_pset", model, products=produtos, pset=pset)
+        return pset
+    pset = model.create_entity(
+        "IfcPropertySet",
+        GlobalId=ifcopenshell.guid.new(),
+        OwnerHistory=owner,
+        Name=nome,
+    )
+    model.create_entity(
+        "IfcRelDefinesByProperties",
+        GlobalId=ifcopenshell.guid.new(),
+        OwnerHistory=owner,
+        RelatedObjects=produtos,
+        RelatingPropertyDefinition=pset,
+    )
+    return pset
+
+def _desligar_psets(ifcopenshell, model, pendentes: Dict[int, Tuple[Any, Any, set]]) -> int:
+    """
+    Re-otimização: {id da rel: (rel, pset, ids dos elementos a desligar)}. Cada relação é reescrita
+    uma vez (não um unassign por elemento, que é O(n²) num Pset compartilhado grande); a que fica
+    vazia sai junto com o Pset e as propriedades. Retorna quantos Psets foram removidos.
+    """
+    removidos = 0
+    for rel, pset, ids in pendentes.values():
+        try:
+            objs = list(rel.RelatedObjects or ())
+            restantes = [o for o in objs if o.id() not in ids]
+            if restantes:
+                rel.RelatedObjects = restantes
+                continue
+            if len(objs) > 1:
+                rel.RelatedObjects = objs[:1]
+            ifcopenshell.api.run("pset.remove_pset", model, product=objs[0], pset=pset)
+            removidos += 1
+        except Exception:
+            continue
+    return removidos
+
+def _ensure_quantix_styles(ifcopenshell, model):
+    """
+    Cria estilos (laranja/vermelho) usando ifcopenshell.api, se disponível.
+    Retorna dict com {"ORANGE": style_obj, "RED": style_obj} (pode falhar e retornar {}).
+    """
+    styles = {}
+    try:
+        # ORANGE
+        style_orange = ifcopenshell.api.run("style.add_style", model, name="Quantix_Optimized_Orange")
+        try:
+            ifcopenshell.api.run(
+                "style.add_surface_style",
+                model,
+                style=style_orange,
+                ifc_class="IfcSurfaceStyleShading",
+                attributes={"SurfaceColour": {"Red": 1.0, "Green": 0.62, "Blue": 0.0}}
+            )
+        except Exception:
+            # alguns builds usam Rendering em vez de Shading
+            ifcopenshell.api.run(
+                "style.add_surface_style",
+                model,
+                style=style_orange,
+                ifc_class="IfcSurfaceStyleRendering",
+                attributes={"SurfaceColour": {"Red": 1.0, "Green": 0.62, "Blue": 0.0}}
+            )
+
+        # RED
+        style_red = ifcopenshell.api.run("style.add_style", model, name="Quantix_Optimized_Red")
+        try:
+            ifcopenshell.api.run(
+                "style.add_surface_style",
+                model,
+                style=style_red,
+                ifc_class="IfcSurfaceStyleShading",
+                attributes={"SurfaceColour": {"Red": 1.0, "Green": 0.15, "Blue": 0.15}}
+            )
+        except Exception:
+            ifcopenshell.api.run(
+                "style.add_surface_style",
+                model,
+                style=style_red,
+                ifc_class="IfcSurfaceStyleRendering",
+                attributes={"SurfaceColour": {"Red": 1.0, "Green": 0.15, "Blue": 0.15}}
+            )
+
+        styles["ORANGE"] = style_orange
+        styles["RED"] = style_red
+    except Exception:
+        return {}
+    return styles
+
+def _style_items_of(product, cache: Dict[int, List[Any]]) -> List[Any]:
+    """
+    Itens de representação a estilizar: 'Body' do produto (ou todas as representações).
+    IfcMappedItem entra como está (estilo por instância); _colapsar_mapeados decide quando
+    a geometria de origem do tipo pode ser estilizada no lugar das instâncias.
+    """
+    rep = getattr(product, "Representation", None)
+    if rep is None:
+        return []
+    key = rep.id()
+    if key in cache:
+        return cache[key]
+    body: List[Any] = []
+    other: List[Any] = []
+    for sr in (getattr(rep, "Representations", None) or []):
+        bucket = body if getattr(sr, "RepresentationIdentifier", None) == "Body" else other
+        bucket.extend(getattr(sr, "Items", None) or [])
+    cache[key] = body or other
+    return cache[key]
+
+def _colapsar_mapeados(model, item_tag: Dict[int, Tuple[Any, str]]) -> int:
+    """
+    IfcMappedItem -> itens do RepresentationMap (geometria do tipo, compartilhada) só quando
+    todas as instâncias daquele mapa estão em item_tag com a mesma tag: estilizar a origem
+    pinta todas. Nos demais casos cada IfcMappedItem fica com o próprio estilo.
+    Altera item_tag; retorna quantos IfcMappedItem ficaram estilizados por instância.
+    """
+    por_origem: Dict[int, List[Tuple[Any, str]]] = {}
+    for item, tag in item_tag.values():
+        if item.is_a("IfcMappedItem") and item.MappingSource is not None:
+            por_origem.setdefault(item.MappingSource.id(), []).append((item, tag))
+    por_instancia = 0
+    for mapeados in por_origem.values():
+        src = mapeados[0][0].MappingSource
+        tags = {tag for _, tag in mapeados}
+        todas = {m.id() for m in model.get_inverse(src) if m.is_a("IfcMappedItem")}
+        origem = list(getattr(src.MappedRepresentation, "Items", None) or [])
+        if len(tags) != 1 or todas != {m.id() for m, _ in mapeados} or not origem:
+            por_instancia += len(mapeados)
+            continue
+        tag = tags.pop()
+        for m, _ in mapeados:
+            del item_tag[m.id()]
+        for item in origem:
+            prev = item_tag.get(item.id())
+            if prev is None or (tag == "RED" and prev[1] != "RED"):
+                item_tag[item.id()] = (item, tag)
+    return por_instancia
+
+def _assign_styles_batched(
+    ifcopenshell, model, tagged: List[Tuple[Any, str]], styles, estilos: Optional[Dict[Any, List[Any]]] = None
+) -> Dict[str, int]:
+    """
+    Mapa visual em lote: agrupa os elementos por item de representação distinto e cria um
+    IfcStyledItem por item (RED prevalece sobre ORANGE quando o item é compartilhado);
+    instâncias de tipo (IfcMappedItem) seguem _colapsar_mapeados.
+    `estilos` (indice_inverso) diz quais itens já têm IfcStyledItem: só esses passam por
+    style.assign_item_style; os demais ganham o IfcStyledItem direto.
+    Retorna contagens de elementos estilizados/sem geometria, de itens estilizados e de
+    IfcMappedItem estilizados por instância.
+    """
+    rep_cache: Dict[int, List[Any]] = {}
+    item_tag: Dict[int, Tuple[Any, str]] = {}
+    styled = skipped = 0
+    for product, tag in tagged:
+        try:
+            items = _style_items_of(product, rep_cache)
+        except Exception:
+            items = []
+        if not items:
+            skipped += 1
+            continue
+        styled += 1
+        for item in items:
+            prev = item_tag.get(item.id())
+            if prev is None or (tag == "RED" and prev[1] != "RED"):
+                item_tag[item.id()] = (item, tag)
+    por_instancia = _colapsar_mapeados(model, item_tag)
+
+    n_items = 0
+    ifc2x3 = model.schema == "IFC2X3"
+    for item, tag in item_tag.values():
+        try:
+            if estilos is None or item.id() in estilos:
+                ifcopenshell.api.run("style.assign_item_style", model, item=item, style=styles[tag])
+            else:
+                style = styles[tag]
+                if ifc2x3:
+                    style = model.create_entity("IfcPresentationStyleAssignment", (style,))
+                model.create_entity("IfcStyledItem", item, (style,))
+            n_items += 1
+        except Exception:
+            continue
+    return {"elementos_estilizados": styled, "elementos_sem_geometria": skipped, "itens_estilizados": n_items,
+            "mapeados_por_instancia": por_instancia}
+
+# Pset_QuantixOptimization: "element" (1 Pset por elemento, com IFC_ID), "shared" (1 Pset por
+# combinação de valores idênticos, ligado a N elementos por uma só IfcRelDefinesByProperties)
+# ou "auto" (shared a partir de QUANTIX_PSET_SHARED_MIN elementos no change log).
+PSET_MODE = os.environ.get("QUANTIX_PSET_MODE", "auto").strip().lower()
+PSET_SHARED_MIN = int(os.environ.get("QUANTIX_PSET_SHARED_MIN", "200") or 200)
+
+def usar_pset_compartilhado(n_elementos: int) -> bool:
+    if PSET_MODE == "shared":
+        return True
+    if PSET_MODE == "element":
+        return False
+    return n_elementos >= PSET_SHARED_MIN
+
+# ifcopenshell lê/grava só texto: .ifc.gz é descomprimido num temporário (removido logo após o open)
+# e a saída é gravada em texto e comprimida em blocos no destino.
+def abrir_modelo_ifc(ifcopenshell, ifc_path: Path):
+    ifc_path = Path(ifc_path)
+    if not is_compressed(ifc_path):
+        return ifcopenshell.open(str(ifc_path))
+    tmp = ifc_path.with_name(f".{uuid.uuid4().hex}.ifc")
+    try:
+        return ifcopenshell.open(str(decompress_file(ifc_path, tmp)))
+    finally:
+        tmp.unlink(missing_ok=True)
+
+def gravar_modelo_ifc(model, ifc_out_path: Path) -> None:
+    ifc_out_path = Path(ifc_out_path)
+    if not is_compressed(ifc_out_path):
+        model.write(str(ifc_out_path))
+        return
+    tmp = ifc_out_path.with_name(f".{uuid.uuid4().hex}.ifc")
+    part = ifc_out_path.with_name(ifc_out_path.name + ".part")
+    try:
+        model.write(str(tmp))
+        compress_file(tmp, part)
+        part.replace(ifc_out_path)
+    finally:
+        tmp.unlink(missing_ok=True)
+        part.unlink(missing_ok=True)
+
+# loader/fn do MODEL_CACHE: funções de módulo (picláveis), para poderem ir ao processo auxiliar
+def _abrir_modelo(ifc_path: Path):
+    return abrir_modelo_ifc(try_import_ifcopenshell(), ifc_path)
+
+def _clashes_do_modelo(model) -> Dict[str, Any]:
+    import ifcopenshell.geom  # type: ignore  # noqa: F401
+    return detectar_clashes(try_import_ifcopenshell(), model)
+
+def _otimizar_no_modelo(model, **kwargs) -> Tuple[bool, str]:
+    return _otimizar_modelo(try_import_ifcopenshell(), model, **kwargs)
+
+def _chave_modelo(ifc_path: Path, file_hash: Optional[str]):
+    # sem hash (chamada direta/benchmark): caminho + tamanho + mtime
+    if file_hash:
+        return file_hash
+    st = os.stat(ifc_path)
+    return (str(Path(ifc_path).resolve()), st.st_size, st.st_mtime_ns)
+
+def apply_optimizations_ifc(
+    ifc_in_path: Path,
+    ifc_out_path: Path,
+    disciplina: str,
+    change_log: List[Dict[str, Any]],
+    empreendimento: str,
+    props: dict,
+    tenant_id: str,
+    project_id: str,
+    shared_psets: Optional[bool] = None,
+    file_hash: Optional[str] = None
+) -> Tuple[bool, str]:
+    ifcopenshell = try_import_ifcopenshell()
+    if ifcopenshell is None:
+        return False, "ifcopenshell não instalado no servidor (pip install ifcopenshell)."
+
+    try:
+        # modelo parseado uma vez por processo (chave: hash); cada job edita uma cópia copy-on-write
+        return MODEL_CACHE.executar(
+            _chave_modelo(ifc_in_path, file_hash),
+            functools.partial(_abrir_modelo, ifc_in_path),
+            artifact_size(ifc_in_path),
+            functools.partial(
+                _otimizar_no_modelo, ifc_out_path=ifc_out_path, disciplina=disciplina, change_log=change_log,
+                empreendimento=empreendimento, props=props, tenant_id=tenant_id, project_id=project_id,
+                shared_psets=shared_psets,
+            ),
+        )
+    except Exception as e:
+        return False, f"Falha ao escrever IFC: {e}"
+
+def _otimizar_modelo(
+    ifcopenshell,
+    model,
+    ifc_out_path: Path,
+    disciplina: str,
+    change_log: List[Dict[str, Any]],
+    empreendimento: str,
+    props: dict,
+    tenant_id: str,
+    project_id: str,
+    shared_psets: Optional[bool],
+) -> Tuple[bool, str]:
+    # carimbo no projeto
+    try:
+        proj = model.by_type("IfcProject")[0]
+        stamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        proj.Description = (proj.Description or "") + f" | QUANTIX OTIMIZADO {stamp} | {tenant_id}/{project_id}"
+    except Exception:
+        pass
+
+    compact = "; ".join([f"{k}={v}" for k, v in props.items() if str(v).strip()][:12])[:250]
+
+    optimized_elements: List[Any] = []
+    optimized_ids: set = set()
+
+    if shared_psets is None:
+        shared_psets = usar_pset_compartilhado(len(change_log))
+    run_ts = now_iso()
+    # modo shared: valores do Pset -> elementos (ordem do change log)
+    shared_groups: Dict[Tuple[Tuple[str, str], ...], List[Any]] = {}
+    # mapa visual: (elemento, tag) aplicados em lote no fim
+    tagged: List[Tuple[Any, str]] = []
+
+    # prepara estilos (pode falhar e ficar vazio)
+    styles = _ensure_quantix_styles(ifcopenshell, model)
+    # um IfcOwnerHistory para todos os Psets/relações/grupo desta execução (não 2 por Pset)
+    owner = _owner_history(ifcopenshell, model)
+
+    # Psets/grupos/estilos já existentes, numa passada só; Psets antigos a desligar (por relação)
+    indice = indice_inverso(model, {QUANTIX_PSET})
+    pendentes: Dict[int, Tuple[Any, Any, set]] = {}
+
+    for ch in change_log:
+        try:
+            eid_num = int(str(ch["ifc_id"]).replace("#", ""))
+            ent = model.by_id(eid_num)
+            if not ent:
+                continue
+
+            # evita duplicar
+            if eid_num in optimized_ids:
+                continue
+            optimized_ids.add(eid_num)
+            optimized_elements.append(ent)
+
+            tag_visual = str(ch.get("tag_visual", "ORANGE")).upper()
+            if tag_visual not in ("ORANGE", "RED"):
+                tag_visual = "ORANGE"
+
+            # PSET
+            values = {
+                "TenantId": tenant_id,
+                "ProjectId": project_id,
+                "QuantixProject": empreendimento,
+                "Disciplina": disciplina,
+                "IFC_ID": str(ch.get("ifc_id","")),
+                "Produto": str(ch.get("produto","")),
+                "Acao": str(ch.get("acao","")),
+                "Motivo": str(ch.get("motivo","")),
+                "Referencia": str(ch.get("referencia","")),
+                "ContextoCliente": compact,
+                "EngineVersion": ENGINE_VERSION,
+                "QuantixOptimized": "TRUE",
+                "QuantixVisualTag": tag_visual,
+                "Timestamp": now_iso(),
+            }
+            # Dedup (re-otimização): no modo element o 1º Pset exclusivo do elemento é reaproveitado;
+            # os demais Pset_QuantixOptimization dele são desligados em lote depois do loop
+            reaproveitado = None
+            for rel, old in indice["psets"].get(eid_num, ()):
+                if reaproveitado is None and not shared_psets and len(rel.RelatedObjects or ()) <= 1:
+                    reaproveitado = old
+                    continue
+                pendentes.setdefault(rel.id(), (rel, old, set()))[2].add(eid_num)
+            if shared_psets:
+                # IFC_ID já está no Description-tag; o resto é igual entre elementos do grupo
+                values.pop("IFC_ID")
+                values["Timestamp"] = run_ts
+                shared_groups.setdefault(tuple(values.items()), []).append(ent)
+            else:
+                pset = reaproveitado or _novo_pset(ifcopenshell, model, [ent], QUANTIX_PSET, owner)
+                ifcopenshell.api.run("pset.edit_pset", model, pset=pset, properties=values)
+
+            # Description-tag (busca textual)
+            try:
+                ent.Description = (ent.Description or "") + f" | QUANTIX:{ch['ifc_id']}:{project_id}:{tag_visual}"
+            except Exception:
+                pass
+
+            tagged.append((ent, tag_visual))
+
+        except Exception:
+            continue
+
+    if pendentes:
+        removidos = _desligar_psets(ifcopenshell, model, pendentes)
+        logger.info("re-otimização: %d relações de Pset_QuantixOptimization ajustadas, %d Psets removidos",
+                    len(pendentes), removidos)
+
+    # Psets compartilhados: 1 Pset + 1 IfcRelDefinesByProperties por grupo de valores
+    for key, ents in shared_groups.items():
+        try:
+            pset = _novo_pset(ifcopenshell, model, ents, QUANTIX_PSET, owner)
+            ifcopenshell.api.run("pset.edit_pset", model, pset=pset, properties=dict(key))
+        except Exception:
+            continue
+
+    # STYLE MAP (se styles existir e o viewer suportar)
+    style_stats: Dict[str, int] = {}
+    if styles and tagged:
+        try:
+            style_stats = _assign_styles_batched(ifcopenshell, model, tagged, styles, indice["estilos"])
+        except Exception:
+            style_stats = {}
+
+    # 1) UPGRADE: Grupo com todos otimizados (re-otimização: o grupo existente ganha os novos membros)
+    try:
+        if optimized_elements:
+            descricao = f"Elementos otimizados automaticamente pelo Quantix Engine | {tenant_id}/{project_id}"
+            existente = indice["grupos_por_nome"].get(QUANTIX_GROUP)
+            if existente:
+                rel, group = existente[0]
+                novos = [e for e in optimized_elements
+                         if all(r.id() != rel.id() for r, _ in indice["grupos"].get(e.id(), ()))]
+                if novos:
+                    rel.RelatedObjects = list(rel.RelatedObjects or ()) + novos
+                group.Description = descricao
+            else:
+                group = model.create_entity(
+                    "IfcGroup",
+                    GlobalId=ifcopenshell.guid.new(),
+                    OwnerHistory=owner,
+                    Name=QUANTIX_GROUP,
+                    Description=descricao
+                )
+                model.create_entity(
+                    "IfcRelAssignsToGroup",
+                    GlobalId=ifcopenshell.guid.new(),
+                    OwnerHistory=owner,
+                    RelatedObjects=optimized_elements,
+                    RelatingGroup=group
+                )
+    except Exception:
+        pass
+
+    gravar_modelo_ifc(model, ifc_out_path)
+
+    if shared_groups:
+        logger.info("Pset_QuantixOptimization compartilhado: %d Psets para %d elementos",
+                    len(shared_groups), len(optimized_elements))
+    if style_stats.get("itens_estilizados"):
+        return True, (
+            "IFC OTIMIZADO gerado: Pset + Grupo (Quantix_Optimized_Elements) + Mapa visual (laranja/vermelho): "
+            f"{style_stats['elementos_estilizados']} elementos estilizados em {style_stats['itens_estilizados']} itens, "
+            f"{style_stats['elementos_sem_geometria']} sem geometria, "
+            f"{style_stats['mapeados_por_instancia']} instâncias de tipo (IfcMappedItem) estilizadas à parte."
+        )
+    return True, "IFC OTIMIZADO gerado: Pset + Grupo (Quantix_Optimized_Elements). (Mapa visual não aplicado neste ambiente.)"
+
+
+# Writer do IFC OTIMIZADO: "ifcopenshell" (modelo completo em memória), "step" (patch de linhas,
+# linear/memória constante) ou "auto" (step a partir de QUANTIX_IFC_PATCH_MIN_MB).
+IFC_WRITER = os.environ.get("QUANTIX_IFC_WRITER", "auto").strip().lower()
+IFC_PATCH_MIN_BYTES = int(float(os.environ.get("QUANTIX_IFC_PATCH_MIN_MB", "50")) * 1024 * 1024)
+
+def gerar_ifc_otimizado(
+    ifc_in_path: Path,
+    ifc_out_path: Path,
+    disciplina: str,
+    change_log: List[Dict[str, Any]],
+    empreendimento: str,
+    props: dict,
+    tenant_id: str,
+    project_id: str,
+    file_hash: Optional[str] = None
+) -> Tuple[bool, str]:
+    use_step = IFC_WRITER == "step" or (IFC_WRITER == "auto" and artifact_size(ifc_in_path) >= IFC_PATCH_MIN_BYTES)
+    # IFC já otimizado antes: o dedup de Pset exige o grafo completo -> caminho ifcopenshell
+    if use_step and not file_contains(ifc_in_path, b"Pset_QuantixOptimization"):
+        try:
+            return apply_optimizations_step(
+                ifc_in_path, ifc_out_path, disciplina, change_log, empreendimento, props,
+                tenant_id=tenant_id, project_id=project_id, engine_version=ENGINE_VERSION, timestamp=now_iso(),
+                shared_psets=usar_pset_compartilhado(len(change_log))
+            )
+        except Exception as e:
+            logger.warning("patch STEP falhou (%s); usando ifcopenshell", e)
+    return apply_optimizations_ifc(
+        ifc_in_path, ifc_out_path, disciplina, change_log, empreendimento, props,
+        tenant_id=tenant_id, project_id=project_id, file_hash=file_hash
+    )
+
+# -----------------------------------------------------------------------------
+# PDF
+# -----------------------------------------------------------------------------
+# fpdf é importado só quando o primeiro relatório é gerado (não no import do engine/app)
+@functools.lru_cache(maxsize=None)
+def pdf_report_class():
+    from fpdf import FPDF
+
+    class PDFReport(FPDF):
+        def __init__(self, doc_id: str, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self._doc_id = doc_id
+
+        def header(self):
+            self.set_font("Arial", "B", 12)
+            self.cell(0, 10, "QUANTIX | RELATORIO PROFISSIONAL", 0, 1, "C")
+            self.set_draw_color(0, 229, 255)
+            self.line(10, 20, 200, 20)
+            self.ln(12)
+
+        def footer(self):
+            self.set_y(-15)
+            self.set_font("Arial", "I", 8)
+            self.set_text_color(128)
+            self.cell(0, 10, f"Pagina {self.page_no()} | Doc ID: {self._doc_id}", 0, 0, "C")
+
+    return PDFReport
+
+def gerar_pdf(
+    empreendimento: str,
+    disciplina: str,
+    original_name: str,
+    file_hash: str,
+    props: dict,
+    dados_ifc: dict,
+    change_log: list,
+    metrics: Tuple[int,int,int,float],
+    conf: Tuple[int,str,Dict[str,int]],
+    evid_path: Optional[Path],
+    out_dir: Path,
+    doc_id: str,
+    tenant_id: str,
+    project_id: str,
+) -> Path:
+    t_antes, t_depois, econ, eff = metrics
+    conf_score, conf_label, breakdown = conf
+
+    pdf = pdf_report_class()(doc_id=doc_id)
+    pdf.add_page()
+    pdf.set_auto_page_break(auto=True, margin=15)
+
+    pdf.set_font("Arial", "B", 16)
+    pdf.cell(0, 10, pdf_safe_text(f"PROJETO: {empreendimento.upper()}", 120), ln=True)
+    pdf.set_font("Arial", "I", 11)
+    pdf.cell(0, 8, pdf_safe_text(f"Disciplina: {disciplina} | Confiança: {conf_label} ({conf_score}/100)", 120), ln=True)
+    pdf.ln(2)
+
+    pdf.set_font("Arial", "", 9)
+    pdf.set_fill_color(245,245,245)
+    pdf.cell(0, 8, pdf_safe_text(f"Data: {today_br()} | Arquivo: {original_name} | Hash: {file_hash[:12]}..."), 1, 1, "L", fill=True)
+    pdf.cell(0, 8, pdf_safe_text(f"Tenant/Project: {tenant_id}/{project_id} | Engine: {ENGINE_VERSION}", 140), 1, 1, "L", fill=True)
+    if evid_path:
+        pdf.cell(0, 8, pdf_safe_text(f"Evidência: {evid_path.name}", 140), 1, 1, "L", fill=True)
+    pdf.ln(4)
+
+    pdf.set_font("Arial", "B", 12)
+    pdf.cell(0, 8, "1) Contexto informado (propriedades)", ln=True)
+    pdf.set_font("Arial", "", 9)
+
+    if props:
+        for k, v in list(props.items())[:18]:
+            if str(v).strip():
+                pdf.set_x(pdf.l_margin)
+                pdf.multi_cell(0, 5, f"- {pdf_safe_text(k, 60)}: {pdf_safe_text(v, 220)}")
+    else:
+        pdf.set_x(pdf.l_margin)
+        pdf.multi_cell(0, 5, "Não informado.")
+    pdf.ln(2)
+
+    pdf.set_font("Arial", "B", 12)
+    pdf.cell(0, 8, "2) Indicadores", ln=True)
+    pdf.set_font("Arial", "", 10)
+    pdf.set_x(pdf.l_margin)
+    pdf.multi_cell(0, 6, pdf_safe_text(
+        f"Total original: {t_antes} | Total otimizado: {t_depois} | Economia: {econ} | Eficiência: {eff*100:.1f}%", 220
+    ))
+    pdf.set_font("Arial", "", 9)
+    pdf.set_x(pdf.l_margin)
+    pdf.multi_cell(0, 5, pdf_safe_text(
+        f"Breakdown confiança: IFC={breakdown['IFC']} | Props={breakdown['Props']} | IDs={breakdown['IDs']} | Otim={breakdown['Otim']}", 220
+    ))
+
+    pdf.ln(2)
+    pdf.set_font("Arial", "B", 12)
+    pdf.cell(0, 8, "3) Diagnóstico resumido", ln=True)
+
+    pdf.set_font("Arial", "B", 8)
+    pdf.set_fill_color(230)
+    pdf.cell(88, 7, "Elemento", 1, 0, "L", 1)
+    pdf.cell(20, 7, "Antes", 1, 0, "C", 1)
+    pdf.cell(20, 7, "Depois", 1, 0, "C", 1)
+    pdf.cell(62, 7, "Motivo", 1, 1, "L", 1)
+
+    pdf.set_font("Arial", "", 8)
+    for _k, info in (dados_ifc or {}).items():
+        pdf.cell(88, 7, pdf_safe_text(info.get("nome","N/A"), 45), 1)
+        pdf.cell(20, 7, str(info.get("antes",0)), 1, 0, "C")
+        pdf.cell(20, 7, str(info.get("depois",0)), 1, 0, "C")
+        pdf.cell(62, 7, pdf_safe_text(info.get("defeito",""), 34), 1, 1, "L")
+
+    pdf.ln(4)
+    pdf.set_font("Arial", "B", 12)
+    pdf.cell(0, 8, "4) Registro de mudanças aplicadas no IFC (por #id)", ln=True)
+    pdf.set_font("Arial", "", 9)
+    pdf.set_x(pdf.l_margin)
+    pdf.multi_cell(0, 5, "Itens marcados no IFC OTIMIZADO via PropertySet e agrupados em 'Quantix_Optimized_Elements'.")
+
+    pdf.set_font("Arial", "B", 8)
+    pdf.set_fill_color(230)
+    pdf.cell(16, 7, "IFC", 1, 0, "C", 1)
+    pdf.cell(50, 7, "Produto", 1, 0, "L", 1)
+    pdf.cell(40, 7, "Ação", 1, 0, "L", 1)
+    pdf.cell(84, 7, "Motivo (tag)", 1, 1, "L", 1)
+
+    pdf.set_font("Arial", "", 8)
+    if change_log:
+        for ch in change_log[:45]:
+            pdf.cell(16, 7, pdf_safe_text(ch.get("ifc_id",""), 8), 1)
+            pdf.cell(50, 7, pdf_safe_text(ch.get("produto",""), 28), 1)
+            pdf.cell(40, 7, pdf_safe_text(ch.get("acao",""), 22), 1)
+            motivo_tag = f"{pdf_safe_text(ch.get('motivo',''), 40)} [{ch.get('tag_visual','ORANGE')}]"
+            pdf.cell(84, 7, pdf_safe_text(motivo_tag, 46), 1, 1)
+    else:
+        pdf.cell(0, 7, "Sem mudanças aplicadas (sem IDs encontrados ou sem economia).", 1, 1)
+
+    pdf.ln(6)
+    pdf.set_font("Arial", "I", 9)
+    pdf.set_x(pdf.l_margin)
+    pdf.multi_cell(0, 5,
+        "Obs.: Nesta versão, a otimização altera o IFC com metadados rastreáveis (Pset/Description), "
+        "e cria um grupo com os elementos otimizados. O mapa visual tenta aplicar estilos (laranja/vermelho) "
+        "para facilitar revisão em viewers."
+    )
+
+    out = out_dir / f"RELATORIO_{safe_filename(disciplina)}_{safe_filename(empreendimento)}_{file_hash[:8]}_{project_id[:8]}.pdf"
+    pdf.output(str(out))
+    return out
+
+# -----------------------------------------------------------------------------
+# JSON
+# -----------------------------------------------------------------------------
+def gerar_json(
+    empreendimento: str,
+    disciplina: str,
+    file_meta: dict,
+    props: dict,
+    dados_ifc: dict,
+    change_log: list,
+    metrics: tuple,
+    conf: tuple,
+    tenant_id: str,
+    user_id: str,
+    project_id: str,
+    doc_id: str,
+) -> dict:
+    t_antes, t_depois, econ, eff = metrics
+    conf_score, conf_label, breakdown = conf
+
+    recs = []
+    for cls, info in (dados_ifc or {}).items():
+        a = int(info.get("antes",0))
+        d = int(info.get("depois",0))
+        rec = {
+            "classe": cls,
+            "produto": info.get("nome",cls),
+            "antes": a,
+            "depois": d,
+            "economia": a-d,
+            "motivo": info.get("defeito",""),
+            "referencia": info.get("ciencia",""),
+        }
+        if info.get("detalhe"):
+            rec["pares_clash"] = info["detalhe"]
+        recs.append(rec)
+    recs.sort(key=lambda x: x["economia"], reverse=True)
+
+    return {
+        "produto": "QUANTIX Professional",
+        "engine_version": ENGINE_VERSION,
+        "tenant_id": tenant_id,
+        "user_id": user_id,
+        "project_id": project_id,
+        "doc_id": doc_id,
+        "empreendimento": empreendimento,
+        "disciplina": disciplina,
+        "data_iso": now_iso(),
+        "arquivo": file_meta,
+        "propriedades_cliente": props,
+        "indicadores": {
+            "total_original": t_antes,
+            "total_otimizado": t_depois,
+            "economia_itens": econ,
+            "eficiencia_pct": round(eff*100,2),
+        },
+        "confianca": {
+            "score": conf_score,
+            "nivel": conf_label,
+            "breakdown": breakdown,
+        },
+        "recomendacoes_resumo": recs[:250],
+        "registro_mudancas_aplicadas": change_log[:800],
+        "visual_map": {
+            "group_name": "Quantix_Optimized_Elements",
+            "tags": {
+                "ORANGE": "Otimizado (geral)",
+                "RED": "Conflito/Interferência (prioridade)",
+            }
+        }
+    }
+
+# -----------------------------------------------------------------------------
+# PIPELINE SALVAR
+# -----------------------------------------------------------------------------
+def _sem_progresso(stage: str, frac: float, message: str = "") -> None:
+    pass
+
+def salvar_projeto(
+    tenant_id: str,
+    user_id: str,
+    empreendimento: str,
+    disciplina: str,
+    upload: Dict[str, Any],
+    props: dict,
+    project_id: Optional[str] = None,
+    progress=None,
+) -> Dict[str, Any]:
+    """
+    Pipeline completo (análise -> IFC OTIMIZADO -> JSON/PDF -> DB), sem chamadas de UI:
+    roda na thread do script ou num worker da fila. `upload` vem de spool_upload
+    ({"name", "path", "hash", "size"}); `progress(stage, frac, msg)` recebe o andamento.
+    Retorna {"project_id", "status", "message", "warnings"}.
+    """
+    progress = progress or _sem_progresso
+    original_name = upload["name"]
+    file_hash = upload["hash"]
+    file_size = int(upload["size"])
+    spool_path = Path(upload["path"])
+    project_id = project_id or make_project_id()
+    doc_id = make_doc_id(project_id, file_hash)
+    file_type = "PDF" if is_pdf(original_name) else "IFC"
+
+    proj_dir = tenant_root(tenant_id) / "artefatos" / project_id
+    proj_dir.mkdir(parents=True, exist_ok=True)
+
+    evid_path: Optional[Path] = None
+    ifc_original_path: Optional[Path] = None
+    ifc_otimizado_path: Optional[Path] = None
+
+    dados_ifc: dict = {}
+    change_log: list = []
+    has_ids = False
+    optimization_applied = False
+    status = "processing"
+    warnings: List[str] = []
+    opt_msg = ""
+
+    ppath = props_path(tenant_id, project_id, disciplina)
+    save_props(tenant_id, project_id, disciplina, props)
+
+    proj_row = {
+        "project_id": project_id,
+        "tenant_id": tenant_id,
+        "user_id": user_id,
+        "empreendimento": empreendimento,
+        "disciplina": disciplina,
+        "created_at_iso": now_iso(),
+        "created_at_br": today_br(),
+        "status": status,
+        "engine_version": ENGINE_VERSION,
+        "doc_id": doc_id,
+        "file_hash": file_hash,
+        "original_name": original_name,
+        "file_type": file_type,
+        "file_size_bytes": file_size,
+        "total_original": 0,
+        "total_otimizado": 0,
+        "economia_itens": 0,
+        "eficiencia_num": 0.0,
+        "confianca_label": "Pendente",
+        "confianca_score": 0,
+    }
+    files_row = {
+        "project_id": project_id,
+        "tenant_id": tenant_id,
+        "ifc_original_path": None,
+        "ifc_otimizado_path": None,
+        "evid_pdf_path": None,
+        "relatorio_pdf_path": None,
+        "recomendacoes_json_path": None,
+        "props_json_path": str(ppath),
+    }
+    # linha "processing" visível no Portfólio/DOCS enquanto o pipeline roda
+    upsert_project(proj_row, files_row)
+    progress("upload", 0.05, "Arquivo recebido")
+
+    if is_pdf(original_name):
+        evid_path = BLOBS.put(tenant_id, project_id, "evidencia", spool_path, file_hash, file_size, ".pdf")
+        status = "done"  # sem IFC
+    else:
+        ifc_original_path = BLOBS.put(
+            tenant_id, project_id, "original", spool_path, file_hash, file_size,
+            compressed_name(".ifc"), compress=ARTIFACT_COMPRESS,
+        )
+        # sidecar .qidx (ao lado do blob, compartilhado entre projetos com o mesmo arquivo):
+        # classe -> #ids/offsets/GlobalIds para reprocesso, lookup e diff de revisões
+        progress("indice", 0.10, "Indexando entidades")
+        abrir_indice_entidades(ifc_original_path, file_hash)
+
+        progress("analise", 0.25, f"Analisando IFC ({disciplina})")
+        dados_ifc, ids_map = analisar_ifc_arquivo(disciplina, ifc_original_path, file_hash)
+
+        has_ids = any(len(v) > 0 for v in ids_map.values())
+        change_log = build_change_log(dados_ifc, ids_map)
+
+        progress("ifc", 0.40, f"Gerando IFC OTIMIZADO ({len(change_log)} elementos)")
+        ifc_otimizado_path = proj_dir / compressed_name(f"OTIMIZADO_{safe_filename(disciplina)}_{safe_filename(original_name)}_{file_hash[:8]}.ifc")
+        ok, opt_msg = gerar_ifc_otimizado(
+            ifc_original_path, ifc_otimizado_path,
+            disciplina, change_log, empreendimento, props,
+            tenant_id=tenant_id, project_id=project_id, file_hash=file_hash
+        )
+        if ok:
+            optimization_applied = True
+            status = "done"
+        else:
+            warnings.append(opt_msg)
+            ifc_otimizado_path = ifc_original_path
+            status = "done_with_warning"
+
+    metrics = calcular_metricas(dados_ifc)
+    conf = confidence_0_100(dados_ifc, props, disciplina, has_ids=has_ids, optimization_applied=optimization_applied)
+
+    file_meta = {
+        "nome_original": original_name,
+        "hash_sha256": file_hash,
+        "tipo": file_type,
+        "tamanho_bytes": file_size,
+    }
+
+    progress("json", 0.75, "Gerando JSON técnico")
+    obj = gerar_json(
+        empreendimento, disciplina, file_meta, props, dados_ifc, change_log, metrics, conf,
+        tenant_id=tenant_id, user_id=user_id, project_id=project_id, doc_id=doc_id
+    )
+
+    rec_path = proj_dir / f"RECOMENDACOES_{safe_filename(disciplina)}_{safe_filename(empreendimento)}_{file_hash[:8]}_{project_id[:8]}.json"
+    rec_path.write_text(json.dumps(obj, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    progress("pdf", 0.85, "Gerando relatório PDF")
+    pdf_path = gerar_pdf(
+        empreendimento, disciplina, original_name, file_hash, props, dados_ifc, change_log,
+        metrics, conf, evid_path, out_dir=proj_dir, doc_id=doc_id, tenant_id=tenant_id, project_id=project_id
+    )
+
+    t_antes, t_depois, econ, eff = metrics
+    conf_score, conf_label, _breakdown = conf
+
+    proj_row.update({
+        "status": status,
+        "total_original": int(t_antes),
+        "total_otimizado": int(t_depois),
+        "economia_itens": int(econ),
+        "eficiencia_num": float(eff),
+        "confianca_label": conf_label,
+        "confianca_score": int(conf_score),
+    })
+    files_row.update({
+        "ifc_original_path": str(ifc_original_path) if ifc_original_path else None,
+        "ifc_otimizado_path": str(ifc_otimizado_path) if ifc_otimizado_path else None,
+        "evid_pdf_path": str(evid_path) if evid_path else None,
+        "relatorio_pdf_path": str(pdf_path),
+        "recomendacoes_json_path": str(rec_path),
+    })
+
+    progress("db", 0.95, "Gravando no banco")
+    upsert_project(proj_row, files_row)
+
+    message = opt_msg if optimization_applied else "Concluído."
+    return {"project_id": project_id, "status": status, "message": message, "warnings": warnings}
+
+# -----------------------------------------------------------------------------
+# FILA DE JOBS (pipeline em background)
+# -----------------------------------------------------------------------------
+JOB_QUEUE = JobQueue(DB_PATH)
+
+def marcar_status_projeto(project_id: str, tenant_id: str, status: str) -> None:
+    with DB.write("marcar_status_projeto") as con:
+        con.execute("UPDATE projects SET status=? WHERE project_id=? AND tenant_id=?", (status, project_id, tenant_id))
+
+def executar_job(job: Dict[str, Any], progress) -> Dict[str, Any]:
+    p = job["payload"]
+    if job["kind"] != "salvar_projeto":
+        raise ValueError(f"tipo de job desconhecido: {job['kind']}")
+    try:
+        result = salvar_projeto(
+            p["tenant_id"], p["user_id"], p["empreendimento"], p["disciplina"],
+            p["upload"], p.get("props") or {}, project_id=p["project_id"], progress=progress,
+        )
+    except Exception:
+        marcar_status_projeto(p["project_id"], p["tenant_id"], "error")
+        raise
+    # o MODEL_CACHE é do processo que rodou o job (worker): o painel só o vê por aqui
+    result["model_cache"] = MODEL_CACHE.stats()
+    return result
+
+def enfileirar_projeto(
+    tenant_id: str, user_id: str, empreendimento: str, disciplina: str, upload: Dict[str, Any], props: dict,
+    batch_id: Optional[str] = None, owned: bool = False,
+) -> str:
+    """
+    Grava o job salvar_projeto (quem tiver um JobWorkerPool na mesma base processa).
+    owned=True: só o pool deste processo, pelo batch_id (CLI); ver JobQueue.enqueue.
+    """
+    project_id = make_project_id()
+    JOB_QUEUE.enqueue(project_id, tenant_id, user_id, "salvar_projeto", {
+        "tenant_id": tenant_id,
+        "user_id": user_id,
+        "empreendimento": empreendimento,
+        "disciplina": disciplina,
+        "upload": {k: upload[k] for k in ("name", "path", "hash", "size")},
+        "props": props,
+        "project_id": project_id,
+    }, batch_id=batch_id, owned=owned)
+    return project_id
+
+def enfileirar_lote(
+    tenant_id: str, user_id: str, empreendimento: str, disciplina: str, uploads: List[Dict[str, Any]], props: dict,
+) -> str:
+    """Um job por arquivo, todos com o mesmo batch_id; o pool roda até JOB_WORKERS em paralelo."""
+    batch_id = make_project_id()
+    for upload in uploads:
+        enfileirar_projeto(tenant_id, user_id, empreendimento, disciplina, upload, props, batch_id=batch_id)
+    return batch_id
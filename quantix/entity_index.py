@@ -0,0 +1,283 @@
+# quantix/entity_index.py — índice de entidades persistido ao lado do ORIGINAL_*.ifc
+#
+# Sidecar binário "<ORIGINAL>.ifc.qidx" (NumPy, sem dicts de listas):
+#   MAGIC | u64 tamanho do header | header JSON | seções de arrays
+#   - ids      int64[N]   #id de cada entidade, agrupados por classe (ordem do arquivo)
+#   - offsets  int64[N]   byte offset do '#id=' no IFC
+#   - guids    S22[N]     GlobalId (1º atributo, se for um GUID IFC; vazio senão)
+#   - sorted_ids / sorted_pos  int64[N]  busca binária por #id
+# Cada classe ocupa a faixa [start, start+count) das seções. Leitura via np.memmap:
+# só as páginas da faixa pedida são carregadas.
+
+import re
+import json
+import uuid
+import struct
+from array import array
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+from quantix.step_scan import iter_step_chunks
+from quantix.artifact_io import open_artifact
+
+IDX_MAGIC = b"QXIDX1\n"
+IDX_VERSION = 1
+
+_STEP_ENTITY_GUID_RE_B = re.compile(rb"#(\d+)\s*=\s*([A-Z0-9_]+)\s*\(\s*(?:'([0-9A-Za-z_$]{22})')?")
+
+def entity_index_path(ifc_path: Path) -> Path:
+    return Path(ifc_path).with_name(Path(ifc_path).name + ".qidx")
+
+def _collect(fp) -> Tuple[List[bytes], np.ndarray, np.ndarray, np.ndarray, List[bytes], int]:
+    class_names: List[bytes] = []
+    class_code: Dict[bytes, int] = {}
+    codes = array("i")
+    ids = array("q")
+    offsets = array("q")
+    guids: List[bytes] = []
+    base = 0
+    text_len = 0
+    for chunk in iter_step_chunks(fp):
+        for m in _STEP_ENTITY_GUID_RE_B.finditer(chunk):
+            cls = m.group(2)
+            code = class_code.get(cls)
+            if code is None:
+                code = class_code[cls] = len(class_names)
+                class_names.append(cls)
+            codes.append(code)
+            ids.append(int(m.group(1)))
+            offsets.append(base + m.start())
+            guids.append(m.group(3) or b"")
+        base += len(chunk)
+        text_len += len(chunk) if chunk.isascii() else len(chunk.decode("utf-8", errors="replace"))
+    return (
+        class_names,
+        np.frombuffer(codes, dtype=np.int32),
+        np.frombuffer(ids, dtype=np.int64),
+        np.frombuffer(offsets, dtype=np.int64),
+        guids,
+        text_len,
+    )
+
+def build_entity_index(ifc_path: Path, out_path: Optional[Path] = None, file_hash: str = "") -> Path:
+    """Varre o IFC uma vez (em blocos) e grava o sidecar. Retorna o caminho do .qidx."""
+    ifc_path = Path(ifc_path)
+    out_path = Path(out_path) if out_path else entity_index_path(ifc_path)
+    with open_artifact(ifc_path) as fp:
+        class_names, codes, ids, offsets, guids, text_len = _collect(fp)
+
+    # agrupa por classe mantendo a ordem do arquivo dentro de cada classe
+    order = np.argsort(codes, kind="stable")
+    ids = ids[order]
+    offsets = offsets[order]
+    guid_arr = np.asarray(guids, dtype="S22")[order] if guids else np.zeros(0, dtype="S22")
+    counts = np.bincount(codes, minlength=len(class_names)) if len(codes) else np.zeros(0, dtype=np.int64)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]]) if len(counts) else counts
+
+    sorted_pos = np.argsort(ids, kind="stable").astype(np.int64)
+    sorted_ids = ids[sorted_pos]
+
+    sections = [
+        ("ids", ids), ("offsets", offsets), ("guids", guid_arr),
+        ("sorted_ids", sorted_ids), ("sorted_pos", sorted_pos),
+    ]
+    header: Dict[str, Any] = {
+        "version": IDX_VERSION,
+        "file_hash": file_hash,
+        "file_size": ifc_path.stat().st_size,
+        "text_len": int(text_len),
+        "n": int(len(ids)),
+        "classes": {
+            c.decode("ascii"): [int(s), int(n)] for c, s, n in zip(class_names, starts, counts)
+        },
+        "sections": {},
+    }
+    # offsets das seções são relativos ao fim do header
+    rel = 0
+    for name, arr in sections:
+        header["sections"][name] = [rel, arr.dtype.str]
+        rel += arr.nbytes
+    header_bytes = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    data_start = len(IDX_MAGIC) + 8 + len(header_bytes)
+
+    # tmp único por processo: jobs paralelos sobre o mesmo blob indexam ao mesmo tempo
+    tmp = out_path.with_name(f"{out_path.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        with open(tmp, "wb") as out:
+            out.write(IDX_MAGIC)
+            out.write(struct.pack("<Q", len(header_bytes)))
+            out.write(header_bytes)
+            if out.tell() != data_start:
+                raise RuntimeError(f"header do sidecar com tamanho inesperado: {out.tell()} != {data_start}")
+            for _name, arr in sections:
+                out.write(np.ascontiguousarray(arr).tobytes())
+        try:
+            tmp.replace(out_path)
+        except OSError:
+            # outro job gravou o mesmo índice (destino aberto/mapeado no Windows): o dele vale
+            if not out_path.exists():
+                raise
+    finally:
+        tmp.unlink(missing_ok=True)
+    return out_path
+
+class EntityIndex:
+    """Leitura preguiçosa do sidecar; `get(cls)` é compatível com ids_map em build_change_log."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with open(self.path, "rb") as fp:
+            if fp.read(len(IDX_MAGIC)) != IDX_MAGIC:
+                raise ValueError(f"sidecar inválido: {self.path}")
+            (hlen,) = struct.unpack("<Q", fp.read(8))
+            if hlen > self.path.stat().st_size:
+                raise ValueError(f"sidecar inválido (header de {hlen} bytes): {self.path}")
+            self.header: Dict[str, Any] = json.loads(fp.read(hlen).decode("utf-8"))
+        self._data_start = len(IDX_MAGIC) + 8 + hlen
+        self.classes: Dict[str, List[int]] = self.header["classes"]
+        self.n = int(self.header["n"])
+        self._maps: Dict[str, np.ndarray] = {}
+
+    @classmethod
+    def for_ifc(cls, ifc_path: Path, file_hash: str = "") -> Optional["EntityIndex"]:
+        """
+        Sidecar válido do IFC, ou None (ausente, corrompido/truncado ou desatualizado: o chamador
+        volta ao scan/rebuild). Desatualizado = tamanho diferente ou, se os dois lados têm hash, hash diferente.
+        """
+        p = entity_index_path(ifc_path)
+        if not p.exists():
+            return None
+        try:
+            idx = cls(p)
+            if idx.header.get("file_size") != Path(ifc_path).stat().st_size:
+                return None  # IFC mudou depois do índice
+            if file_hash and idx.header.get("file_hash") and idx.header["file_hash"] != file_hash:
+                return None
+            if p.stat().st_size < idx._data_end():
+                return None  # sidecar truncado (gravação interrompida, disco cheio)
+        except (OSError, ValueError, KeyError, TypeError, struct.error):
+            return None
+        return idx
+
+    def _data_end(self) -> int:
+        fim = self._data_start
+        for rel, dtype in self.header["sections"].values():
+            fim = max(fim, self._data_start + int(rel) + self.n * np.dtype(dtype).itemsize)
+        return fim
+
+    def _section(self, name: str) -> np.ndarray:
+        arr = self._maps.get(name)
+        if arr is None:
+            rel, dtype = self.header["sections"][name]
+            if self.n == 0:
+                arr = np.zeros(0, dtype=np.dtype(dtype))
+            else:
+                arr = np.memmap(self.path, dtype=np.dtype(dtype), mode="r", offset=self._data_start + rel, shape=(self.n,))
+            self._maps[name] = arr
+        return arr
+
+    # --- ids_map / scan compat ------------------------------------------------
+    @property
+    def counts(self) -> Dict[str, int]:
+        return {c: int(n) for c, (_s, n) in self.classes.items()}
+
+    @property
+    def text_len(self) -> int:
+        return int(self.header.get("text_len", 0))
+
+    def class_slice(self, classe: str, start: int = 0, stop: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """Faixa [start:stop] das entidades da classe: ids, offsets e guids (np arrays)."""
+        if classe not in self.classes:
+            empty = np.zeros(0, dtype=np.int64)
+            return {"ids": empty, "offsets": empty, "guids": np.zeros(0, dtype="S22")}
+        s, n = self.classes[classe]
+        a = s + max(0, min(start, n))
+        b = s + (n if stop is None else max(0, min(stop, n)))
+        return {
+            "ids": np.asarray(self._section("ids")[a:b]),
+            "offsets": np.asarray(self._section("offsets")[a:b]),
+            "guids": np.asarray(self._section("guids")[a:b]),
+        }
+
+    def class_ids(self, classe: str, limit: Optional[int] = None) -> List[str]:
+        return [f"#{int(i)}" for i in self.class_slice(classe, 0, limit)["ids"]]
+
+    def get(self, classe: str, default: Optional[List[str]] = None) -> List[str]:
+        if classe not in self.classes:
+            return [] if default is None else default
+        return self.class_ids(classe)
+
+    def has_ids(self) -> bool:
+        return self.n > 0
+
+    def max_id(self) -> int:
+        return int(self._section("sorted_ids")[-1]) if self.n else 0
+
+    def to_scan(self) -> Dict[str, Any]:
+        """Mesmo formato de quantix.step_scan (counts/ids/text_len), sem reler o IFC."""
+        return {
+            "counts": self.counts,
+            "ids": {c: self.class_ids(c) for c in self.classes},
+            "text_len": self.text_len,
+        }
+
+    # --- lookup por elemento --------------------------------------------------
+    def lookup(self, eid: int) -> Optional[Dict[str, Any]]:
+        sorted_ids = self._section("sorted_ids")
+        k = int(np.searchsorted(sorted_ids, eid))
+        if k >= self.n or int(sorted_ids[k]) != int(eid):
+            return None
+        pos = int(self._section("sorted_pos")[k])
+        classe = next((c for c, (s, n) in self.classes.items() if s <= pos < s + n), "")
+        return {
+            "ifc_id": f"#{int(eid)}",
+            "classe": classe,
+            "offset": int(self._section("offsets")[pos]),
+            "guid": self._section("guids")[pos].decode("ascii"),
+        }
+
+    def read_entity(self, ifc_path: Path, eid: int, max_len: int = 1024 * 1024) -> Optional[str]:
+        """Lê só a linha STEP da entidade (seek no offset), sem varrer o arquivo."""
+        hit = self.lookup(eid)
+        if hit is None:
+            return None
+        with open_artifact(ifc_path) as fp:
+            fp.seek(hit["offset"])
+            buf = fp.read(max_len)
+        end = buf.find(b";")
+        return buf[: end + 1 if end >= 0 else len(buf)].decode("utf-8", errors="replace")
+
+    def guids(self, classe: Optional[str] = None) -> np.ndarray:
+        if classe is None:
+            return np.asarray(self._section("guids"))
+        return self.class_slice(classe)["guids"]
+
+def diff_entity_indexes(old: EntityIndex, new: EntityIndex, sample: int = 50) -> Dict[str, Dict[str, Any]]:
+    """
+    Diff de revisão por GlobalId, classe a classe (só lê as seções guids dos dois sidecars).
+    Retorna {classe: {"adicionados": n, "removidos": n, "mantidos": n, "amostra_adicionados": [...], ...}}.
+    """
+    out: Dict[str, Dict[str, Any]] = {}
+    for classe in sorted(set(old.classes) | set(new.classes)):
+        g_old = old.guids(classe)
+        g_new = new.guids(classe)
+        g_old = g_old[g_old != b""]
+        g_new = g_new[g_new != b""]
+        if not len(g_old) and not len(g_new):
+            continue
+        added = np.setdiff1d(g_new, g_old, assume_unique=False)
+        removed = np.setdiff1d(g_old, g_new, assume_unique=False)
+        kept = np.intersect1d(g_old, g_new)
+        if not len(added) and not len(removed):
+            out[classe] = {"adicionados": 0, "removidos": 0, "mantidos": int(len(kept))}
+            continue
+        out[classe] = {
+            "adicionados": int(len(added)),
+            "removidos": int(len(removed)),
+            "mantidos": int(len(kept)),
+            "amostra_adicionados": [g.decode("ascii") for g in added[:sample]],
+            "amostra_removidos": [g.decode("ascii") for g in removed[:sample]],
+        }
+    return out
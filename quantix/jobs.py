@@ -0,0 +1,384 @@
+# quantix/jobs.py — fila de jobs em SQLite + pool de workers no processo do servidor
+#
+# - enqueue() grava o job como "queued"; os workers fazem claim atômico (BEGIN IMMEDIATE)
+# - tudo passa pelo SQLitePool do banco (quantix.db): escritor único por processo, leitores reaproveitados
+# - o handler recebe (job, progress) e reporta etapa/percentual, gravados na tabela jobs
+# - jobs "running" de um processo que morreu (restart/redeploy) voltam para "queued" no start
+# - JOB_EXECUTOR=process: cada thread do pool entrega o job a um ProcessPoolExecutor (spawn) do
+#   mesmo tamanho -> no máximo JOB_WORKERS pipelines em paralelo, fora do GIL do servidor.
+#   O handler precisa ser função de módulo (picklable); o progresso é gravado pelo próprio filho.
+# - lotes: jobs com o mesmo batch_id (upload de vários arquivos) são listados juntos, com o
+#   tempo de parede do lote (primeiro enqueue -> último término)
+# - owner_id: lote enfileirado pela CLI pertence ao processo dela (host:pid); o pool do servidor
+#   só pega jobs sem dono. Se o processo dono morre, requeue_orphans libera os jobs para o servidor.
+# Um refresh do navegador não mata o job: ele roda fora da thread do script Streamlit.
+
+import os
+import json
+import time
+import socket
+import logging
+import threading
+import traceback
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Callable
+
+from quantix.db import get_pool
+
+logger = logging.getLogger("quantix.jobs")
+
+JOB_WORKERS = int(os.environ.get("QUANTIX_JOB_WORKERS", "2") or 2)
+JOB_EXECUTOR = os.environ.get("QUANTIX_JOB_EXECUTOR", "process").strip().lower()
+
+JOB_ACTIVE = ("queued", "running")
+
+ProgressFn = Callable[[str, float, str], None]
+JobHandler = Callable[[Dict[str, Any], ProgressFn], Dict[str, Any]]
+
+def _now_iso() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+def _worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def _parse_iso(s: Optional[str]) -> Optional[datetime]:
+    try:
+        return datetime.fromisoformat(s) if s else None
+    except ValueError:
+        return None
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+class JobQueue:
+    """Fila sobre o SQLitePool do banco: escritas no escritor único do processo, leituras no pool."""
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.pool = get_pool(self.db_path)
+        self.pool.once("jobs_schema", self._init_schema)
+
+    def _init_schema(self) -> None:
+        with self.pool.write("jobs_schema") as con:
+            con.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                tenant_id TEXT NOT NULL,
+                user_id TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                payload_json TEXT NOT NULL,
+                status TEXT NOT NULL,
+                stage TEXT NOT NULL DEFAULT '',
+                progress REAL NOT NULL DEFAULT 0,
+                message TEXT NOT NULL DEFAULT '',
+                result_json TEXT,
+                worker_id TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                created_at_iso TEXT NOT NULL,
+                started_at_iso TEXT,
+                updated_at_iso TEXT NOT NULL,
+                finished_at_iso TEXT
+            );
+            """)
+            con.execute("""
+            CREATE INDEX IF NOT EXISTS idx_jobs_tenant_created
+            ON jobs(tenant_id, created_at_iso DESC);
+            """)
+            con.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs(status, created_at_iso);")
+            cols = {r["name"] for r in con.execute("PRAGMA table_info(jobs)").fetchall()}
+            if "batch_id" not in cols:
+                con.execute("ALTER TABLE jobs ADD COLUMN batch_id TEXT")
+            con.execute("CREATE INDEX IF NOT EXISTS idx_jobs_batch ON jobs(batch_id, created_at_iso);")
+            if "owner_id" not in cols:
+                con.execute("ALTER TABLE jobs ADD COLUMN owner_id TEXT")
+
+    def enqueue(
+        self, job_id: str, tenant_id: str, user_id: str, kind: str, payload: Dict[str, Any],
+        batch_id: Optional[str] = None, owned: bool = False,
+    ) -> str:
+        """owned=True: o job é deste processo (CLI), que o drena pelo batch_id; o servidor não o pega."""
+        now = _now_iso()
+        owner_id = _worker_id() if owned else None
+        with self.pool.write("job_enqueue") as con:
+            con.execute("""
+                INSERT INTO jobs (job_id, tenant_id, user_id, kind, payload_json, status, message, created_at_iso,
+                                  updated_at_iso, batch_id, owner_id)
+                VALUES (?, ?, ?, ?, ?, 'queued', 'Na fila', ?, ?, ?, ?)
+            """, (job_id, tenant_id, user_id, kind, json.dumps(payload, ensure_ascii=False), now, now, batch_id, owner_id))
+        return job_id
+
+    def claim(self, batch_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Próximo job 'queued': só do lote, se batch_id for dado; senão só jobs sem dono (owner_id NULL).
+        BEGIN IMMEDIATE do escritor do pool.
+        """
+        with self.pool.write("job_claim") as con:
+            if batch_id is None:
+                r = con.execute("""
+                    SELECT * FROM jobs WHERE status='queued' AND owner_id IS NULL ORDER BY created_at_iso ASC LIMIT 1
+                """).fetchone()
+            else:
+                r = con.execute("""
+                    SELECT * FROM jobs WHERE status='queued' AND batch_id=? ORDER BY created_at_iso ASC LIMIT 1
+                """, (batch_id,)).fetchone()
+            if r is None:
+                return None
+            now = _now_iso()
+            con.execute("""
+                UPDATE jobs SET status='running', worker_id=?, attempts=attempts+1,
+                       started_at_iso=?, updated_at_iso=?, message='Iniciando'
+                WHERE job_id=?
+            """, (_worker_id(), now, now, r["job_id"]))
+        job = dict(r)
+        job["payload"] = json.loads(job.pop("payload_json"))
+        return job
+
+    def progress(self, job_id: str, stage: str, frac: float, message: str = "") -> None:
+        with self.pool.write("job_progress") as con:
+            con.execute("""
+                UPDATE jobs SET stage=?, progress=?, message=?, updated_at_iso=? WHERE job_id=?
+            """, (stage, float(max(0.0, min(1.0, frac))), message, _now_iso(), job_id))
+
+    def finish(self, job_id: str, result: Dict[str, Any]) -> None:
+        now = _now_iso()
+        with self.pool.write("job_finish") as con:
+            con.execute("""
+                UPDATE jobs SET status='done', stage='fim', progress=1, message=?, result_json=?,
+                       updated_at_iso=?, finished_at_iso=?
+                WHERE job_id=?
+            """, (str(result.get("message", "Concluído")), json.dumps(result, ensure_ascii=False), now, now, job_id))
+
+    def fail(self, job_id: str, error: str) -> None:
+        now = _now_iso()
+        with self.pool.write("job_fail") as con:
+            con.execute("""
+                UPDATE jobs SET status='error', message=?, updated_at_iso=?, finished_at_iso=? WHERE job_id=?
+            """, (error[:2000], now, now, job_id))
+
+    def requeue_orphans(self) -> int:
+        """
+        Volta para a fila jobs 'running' cujo processo (neste host) não existe mais, e libera para
+        o servidor (owner_id NULL) os jobs ativos de um processo dono (CLI) que morreu.
+        """
+        host = socket.gethostname()
+        n = 0
+        with self.pool.write("job_requeue_orphans") as con:
+            for r in con.execute("""
+                SELECT DISTINCT owner_id FROM jobs WHERE owner_id IS NOT NULL AND status IN ('queued', 'running')
+            """).fetchall():
+                o_host, _, o_pid = str(r["owner_id"]).rpartition(":")
+                if o_host != host or not o_pid.isdigit() or int(o_pid) == os.getpid() or _pid_alive(int(o_pid)):
+                    continue
+                # só os 'queued' entram na contagem aqui; os 'running' são contados logo abaixo
+                n += con.execute("""
+                    UPDATE jobs SET owner_id=NULL, updated_at_iso=? WHERE owner_id=? AND status='queued'
+                """, (_now_iso(), r["owner_id"])).rowcount
+                con.execute("UPDATE jobs SET owner_id=NULL WHERE owner_id=? AND status='running'", (r["owner_id"],))
+            for r in con.execute("SELECT job_id, worker_id FROM jobs WHERE status='running'").fetchall():
+                wid = str(r["worker_id"] or "")
+                w_host, _, w_pid = wid.rpartition(":")
+                if w_host != host or not w_pid.isdigit():
+                    continue
+                if int(w_pid) == os.getpid() or not _pid_alive(int(w_pid)):
+                    con.execute("""
+                        UPDATE jobs SET status='queued', worker_id=NULL, message='Reenfileirado após reinício',
+                               updated_at_iso=?
+                        WHERE job_id=? AND status='running'
+                    """, (_now_iso(), r["job_id"]))
+                    n += 1
+        return n
+
+    @staticmethod
+    def _decode(rows) -> List[Dict[str, Any]]:
+        out = []
+        for r in rows:
+            d = dict(r)
+            d["payload"] = json.loads(d.pop("payload_json") or "{}")
+            d["result"] = json.loads(d.pop("result_json") or "null")
+            out.append(d)
+        return out
+
+    def list_for_tenant(self, tenant_id: str, limit: int = 20) -> List[Dict[str, Any]]:
+        with self.pool.read("job_list_tenant") as con:
+            rows = con.execute("""
+                SELECT job_id, kind, status, stage, progress, message, result_json,
+                       created_at_iso, started_at_iso, finished_at_iso, payload_json, batch_id
+                FROM jobs WHERE tenant_id=?
+                ORDER BY created_at_iso DESC LIMIT ?
+            """, (tenant_id, int(limit))).fetchall()
+        return self._decode(rows)
+
+    def active_ids(self, tenant_id: str) -> List[str]:
+        with self.pool.read("job_active_ids") as con:
+            rows = con.execute("""
+                SELECT job_id FROM jobs WHERE tenant_id=? AND status IN ('queued', 'running')
+            """, (tenant_id,)).fetchall()
+        return [r["job_id"] for r in rows]
+
+    def list_batch(self, batch_id: str, tenant_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Jobs do lote na ordem de envio (tenant_id restringe ao tenant da sessão)."""
+        sql = """
+            SELECT job_id, kind, status, stage, progress, message, result_json,
+                   created_at_iso, started_at_iso, finished_at_iso, payload_json, batch_id
+            FROM jobs WHERE batch_id=?
+        """
+        args: List[Any] = [batch_id]
+        if tenant_id is not None:
+            sql += " AND tenant_id=?"
+            args.append(tenant_id)
+        with self.pool.read("job_list_batch") as con:
+            rows = con.execute(sql + " ORDER BY created_at_iso, rowid", args).fetchall()
+        return self._decode(rows)
+
+def batch_summary(jobs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Contagens do lote + tempo de parede (primeiro enqueue -> último término, ou até agora se
+    ainda houver job ativo) e soma dos tempos por arquivo (wall < soma = ganho do paralelismo).
+    """
+    status = [j["status"] for j in jobs]
+    ativos = sum(1 for s in status if s in JOB_ACTIVE)
+    inicio = min((t for t in (_parse_iso(j["created_at_iso"]) for j in jobs) if t), default=None)
+    fins = [t for t in (_parse_iso(j.get("finished_at_iso")) for j in jobs) if t]
+    fim = datetime.now() if ativos or not fins else max(fins)
+    soma = sum(float((j.get("result") or {}).get("elapsed_s") or 0.0) for j in jobs)
+    return {
+        "n": len(jobs),
+        "concluidos": sum(1 for s in status if s == "done"),
+        "erros": sum(1 for s in status if s == "error"),
+        "ativos": ativos,
+        "wall_s": max(0.0, (fim - inicio).total_seconds()) if inicio else 0.0,
+        "soma_s": round(soma, 3),
+    }
+
+# -----------------------------------------------------------------------------
+# execução em processo (lado do filho)
+# -----------------------------------------------------------------------------
+_CHILD_QUEUES: Dict[str, JobQueue] = {}
+
+def _init_job_process(workers: int) -> None:
+    # BLAS/OpenMP com 1 thread: os jobs já rodam em paralelo entre si, e o filho precisa ficar sem
+    # threads nativas para o copy-on-write do MODEL_CACHE (pode_fork); só vale se o numpy ainda não carregou
+    for var in ("OPENBLAS_NUM_THREADS", "OMP_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ.setdefault(var, "1")
+    # o scan paralelo de um job divide os núcleos com os outros jobs simultâneos
+    from quantix import step_scan
+    step_scan.SCAN_WORKERS = max(1, step_scan.SCAN_WORKERS // max(1, workers))
+
+def _run_in_process(handler: JobHandler, db_path: str, job: Dict[str, Any]) -> Dict[str, Any]:
+    queue = _CHILD_QUEUES.get(db_path)
+    if queue is None:
+        queue = _CHILD_QUEUES[db_path] = JobQueue(Path(db_path))
+
+    def progress(stage: str, frac: float, message: str = "") -> None:
+        try:
+            queue.progress(job["job_id"], stage, frac, message)
+        except Exception:
+            pass
+
+    t0 = time.perf_counter()
+    result = handler(job, progress) or {}
+    result.setdefault("elapsed_s", round(time.perf_counter() - t0, 3))
+    return result
+
+class JobWorkerPool:
+    """Threads daemon que drenam a fila; uma instância por processo do servidor."""
+
+    def __init__(
+        self, queue: JobQueue, handler: JobHandler, workers: int = JOB_WORKERS, idle_poll_s: float = 1.0,
+        executor: str = JOB_EXECUTOR, batch_id: Optional[str] = None,
+    ):
+        self.queue = queue
+        self.handler = handler
+        self.workers = max(1, int(workers))
+        self.executor = executor
+        self.batch_id = batch_id  # CLI: drena só o próprio lote
+        self.idle_poll_s = idle_poll_s
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._procs: Optional[ProcessPoolExecutor] = None
+        self._procs_lock = threading.Lock()
+        requeued = queue.requeue_orphans()
+        if requeued:
+            logger.info("jobs reenfileirados após reinício: %d", requeued)
+        self._threads = [
+            threading.Thread(target=self._loop, name=f"quantix-job-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for t in self._threads:
+            t.start()
+
+    def notify(self) -> None:
+        self._wake.set()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        with self._procs_lock:
+            procs, self._procs = self._procs, None
+        if procs is not None:
+            procs.shutdown(wait=False, cancel_futures=True)
+
+    def _process_pool(self) -> ProcessPoolExecutor:
+        with self._procs_lock:
+            if self._procs is None:
+                # spawn: o servidor é multi-thread; fork herdaria locks de outras threads
+                self._procs = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_job_process, initargs=(self.workers,),
+                )
+            return self._procs
+
+    def _execute(self, job: Dict[str, Any], progress: ProgressFn) -> Dict[str, Any]:
+        if self.executor != "process":
+            return self.handler(job, progress) or {}
+        procs = self._process_pool()
+        try:
+            return procs.submit(_run_in_process, self.handler, str(self.queue.db_path), job).result()
+        except BrokenProcessPool:
+            # um filho morreu (OOM/crash nativo): descarta o pool; o próximo job cria outro
+            with self._procs_lock:
+                if self._procs is procs:
+                    self._procs = None
+            procs.shutdown(wait=False)
+            raise
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                job = self.queue.claim(self.batch_id)
+            except Exception as e:
+                logger.warning("claim falhou: %s", e)
+                job = None
+            if job is None:
+                self._wake.wait(self.idle_poll_s)
+                self._wake.clear()
+                continue
+            self._run(job)
+
+    def _run(self, job: Dict[str, Any]) -> None:
+        job_id = job["job_id"]
+
+        def progress(stage: str, frac: float, message: str = "") -> None:
+            try:
+                self.queue.progress(job_id, stage, frac, message)
+            except Exception:
+                pass
+
+        t0 = time.perf_counter()
+        try:
+            result = self._execute(job, progress)
+            result.setdefault("elapsed_s", round(time.perf_counter() - t0, 3))
+            self.queue.finish(job_id, result)
+        except Exception as e:
+            logger.error("job %s falhou: %s\n%s", job_id, e, traceback.format_exc())
+            self.queue.fail(job_id, f"{type(e).__name__}: {e}")
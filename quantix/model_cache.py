@@ -0,0 +1,222 @@
+# quantix/model_cache.py — cache por processo de modelos ifcopenshell já parseados (chave: hash do arquivo)
+#
+# Reprocessar o mesmo IFC (outra disciplina, props novas, retry de um lote) pagava o parse inteiro
+# de novo. Aqui o modelo parseado fica em memória e cada job recebe uma cópia copy-on-write:
+# - executar(chave, loader, texto_bytes, fn) roda fn(modelo) num filho os.fork(): o filho edita e grava
+#   a própria cópia (páginas copiadas sob demanda pelo kernel) e devolve o resultado por um pipe;
+#   o modelo do cache nunca é alterado
+# - alternativas medidas no ifcopenshell 0.8 e descartadas: clonar via to_string/from_string custa o
+#   mesmo que um parse novo; desfazer o job por transação (discard_transaction) custa segundos
+#   (remover ~10k Psets criados sai bem mais caro que parsear de novo)
+# - processo com outras threads vivas (Python ou nativas; ex. o servidor Streamlit com o executor "thread"):
+#   fork aqui herdaria locks presos, então o job vai para um processo auxiliar único (spawn, uma thread só,
+#   QUANTIX_MODEL_CACHE_WORKER=1) que mantém o cache e faz o fork copy-on-write lá. loader e fn precisam
+#   ser picláveis (funções de módulo / functools.partial). Os jobs desse processo passam um por vez pelo
+#   auxiliar; stats() soma os contadores dele (coluna "auxiliar" = jobs encaminhados)
+# - sem fork nenhum (Windows, QUANTIX_MODEL_CACHE_COW=0, QUANTIX_MODEL_CACHE_WORKER=0): o job recebe o
+#   modelo em cache só para si (sai do cache) ou um parse novo e conta em sem_fork
+# - LRU limitado pela memória estimada (texto IFC × QUANTIX_MODEL_CACHE_FACTOR) até QUANTIX_MODEL_CACHE_MB
+# - stats(): hits, misses, hit_rate, evictions, forks, sem_fork, auxiliar, tempo de parse gasto e economizado
+# O cache é do processo: cada worker de processo da fila tem o seu. QUANTIX_MODEL_CACHE_MB=0 desliga.
+
+import os
+import time
+import pickle
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+MODEL_CACHE_MAX_BYTES = int(float(os.environ.get("QUANTIX_MODEL_CACHE_MB", "1024")) * 1024 * 1024)
+# memória do modelo em ifcopenshell por byte de texto STEP (medido: ~10x)
+MODEL_CACHE_FACTOR = float(os.environ.get("QUANTIX_MODEL_CACHE_FACTOR", "10") or 10)
+MODEL_CACHE_COW = os.environ.get("QUANTIX_MODEL_CACHE_COW", "1").strip().lower() not in ("0", "false", "no", "")
+MODEL_CACHE_WORKER = os.environ.get("QUANTIX_MODEL_CACHE_WORKER", "1").strip().lower() not in ("0", "false", "no", "")
+
+_EM_AUXILIAR = False  # True dentro do processo auxiliar (nunca encaminha de novo)
+
+def _threads_nativas() -> int:
+    # threading só enxerga threads Python; /proc também conta as nativas (pools de C/C++, BLAS)
+    try:
+        return len(os.listdir("/proc/self/task"))
+    except OSError:
+        return threading.active_count()
+
+def pode_fork() -> bool:
+    # fork com outras threads vivas pode herdar locks presos (logging, sqlite, malloc)
+    return (
+        MODEL_CACHE_COW and hasattr(os, "fork")
+        and threading.active_count() == 1 and _threads_nativas() == 1
+    )
+
+def _em_fork(fn: Callable[[Any], Any], model: Any) -> Any:
+    """fn(model) num processo filho; retorna o resultado (picklável) ou relança o erro como RuntimeError."""
+    r, w = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            os.close(r)
+            try:
+                out: Tuple[bool, Any] = (True, fn(model))
+            except BaseException as e:
+                out = (False, f"{type(e).__name__}: {e}")
+            with os.fdopen(w, "wb") as fp:
+                pickle.dump(out, fp)
+        except BaseException:
+            code = 1
+        finally:
+            # sem atexit/finalizadores: conexões e pools herdados do pai ficam intocados
+            os._exit(code)
+    os.close(w)
+    with os.fdopen(r, "rb") as fp:
+        data = fp.read()
+    _, status = os.waitpid(pid, 0)
+    if not data:
+        raise RuntimeError(f"processo copy-on-write terminou sem resultado (status {status})")
+    ok, out = pickle.loads(data)
+    if not ok:
+        raise RuntimeError(out)
+    return out
+
+# -----------------------------------------------------------------------------
+# processo auxiliar (lado do filho)
+# -----------------------------------------------------------------------------
+def _init_auxiliar(max_bytes: int, factor: float) -> None:
+    global _EM_AUXILIAR
+    _EM_AUXILIAR = True
+    # sem threads nativas de BLAS/OpenMP: o auxiliar precisa continuar podendo fazer fork
+    for var in ("OPENBLAS_NUM_THREADS", "OMP_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ.setdefault(var, "1")
+    MODEL_CACHE.max_bytes = int(max_bytes)
+    MODEL_CACHE.factor = float(factor)
+
+def _executar_no_auxiliar(key: Hashable, loader: Callable[[], Any], text_bytes: int,
+                          fn: Callable[[Any], Any]) -> Tuple[Any, Dict[str, Any]]:
+    return MODEL_CACHE.executar(key, loader, text_bytes, fn), MODEL_CACHE.stats()
+
+def usa_auxiliar() -> bool:
+    return MODEL_CACHE_WORKER and MODEL_CACHE_COW and hasattr(os, "fork") and not _EM_AUXILIAR
+
+class ModelCache:
+    def __init__(self, max_bytes: int = MODEL_CACHE_MAX_BYTES, factor: float = MODEL_CACHE_FACTOR):
+        self.max_bytes = int(max_bytes)
+        self.factor = float(factor)
+        self._lock = threading.Lock()
+        # chave -> {"model", "bytes", "parse_s"}
+        self._entries: "OrderedDict[Hashable, Dict[str, Any]]" = OrderedDict()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "forks": 0, "sem_fork": 0, "auxiliar": 0}
+        self._parse_s = 0.0
+        self._saved_s = 0.0
+        self._auxiliar: Optional[ProcessPoolExecutor] = None
+        self._stats_auxiliar: Dict[str, Any] = {}  # último stats() devolvido pelo auxiliar
+
+    def executar(self, key: Hashable, loader: Callable[[], Any], text_bytes: int, fn: Callable[[Any], Any]) -> Any:
+        """
+        fn(modelo) sobre o modelo de `key` (carregado com loader() no miss). fn pode editar o modelo
+        à vontade: com fork roda numa cópia copy-on-write; com outras threads vivas vai para o processo
+        auxiliar (que faz o fork); sem fork nenhum o modelo não volta ao cache.
+        """
+        if self.max_bytes <= 0:
+            with self._lock:
+                self._stats["misses"] += 1
+            return fn(self._carregar(loader, text_bytes)["model"])
+        fork = pode_fork()
+        if not fork and usa_auxiliar():
+            return self._executar_auxiliar(key, loader, text_bytes, fn)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._stats["hits"] += 1
+                self._saved_s += entry["parse_s"]
+                if fork:
+                    self._entries.move_to_end(key)
+                else:
+                    del self._entries[key]
+            else:
+                self._stats["misses"] += 1
+        if entry is None:
+            entry = self._carregar(loader, text_bytes)
+            if fork:
+                with self._lock:
+                    self._guardar(key, entry)
+        if not fork:
+            with self._lock:
+                self._stats["sem_fork"] += 1
+            return fn(entry["model"])
+        with self._lock:
+            self._stats["forks"] += 1
+        return _em_fork(fn, entry["model"])
+
+    def _executar_auxiliar(self, key: Hashable, loader: Callable[[], Any], text_bytes: int,
+                           fn: Callable[[Any], Any]) -> Any:
+        with self._lock:
+            if self._auxiliar is None:
+                # spawn: este processo tem outras threads; um worker só -> um cache só
+                self._auxiliar = ProcessPoolExecutor(
+                    max_workers=1, mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_auxiliar, initargs=(self.max_bytes, self.factor),
+                )
+            aux = self._auxiliar
+            self._stats["auxiliar"] += 1
+        try:
+            out, stats = aux.submit(_executar_no_auxiliar, key, loader, text_bytes, fn).result()
+        except BrokenProcessPool:
+            # o auxiliar morreu (OOM/crash nativo): descarta; o próximo job cria outro (cache vazio)
+            with self._lock:
+                if self._auxiliar is aux:
+                    self._auxiliar = None
+                    self._stats_auxiliar = {}
+            aux.shutdown(wait=False)
+            raise
+        with self._lock:
+            self._stats_auxiliar = stats
+        return out
+
+    def _carregar(self, loader: Callable[[], Any], text_bytes: int) -> Dict[str, Any]:
+        t0 = time.perf_counter()
+        model = loader()
+        dt = time.perf_counter() - t0
+        with self._lock:
+            self._parse_s += dt
+        return {"model": model, "bytes": int(text_bytes * self.factor), "parse_s": dt}
+
+    def _guardar(self, key: Hashable, entry: Dict[str, Any]) -> None:
+        # chamado com o lock; modelo maior que o cache inteiro não entra
+        if entry["bytes"] > self.max_bytes:
+            return
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        total = sum(e["bytes"] for e in self._entries.values())
+        while total > self.max_bytes:
+            _, old = self._entries.popitem(last=False)
+            total -= old["bytes"]
+            self._stats["evictions"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            aux, self._auxiliar = self._auxiliar, None
+            self._stats_auxiliar = {}
+        if aux is not None:
+            aux.shutdown(wait=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            aux = self._stats_auxiliar
+            out = {k: v + int(aux.get(k, 0)) for k, v in self._stats.items() if k != "auxiliar"}
+            out["auxiliar"] = self._stats["auxiliar"]
+            consultas = out["hits"] + out["misses"]
+            return dict(
+                out,
+                hit_rate=round(out["hits"] / consultas, 3) if consultas else 0.0,
+                entries=len(self._entries) + int(aux.get("entries", 0)),
+                size_bytes=sum(e["bytes"] for e in self._entries.values()) + int(aux.get("size_bytes", 0)),
+                max_bytes=self.max_bytes,
+                parse_s=round(self._parse_s + float(aux.get("parse_s", 0.0)), 3),
+                parse_s_saved=round(self._saved_s + float(aux.get("parse_s_saved", 0.0)), 3),
+            )
+
+MODEL_CACHE = ModelCache()
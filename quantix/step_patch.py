@@ -0,0 +1,486 @@
+# quantix/step_patch.py — escrita do IFC OTIMIZADO por patch de linhas STEP (sem ifcopenshell.open)
+#
+# Alternativa rápida ao caminho ifcopenshell (open -> edição em memória -> model.write):
+# - lê só as linhas das entidades alteradas (seek pelos offsets do sidecar .qidx)
+# - copia o arquivo em blocos, substituindo apenas os registros #id alterados (Description-tag)
+# - acrescenta no fim do DATA, com #ids novos: Pset_QuantixOptimization + IfcRelDefinesByProperties
+#   (por elemento ou compartilhado por grupo de valores idênticos),
+#   IfcGroup + IfcRelAssignsToGroup e estilos laranja/vermelho (IfcStyledItem)
+# Tempo linear no tamanho do arquivo; memória proporcional só ao nº de elementos alterados.
+# Entrada e saída podem ser .ifc.gz (quantix.artifact_io): seeks nos offsets do texto, sem descomprimir em disco.
+
+import re
+import uuid
+import shutil
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple, BinaryIO
+
+from quantix.entity_index import EntityIndex, build_entity_index
+from quantix.artifact_io import open_artifact, create_artifact, artifact_size, is_compressed
+
+COPY_CHUNK = 4 * 1024 * 1024
+
+_IFC_GUID_CHARS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz_$"
+_SCHEMA_RE = re.compile(rb"FILE_SCHEMA\s*\(\s*\(\s*'([A-Za-z0-9_]+)'")
+_REF_RE = re.compile(rb"#(\d+)")
+
+STYLE_RGB = {
+    "ORANGE": ("Quantix_Optimized_Orange", (1.0, 0.62, 0.0)),
+    "RED": ("Quantix_Optimized_Red", (1.0, 0.15, 0.15)),
+}
+
+def new_ifc_guid() -> str:
+    """GlobalId IFC (22 chars, base64 IFC) a partir de um uuid4 — mesmo formato de ifcopenshell.guid.new()."""
+    n = uuid.uuid4().int
+    chars = []
+    for _ in range(22):
+        chars.append(_IFC_GUID_CHARS[n % 64])
+        n //= 64
+    return "".join(reversed(chars))
+
+def step_str(s: Any) -> str:
+    """Literal STRING do STEP: aspas/barra invertida escapadas e não-ASCII em \\X2\\...\\X0\\."""
+    out = []
+    for ch in str(s):
+        o = ord(ch)
+        if ch == "'":
+            out.append("''")
+        elif ch == "\\":
+            out.append("\\\\")
+        elif 32 <= o < 127:
+            out.append(ch)
+        elif o <= 0xFFFF:
+            out.append(f"\\X2\\{o:04X}\\X0\\")
+        else:
+            out.append(f"\\X4\\{o:08X}\\X0\\")
+    return "'" + "".join(out) + "'"
+
+def _step_real(x: float) -> str:
+    r = repr(float(x))
+    return r if ("." in r or "E" in r.upper()) else r + "."
+
+def _record_end(buf: bytes, start: int = 0) -> int:
+    """Índice do ';' que fecha o registro (ignora ';' dentro de strings). -1 se não achou."""
+    in_str = False
+    i = start
+    n = len(buf)
+    while i < n:
+        c = buf[i]
+        if in_str:
+            if c == 0x27:  # '
+                if i + 1 < n and buf[i + 1] == 0x27:
+                    i += 2
+                    continue
+                in_str = False
+        elif c == 0x27:
+            in_str = True
+        elif c == 0x3B:  # ;
+            return i
+        i += 1
+    return -1
+
+def read_record(fp: BinaryIO, offset: int, max_len: int = 16 * 1024 * 1024) -> bytes:
+    """Registro STEP completo que começa em `offset` (até o ';' final, inclusive)."""
+    fp.seek(offset)
+    buf = b""
+    step = 4096
+    while len(buf) < max_len:
+        more = fp.read(step)
+        if not more:
+            break
+        buf += more
+        end = _record_end(buf)
+        if end >= 0:
+            return buf[: end + 1]
+        step = min(step * 4, 1024 * 1024)
+    raise ValueError(f"registro STEP sem ';' no offset {offset}")
+
+def split_record(rec: bytes) -> Tuple[int, bytes, List[bytes]]:
+    """'#12=IFCWALL(a,b,(c,d));' -> (12, b'IFCWALL', [b'a', b'b', b'(c,d)'])."""
+    eq = rec.index(b"=")
+    eid = int(rec[:eq].strip().lstrip(b"#"))
+    op = rec.index(b"(", eq)
+    cls = rec[eq + 1:op].strip()
+    close = rec.rindex(b")")
+    body = rec[op + 1:close]
+    args: List[bytes] = []
+    depth = 0
+    in_str = False
+    cur = 0
+    i = 0
+    n = len(body)
+    while i < n:
+        c = body[i]
+        if in_str:
+            if c == 0x27:
+                if i + 1 < n and body[i + 1] == 0x27:
+                    i += 2
+                    continue
+                in_str = False
+        elif c == 0x27:
+            in_str = True
+        elif c == 0x28:
+            depth += 1
+        elif c == 0x29:
+            depth -= 1
+        elif c == 0x2C and depth == 0:
+            args.append(body[cur:i].strip())
+            cur = i + 1
+        i += 1
+    if body.strip():
+        args.append(body[cur:].strip())
+    return eid, cls, args
+
+def join_record(eid: int, cls: bytes, args: List[bytes]) -> bytes:
+    return b"#%d=%s(%s);" % (eid, cls, b",".join(args))
+
+def _append_to_string_arg(arg: bytes, suffix: str) -> bytes:
+    """Description (string opcional) += suffix, como `(ent.Description or "") + suffix`."""
+    if arg == b"$" or not arg.startswith(b"'"):
+        return step_str(suffix).encode("ascii")
+    return arg[:-1] + step_str(suffix).encode("ascii")[1:]
+
+def _refs(arg: bytes) -> List[int]:
+    return [int(x) for x in _REF_RE.findall(arg)]
+
+def read_schema(path: Path) -> str:
+    with open_artifact(path) as fp:
+        head = fp.read(64 * 1024)
+    m = _SCHEMA_RE.search(head)
+    return m.group(1).decode("ascii").upper() if m else "IFC4"
+
+def _data_endsec_offset(path: Path) -> int:
+    """Offset do 'ENDSEC;' que fecha o DATA (último ENDSEC do arquivo)."""
+    size = artifact_size(path)
+    with open_artifact(path) as fp:
+        win = 64 * 1024
+        while True:
+            start = max(0, size - win)
+            fp.seek(start)
+            tail = fp.read(size - start)
+            k = tail.rfind(b"ENDSEC")
+            if k >= 0:
+                return start + k
+            if start == 0:
+                raise ValueError("seção DATA sem ENDSEC")
+            win *= 4
+
+def file_contains(path: Path, needle: bytes) -> bool:
+    """Busca em blocos (com sobreposição), memória constante."""
+    keep = len(needle) - 1
+    prev = b""
+    with open_artifact(path) as fp:
+        while True:
+            buf = fp.read(COPY_CHUNK)
+            if not buf:
+                return False
+            if needle in prev + buf:
+                return True
+            prev = buf[-keep:] if keep else b""
+
+class _Writer:
+    """Gera registros novos com #ids sequenciais a partir de max_id + 1."""
+
+    def __init__(self, next_id: int):
+        self.next_id = next_id
+        self.lines: List[bytes] = []
+
+    def add(self, cls: str, *args: str) -> int:
+        eid = self.next_id
+        self.next_id += 1
+        self.lines.append(f"#{eid}={cls}({','.join(args)});\n".encode("ascii"))
+        return eid
+
+def _ref_list(ids: List[int]) -> str:
+    return "(" + ",".join(f"#{i}" for i in ids) + ")"
+
+def _record(fp: BinaryIO, idx: EntityIndex, cache: Dict[int, Tuple[bytes, List[bytes]]],
+            eid: int) -> Optional[Tuple[bytes, List[bytes]]]:
+    """(classe, args) da entidade #eid, lida pelo offset do índice (cache por id)."""
+    if eid not in cache:
+        hit = idx.lookup(eid)
+        if hit is None:
+            return None
+        _e, c, a = split_record(read_record(fp, hit["offset"]))
+        cache[eid] = (c, a)
+    return cache[eid]
+
+def _body_items(fp: BinaryIO, idx: EntityIndex, product_args: List[bytes],
+                cache: Dict[int, Tuple[bytes, List[bytes]]]) -> List[int]:
+    """
+    Itens de representação 'Body' de um IfcProduct (Representation -> Representations -> Items).
+    IFCMAPPEDITEM entra como está (estilo por instância): ver _collapse_mapped_items.
+    """
+    def args_of(ref: bytes, min_len: int) -> Optional[List[bytes]]:
+        ids = _refs(ref)
+        rec = _record(fp, idx, cache, ids[0]) if ids else None
+        return rec[1] if rec and len(rec[1]) >= min_len else None
+
+    if len(product_args) < 7:
+        return []
+    pds = args_of(product_args[6], 3)
+    if not pds:
+        return []
+    body: List[int] = []
+    other: List[int] = []
+    for rid in _refs(pds[2]):
+        rec = _record(fp, idx, cache, rid)
+        if not rec or len(rec[1]) < 4:
+            continue
+        sr = rec[1]
+        bucket = body if sr[1] == b"'Body'" else other
+        bucket.extend(_refs(sr[3]))
+    return body or other
+
+def _collapse_mapped_items(fp: BinaryIO, idx: EntityIndex, item_tag: Dict[int, str],
+                           cache: Dict[int, Tuple[bytes, List[bytes]]]) -> int:
+    """
+    IFCMAPPEDITEM -> itens do RepresentationMap (geometria do tipo, compartilhada) só quando
+    todas as instâncias daquele mapa estão em item_tag com a mesma tag (mesma regra de
+    engine._colapsar_mapeados). Altera item_tag; retorna quantos IFCMAPPEDITEM ficaram por instância.
+    """
+    por_origem: Dict[int, List[int]] = {}
+    for item in item_tag:
+        rec = _record(fp, idx, cache, item)
+        src = _refs(rec[1][0]) if rec and rec[0] == b"IFCMAPPEDITEM" and rec[1] else []
+        if src:
+            por_origem.setdefault(src[0], []).append(item)
+    if not por_origem:
+        return 0
+
+    # todas as instâncias de cada mapa: uma passada pelos IFCMAPPEDITEM, em ordem de offset
+    todas: Dict[int, set] = {}
+    fatia = idx.class_slice("IFCMAPPEDITEM")
+    for off, eid in sorted(zip(fatia["offsets"].tolist(), fatia["ids"].tolist())):
+        _e, _c, a = split_record(read_record(fp, off))
+        src = _refs(a[0]) if a else []
+        if src and src[0] in por_origem:
+            todas.setdefault(src[0], set()).add(eid)
+
+    por_instancia = 0
+    for src, mapeados in por_origem.items():
+        tags = {item_tag[i] for i in mapeados}
+        rmap = _record(fp, idx, cache, src)
+        mrep_ref = _refs(rmap[1][1]) if rmap and len(rmap[1]) >= 2 else []
+        mrep = _record(fp, idx, cache, mrep_ref[0]) if mrep_ref else None
+        origem = _refs(mrep[1][3]) if mrep and len(mrep[1]) >= 4 else []
+        if len(tags) != 1 or todas.get(src) != set(mapeados) or not origem:
+            por_instancia += len(mapeados)
+            continue
+        tag = tags.pop()
+        for i in mapeados:
+            del item_tag[i]
+        for i in origem:
+            if item_tag.get(i) != "RED":
+                item_tag[i] = tag
+    return por_instancia
+
+def _add_pset(w: _Writer, owner_ref: str, values: Dict[str, str], eids: List[int]) -> int:
+    prop_ids = [
+        w.add("IFCPROPERTYSINGLEVALUE", step_str(k), "$", f"IFCLABEL({step_str(v)})", "$")
+        for k, v in values.items()
+    ]
+    pset = w.add("IFCPROPERTYSET", step_str(new_ifc_guid()), owner_ref,
+                 step_str("Pset_QuantixOptimization"), "$", _ref_list(prop_ids))
+    w.add("IFCRELDEFINESBYPROPERTIES", step_str(new_ifc_guid()), owner_ref, "$", "$",
+          _ref_list(eids), f"#{pset}")
+    return pset
+
+def _add_owner_history(w: _Writer, engine_version: str) -> int:
+    """IfcOwnerHistory mínimo (IFC2X3): pessoa/organização/aplicação Quantix, ChangeAction ADDED."""
+    person = w.add("IFCPERSON", "$", step_str("Quantix"), "$", "$", "$", "$", "$", "$")
+    org = w.add("IFCORGANIZATION", "$", step_str("Quantix"), "$", "$", "$")
+    user = w.add("IFCPERSONANDORGANIZATION", f"#{person}", f"#{org}", "$")
+    app = w.add("IFCAPPLICATION", f"#{org}", step_str(engine_version), step_str("Quantix Engine"), step_str("Quantix"))
+    return w.add("IFCOWNERHISTORY", f"#{user}", f"#{app}", "$", ".ADDED.", "$", "$", "$",
+                 str(int(datetime.now().timestamp())))
+
+def apply_optimizations_step(
+    ifc_in_path: Path,
+    ifc_out_path: Path,
+    disciplina: str,
+    change_log: List[Dict[str, Any]],
+    empreendimento: str,
+    props: dict,
+    tenant_id: str,
+    project_id: str,
+    engine_version: str,
+    timestamp: Optional[str] = None,
+    shared_psets: bool = False,
+) -> Tuple[bool, str]:
+    """
+    Mesmo contrato de apply_optimizations_ifc: (ok, mensagem).
+    shared_psets: um Pset por combinação de valores (sem IFC_ID), ligado a todos os elementos
+    da combinação por uma única IfcRelDefinesByProperties.
+    """
+    ifc_in_path = Path(ifc_in_path)
+    ifc_out_path = Path(ifc_out_path)
+    timestamp = timestamp or datetime.now().isoformat(timespec="seconds")
+
+    idx = EntityIndex.for_ifc(ifc_in_path) or EntityIndex(build_entity_index(ifc_in_path))
+    if idx.n == 0:
+        return False, "IFC sem entidades reconhecíveis (patch STEP)."
+    schema = read_schema(ifc_in_path)
+    is_2x3 = schema.startswith("IFC2X")
+    max_id = idx.max_id()
+    owner = idx.class_ids("IFCOWNERHISTORY", 1)
+    owner_ref = owner[0] if owner else "$"
+
+    compact = "; ".join([f"{k}={v}" for k, v in props.items() if str(v).strip()][:12])[:250]
+    stamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+    patches: Dict[int, Tuple[int, bytes]] = {}  # offset -> (tamanho original, registro novo)
+    w = _Writer(max_id + 1)
+    if owner_ref == "$" and is_2x3:
+        # IFC2X3: OwnerHistory é obrigatório em Pset/Rel/Group -> cadeia mínima própria
+        owner_ref = f"#{_add_owner_history(w, engine_version)}"
+    optimized: List[int] = []
+    seen: set = set()
+    item_tag: Dict[int, str] = {}  # item de representação -> ORANGE/RED (RED prevalece)
+    n_el_styled = n_el_skipped = 0
+    rec_cache: Dict[int, Tuple[bytes, List[bytes]]] = {}
+    shared_groups: Dict[Tuple[Tuple[str, str], ...], List[int]] = {}
+
+    with open_artifact(ifc_in_path) as fp:
+        # carimbo no projeto
+        for pid in idx.class_ids("IFCPROJECT", 1):
+            hit = idx.lookup(int(pid[1:]))
+            rec = read_record(fp, hit["offset"])
+            eid, cls, args = split_record(rec)
+            if len(args) > 3:
+                args[3] = _append_to_string_arg(args[3], f" | QUANTIX OTIMIZADO {stamp} | {tenant_id}/{project_id}")
+                patches[hit["offset"]] = (len(rec), join_record(eid, cls, args))
+
+        for ch in change_log:
+            try:
+                eid_num = int(str(ch["ifc_id"]).replace("#", ""))
+            except Exception:
+                continue
+            if eid_num in seen:
+                continue
+            hit = idx.lookup(eid_num)
+            if hit is None:
+                continue
+            seen.add(eid_num)
+
+            rec = read_record(fp, hit["offset"])
+            eid, cls, args = split_record(rec)
+            if len(args) < 4:
+                continue
+            optimized.append(eid_num)
+
+            tag_visual = str(ch.get("tag_visual", "ORANGE")).upper()
+            if tag_visual not in ("ORANGE", "RED"):
+                tag_visual = "ORANGE"
+
+            # Description-tag (busca textual)
+            args[3] = _append_to_string_arg(args[3], f" | QUANTIX:{ch['ifc_id']}:{project_id}:{tag_visual}")
+            patches[hit["offset"]] = (len(rec), join_record(eid, cls, args))
+
+            # PSET (mesmas 14 propriedades do caminho ifcopenshell)
+            values = {
+                "TenantId": tenant_id,
+                "ProjectId": project_id,
+                "QuantixProject": empreendimento,
+                "Disciplina": disciplina,
+                "IFC_ID": str(ch.get("ifc_id", "")),
+                "Produto": str(ch.get("produto", "")),
+                "Acao": str(ch.get("acao", "")),
+                "Motivo": str(ch.get("motivo", "")),
+                "Referencia": str(ch.get("referencia", "")),
+                "ContextoCliente": compact,
+                "EngineVersion": engine_version,
+                "QuantixOptimized": "TRUE",
+                "QuantixVisualTag": tag_visual,
+                "Timestamp": timestamp,
+            }
+            if shared_psets:
+                values.pop("IFC_ID")
+                shared_groups.setdefault(tuple(values.items()), []).append(eid_num)
+            else:
+                _add_pset(w, owner_ref, values, [eid_num])
+
+            # STYLE MAP: agrupa por item de representação distinto
+            try:
+                items = _body_items(fp, idx, args, rec_cache)
+            except Exception:
+                items = []
+            if not items:
+                n_el_skipped += 1
+            else:
+                n_el_styled += 1
+            for item in items:
+                if item_tag.get(item) != "RED":
+                    item_tag[item] = tag_visual
+        try:
+            por_instancia = _collapse_mapped_items(fp, idx, item_tag, rec_cache)
+        except Exception:
+            # sem colapsar: cada IFCMAPPEDITEM mantém o próprio estilo
+            por_instancia = sum(1 for i in item_tag if rec_cache.get(i, (b"",))[0] == b"IFCMAPPEDITEM")
+
+    if not optimized and not patches:
+        return False, "Nenhum elemento do change log encontrado no IFC (patch STEP)."
+
+    for key, eids in shared_groups.items():
+        _add_pset(w, owner_ref, dict(key), eids)
+
+    # 1) Grupo com todos otimizados
+    if optimized:
+        group = w.add("IFCGROUP", step_str(new_ifc_guid()), owner_ref, step_str("Quantix_Optimized_Elements"),
+                      step_str(f"Elementos otimizados automaticamente pelo Quantix Engine | {tenant_id}/{project_id}"), "$")
+        w.add("IFCRELASSIGNSTOGROUP", step_str(new_ifc_guid()), owner_ref, "$", "$",
+              _ref_list(optimized), "$", f"#{group}")
+
+    # 2) Estilos laranja/vermelho
+    n_styled = 0
+    for tag in ("ORANGE", "RED"):
+        items = [i for i, t in item_tag.items() if t == tag]
+        if not items:
+            continue
+        name, (r, g, b) = STYLE_RGB[tag]
+        colour = w.add("IFCCOLOURRGB", "$", _step_real(r), _step_real(g), _step_real(b))
+        shading = w.add("IFCSURFACESTYLESHADING", f"#{colour}") if is_2x3 else \
+            w.add("IFCSURFACESTYLESHADING", f"#{colour}", "$")
+        style = w.add("IFCSURFACESTYLE", step_str(name), ".BOTH.", f"(#{shading})")
+        style_ref = f"(#{w.add('IFCPRESENTATIONSTYLEASSIGNMENT', f'(#{style})')})" if is_2x3 else f"(#{style})"
+        for item in items:
+            w.add("IFCSTYLEDITEM", f"#{item}", style_ref, "$")
+            n_styled += 1
+
+    endsec = _data_endsec_offset(ifc_in_path)
+    tmp = ifc_out_path.with_name(f"{ifc_out_path.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        with open_artifact(ifc_in_path) as src, create_artifact(tmp, is_compressed(ifc_out_path)) as out:
+            pos = 0
+            for off in sorted(patches):
+                old_len, new_rec = patches[off]
+                _copy_range(src, out, pos, off)
+                out.write(new_rec)
+                pos = off + old_len
+            _copy_range(src, out, pos, endsec)
+            for line in w.lines:
+                out.write(line)
+            src.seek(endsec)
+            shutil.copyfileobj(src, out, COPY_CHUNK)
+        tmp.replace(ifc_out_path)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+    visual = (
+        f" + Mapa visual: {n_el_styled} elementos estilizados em {n_styled} itens, {n_el_skipped} sem geometria, "
+        f"{por_instancia} instâncias de tipo (IfcMappedItem) estilizadas à parte"
+        if n_styled else " (sem geometria Body para o mapa visual)"
+    )
+    pset_info = f"Pset compartilhado ({len(shared_groups)}x)" if shared_groups else "Pset"
+    return True, f"IFC OTIMIZADO gerado (patch STEP): {pset_info} + Grupo (Quantix_Optimized_Elements){visual}."
+
+def _copy_range(src: BinaryIO, out: BinaryIO, start: int, end: int) -> None:
+    src.seek(start)
+    remaining = end - start
+    while remaining > 0:
+        buf = src.read(min(COPY_CHUNK, remaining))
+        if not buf:
+            break
+        out.write(buf)
+        remaining -= len(buf)
@@ -0,0 +1,165 @@
+# quantix/step_scan.py — varredura de entidades STEP (IFC) em passada única
+#
+# - scan_ifc_entities: texto já decodificado (caminho de referência)
+# - scan_ifc_bytes / scan_ifc_file: bytes em blocos terminados em ';' (memória constante)
+# - arquivos >= SCAN_PARALLEL_MIN_BYTES: faixas alinhadas em ';\n' varridas em process pool; cada worker
+#   abre o próprio arquivo (spool/ORIGINAL) e lê só a sua faixa (seek), nada de bytes copiados/pickled
+
+import io
+import os
+import re
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Any, List, Tuple, Iterator, Iterable, Optional, BinaryIO
+
+from quantix.artifact_io import open_artifact, artifact_size
+
+_STEP_ENTITY_RE = re.compile(r"(#\d+)\s*=\s*([A-Z0-9_]+)\s*\(")
+_STEP_ENTITY_RE_B = re.compile(rb"(#\d+)\s*=\s*([A-Z0-9_]+)\s*\(")
+_STEP_LINE_END_RE_B = re.compile(rb";\r?\n")
+
+STEP_SCAN_CHUNK = 4 * 1024 * 1024
+
+# Configuração do scan paralelo (env): nº de processos e tamanho mínimo do arquivo
+SCAN_WORKERS = int(os.environ.get("QUANTIX_SCAN_WORKERS", "0") or 0) or min(8, os.cpu_count() or 1)
+SCAN_PARALLEL_MIN_BYTES = int(float(os.environ.get("QUANTIX_SCAN_PARALLEL_MIN_MB", "100")) * 1024 * 1024)
+
+# (ids por classe, text_len) de uma faixa do arquivo
+PartialScan = Tuple[Dict[str, List[str]], int]
+
+def scan_ifc_entities(ifc_text: str) -> Dict[str, Any]:
+    """
+    Varredura única do STEP: histograma por classe + lista de #ids por classe.
+    Substitui o findall por classe (processar_mapa) e o finditer de parse_ifc_entity_ids.
+    """
+    ids: Dict[str, List[str]] = {}
+    for eid, cls in _STEP_ENTITY_RE.findall(ifc_text):
+        lst = ids.get(cls)
+        if lst is None:
+            lst = ids[cls] = []
+        lst.append(eid)
+    return {
+        "counts": {cls: len(v) for cls, v in ids.items()},
+        "ids": ids,
+        "text_len": len(ifc_text),
+    }
+
+def iter_step_chunks(fp: BinaryIO, chunk_size: int = STEP_SCAN_CHUNK, limit: Optional[int] = None) -> Iterator[bytes]:
+    """
+    Leitor em blocos de um STEP binário. Cada bloco termina logo após um ';'
+    (o padrão '#id=CLASSE(' nunca contém ';', então nenhuma entidade é cortada).
+    Memória constante ~ chunk_size, independente do tamanho do arquivo.
+    `limit` restringe a leitura aos próximos N bytes (faixas do scan paralelo).
+    """
+    remaining = limit
+    tail = b""
+    while True:
+        n = chunk_size if remaining is None else min(chunk_size, remaining)
+        buf = fp.read(n) if n > 0 else b""
+        if not buf:
+            break
+        if remaining is not None:
+            remaining -= len(buf)
+        if tail:
+            buf = tail + buf
+        cut = buf.rfind(b";") + 1
+        if cut <= 0:
+            tail = buf
+            continue
+        tail = buf[cut:]
+        yield buf[:cut]
+    if tail:
+        yield tail
+
+def _scan_blocks(blocks: Iterable[bytes]) -> PartialScan:
+    raw: Dict[bytes, List[bytes]] = {}
+    text_len = 0
+    for chunk in blocks:
+        for eid, cls in _STEP_ENTITY_RE_B.findall(chunk):
+            lst = raw.get(cls)
+            if lst is None:
+                lst = raw[cls] = []
+            lst.append(eid)
+        # text_len = len(decode_ifc_text(...)); blocos ASCII dispensam decodificação
+        text_len += len(chunk) if chunk.isascii() else len(chunk.decode("utf-8", errors="replace"))
+    return {cls.decode("ascii"): [e.decode("ascii") for e in lst] for cls, lst in raw.items()}, text_len
+
+def _finish_scan(parts: Iterable[PartialScan]) -> Dict[str, Any]:
+    # junta as faixas na ordem do arquivo (mesma ordem de #ids do scan sequencial)
+    ids: Dict[str, List[str]] = {}
+    text_len = 0
+    for part, n in parts:
+        text_len += n
+        for cls, lst in part.items():
+            cur = ids.get(cls)
+            if cur is None:
+                ids[cls] = lst
+            else:
+                cur.extend(lst)
+    return {
+        "counts": {cls: len(v) for cls, v in ids.items()},
+        "ids": ids,
+        "text_len": text_len,
+    }
+
+def scan_ifc_stream(fp: BinaryIO, chunk_size: int = STEP_SCAN_CHUNK) -> Dict[str, Any]:
+    """Mesmo resultado de scan_ifc_entities(decode_ifc_text(...)), mas sobre bytes, sem montar o texto inteiro."""
+    return _finish_scan([_scan_blocks(iter_step_chunks(fp, chunk_size))])
+
+# -----------------------------------------------------------------------------
+# Scan paralelo (process pool)
+# -----------------------------------------------------------------------------
+def _split_offsets(find_line_end, size: int, n: int) -> List[Tuple[int, int]]:
+    bounds = [0]
+    for k in range(1, n):
+        b = find_line_end(size * k // n)
+        if b is not None and bounds[-1] < b < size:
+            bounds.append(b)
+    bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+def split_step_file(path: Path, n: int) -> List[Tuple[int, int]]:
+    """Divide o arquivo em até n faixas [ini, fim) que terminam em ';\\n'."""
+    size = artifact_size(path)
+    with open_artifact(path) as fp:
+        def find_line_end(target: int) -> Optional[int]:
+            fp.seek(target)
+            m = _STEP_LINE_END_RE_B.search(fp.read(1024 * 1024))
+            return target + m.end() if m else None
+        return _split_offsets(find_line_end, size, n)
+
+def _scan_file_range(path: str, start: int, end: int) -> PartialScan:
+    with open_artifact(path) as fp:
+        fp.seek(start)
+        return _scan_blocks(iter_step_chunks(fp, limit=end - start))
+
+def _pool(workers: int) -> ProcessPoolExecutor:
+    # spawn: o servidor Streamlit é multi-thread; fork herdaria locks de outras threads
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+def _resolve_workers(size: int, workers: Optional[int], min_parallel_bytes: Optional[int]) -> int:
+    workers = SCAN_WORKERS if workers is None else int(workers)
+    threshold = SCAN_PARALLEL_MIN_BYTES if min_parallel_bytes is None else int(min_parallel_bytes)
+    return workers if (workers > 1 and size >= threshold) else 1
+
+def scan_ifc_file(
+    path: Path,
+    workers: Optional[int] = None,
+    min_parallel_bytes: Optional[int] = None,
+) -> Dict[str, Any]:
+    n = _resolve_workers(artifact_size(path), workers, min_parallel_bytes)
+    if n <= 1:
+        with open_artifact(path) as fp:
+            return scan_ifc_stream(fp)
+    ranges = split_step_file(path, n)
+    with _pool(min(n, len(ranges))) as ex:
+        parts = ex.map(_scan_file_range, [str(path)] * len(ranges), [a for a, _ in ranges], [b for _, b in ranges])
+        return _finish_scan(parts)
+
+def scan_ifc_bytes(file_bytes: bytes) -> Dict[str, Any]:
+    """
+    Bytes já em memória: sempre sequencial. Fatiar os bytes para o pool copiaria o arquivo inteiro
+    (e o pickle de cada faixa para os workers); o scan paralelo é só por caminho (scan_ifc_file).
+    """
+    return scan_ifc_stream(io.BytesIO(file_bytes))
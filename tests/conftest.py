@@ -0,0 +1,69 @@
+# tests/conftest.py — fixtures compartilhadas (pytest)
+#
+# quantix.engine cria quantix_data/ no import: QUANTIX_DATA_DIR aponta para um diretório temporário
+# antes de qualquer import do pacote (os processos spawn dos testes herdam o mesmo ambiente).
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+os.environ.setdefault("QUANTIX_DATA_DIR", tempfile.mkdtemp(prefix="quantix_tests_"))
+
+@pytest.fixture(scope="session")
+def engine():
+    return pytest.importorskip("quantix.engine")
+
+@pytest.fixture(scope="session")
+def ifcopenshell():
+    return pytest.importorskip("ifcopenshell")
+
+@pytest.fixture
+def ifc_paredes(tmp_path, ifcopenshell):
+    """IFC4 pequeno (ifcopenshell.api): projeto + 3 IfcWall com geometria. Retorna (caminho, [#ids])."""
+    import ifcopenshell.api
+
+    run = ifcopenshell.api.run
+    model = run("project.create_file", version="IFC4")
+    run("root.create_entity", model, ifc_class="IfcProject", name="Teste")
+    run("unit.assign_unit", model)
+    ctx = run("context.add_context", model, context_type="Model")
+    body = run("context.add_context", model, context_type="Model", context_identifier="Body",
+               target_view="MODEL_VIEW", parent=ctx)
+    ids = []
+    for i in range(3):
+        rep = run("geometry.add_wall_representation", model, context=body, length=2.0 + i, height=3.0, thickness=0.2)
+        el = run("root.create_entity", model, ifc_class="IfcWall", name=f"Parede {i}")
+        run("geometry.assign_representation", model, product=el, representation=rep)
+        ids.append(f"#{el.id()}")
+    path = tmp_path / "paredes.ifc"
+    model.write(str(path))
+    return path, ids
+
+IFC_TEXTO = b"""ISO-10303-21;
+HEADER;
+FILE_DESCRIPTION(('ViewDefinition [CoordinationView]'),'2;1');
+FILE_NAME('t.ifc','2026-01-01T00:00:00',(''),(''),'','','');
+FILE_SCHEMA(('IFC4'));
+ENDSEC;
+DATA;
+#1=IFCPROJECT('0YvctVUKr0kugbFTf53O9L',$,'P',$,$,$,$,$,$);
+#2=IFCWALL('2O2Fr$t4X7Zf8NOew3FL01',$,'Parede; com ponto e v\xc3\xadrgula',$,$,$,$,$,$);
+#3=IFCPIPESEGMENT('2O2Fr$t4X7Zf8NOew3FL02',$,'Tubo',$,$,$,$,$,$);
+#10=IFCWALL('2O2Fr$t4X7Zf8NOew3FL03',$,'Parede 2',$,$,$,$,$,$);
+#7=IFCCARTESIANPOINT((0.,0.,0.));
+ENDSEC;
+END-ISO-10303-21;
+"""
+
+@pytest.fixture
+def ifc_texto(tmp_path):
+    """IFC em texto puro, sem ifcopenshell: 3 classes com GUID + 1 sem."""
+    path = tmp_path / "ORIGINAL_t.ifc"
+    path.write_bytes(IFC_TEXTO)
+    return path
@@ -0,0 +1,36 @@
+from quantix.analysis_cache import AnalysisCache, pack_ids_map, unpack_ids_map
+
+def test_pack_unpack_ida_e_volta():
+    ids_map = {
+        "IFCWALL": ["#12", "#15", "#9", "#2000000000"],  # fora de ordem: deltas negativos
+        "IFCPIPESEGMENT": [],
+        "IFCSLAB": ["#1"],
+    }
+    counts_json, blob = pack_ids_map(ids_map)
+    assert unpack_ids_map(counts_json, blob) == ids_map
+
+def test_pack_vazio():
+    assert unpack_ids_map(*pack_ids_map({})) == {}
+
+def test_cache_hit_miss_e_eviction(tmp_path):
+    cache = AnalysisCache(tmp_path / "ac.db", max_bytes=10_000)
+    assert cache.get("h1", "Hidraulica", "v1") is None
+    cache.put("h1", "Hidraulica", "v1", {"IFCPIPESEGMENT": {"antes": 3}}, {"IFCPIPESEGMENT": ["#1", "#5"]})
+    assert cache.get("h1", "Hidraulica", "v1") == ({"IFCPIPESEGMENT": {"antes": 3}}, {"IFCPIPESEGMENT": ["#1", "#5"]})
+    assert cache.get("h1", "Hidraulica", "v2") is None  # outra versão do engine
+    s = cache.stats()
+    assert (s["hits"], s["misses"], s["entries"]) == (1, 2, 1)
+
+    grande = {"x": "y" * 6_000}
+    cache.put("h2", "Eletrica", "v1", grande, {})
+    cache.put("h3", "Eletrica", "v1", grande, {})  # estoura o limite: sai o menos recente
+    assert cache.get("h2", "Eletrica", "v1") is None
+    assert cache.stats()["evictions"] >= 1
+
+def test_contadores_em_lote_sobrevivem_ao_flush(tmp_path):
+    cache = AnalysisCache(tmp_path / "ac.db")
+    cache.put("h", "Eletrica", "v1", {}, {})
+    for _ in range(3):
+        cache.get("h", "Eletrica", "v1")
+    cache.flush()
+    assert AnalysisCache(tmp_path / "ac.db").stats()["hits"] == 3
@@ -0,0 +1,63 @@
+import gzip
+import io
+import random
+
+import pytest
+
+from quantix import artifact_io
+from quantix.artifact_io import (
+    GZ_BLOCK, artifact_size, compress_file, create_artifact, decompress_file, open_artifact,
+)
+
+@pytest.fixture
+def texto():
+    rnd = random.Random(7)
+    linhas = [f"#{i}=IFCWALL('{rnd.getrandbits(64):022x}',$,'Parede {i}',$);\n" for i in range(1, 40000)]
+    data = "".join(linhas).encode("ascii")
+    assert len(data) > 3 * GZ_BLOCK  # vários membros gzip
+    return data
+
+def test_gz_em_blocos_ida_e_volta(tmp_path, texto):
+    gz = tmp_path / "a.ifc.gz"
+    with create_artifact(gz) as out:
+        for i in range(0, len(texto), 100_000):  # escritas que cruzam as bordas dos blocos
+            out.write(texto[i:i + 100_000])
+    assert gzip.decompress(gz.read_bytes()) == texto  # .gz válido para qualquer gunzip
+    assert artifact_size(gz) == len(texto)
+    with open_artifact(gz) as fp:
+        assert fp.read() == texto
+
+def test_gz_em_blocos_seek(tmp_path, texto):
+    gz = tmp_path / "a.ifc.gz"
+    with create_artifact(gz) as out:
+        out.write(texto)
+    offsets = [0, 1, GZ_BLOCK - 3, GZ_BLOCK, 2 * GZ_BLOCK + 17, len(texto) - 5, len(texto) - 1]
+    with open_artifact(gz) as fp:
+        for off in reversed(offsets):
+            fp.seek(off)
+            assert fp.read(40) == texto[off:off + 40]
+        assert fp.seek(0, io.SEEK_END) == len(texto)
+        assert fp.read(10) == b""
+
+def test_gzip_comum_sem_indice(tmp_path, texto):
+    gz = tmp_path / "externo.ifc.gz"
+    gz.write_bytes(gzip.compress(texto))
+    assert artifact_io._block_index(gz) is None
+    assert artifact_size(gz) == len(texto)
+    with open_artifact(gz) as fp:
+        fp.seek(GZ_BLOCK + 5)
+        assert fp.read(30) == texto[GZ_BLOCK + 5:GZ_BLOCK + 35]
+
+def test_compress_decompress_file(tmp_path, texto):
+    src = tmp_path / "a.ifc"
+    src.write_bytes(texto)
+    compress_file(src, tmp_path / "a.ifc.gz")
+    assert decompress_file(tmp_path / "a.ifc.gz", tmp_path / "b.ifc").read_bytes() == texto
+
+def test_arquivo_vazio(tmp_path):
+    gz = tmp_path / "vazio.ifc.gz"
+    with create_artifact(gz):
+        pass
+    assert artifact_size(gz) == 0
+    with open_artifact(gz) as fp:
+        assert fp.read() == b""
@@ -0,0 +1,54 @@
+import pytest
+
+from quantix.entity_index import EntityIndex, build_entity_index, entity_index_path
+
+def test_build_e_lookup(ifc_texto):
+    texto = ifc_texto.read_bytes()
+    build_entity_index(ifc_texto, file_hash="abc")
+    idx = EntityIndex.for_ifc(ifc_texto, "abc")
+    assert idx is not None
+    assert idx.counts == {"IFCPROJECT": 1, "IFCWALL": 2, "IFCPIPESEGMENT": 1, "IFCCARTESIANPOINT": 1}
+    assert idx.class_ids("IFCWALL") == ["#2", "#10"]
+    assert idx.max_id() == 10
+    for eid in (1, 2, 3, 7, 10):
+        hit = idx.lookup(eid)
+        assert texto[hit["offset"]:].startswith(f"#{eid}=".encode())
+    assert idx.lookup(4) is None
+    assert idx.lookup(10)["guid"] == "2O2Fr$t4X7Zf8NOew3FL03"
+    assert idx.lookup(7)["guid"] == ""
+    assert idx.read_entity(ifc_texto, 3) == "#3=IFCPIPESEGMENT('2O2Fr$t4X7Zf8NOew3FL02',$,'Tubo',$,$,$,$,$,$);"
+
+def test_to_scan_compativel(ifc_texto):
+    build_entity_index(ifc_texto)
+    scan = EntityIndex.for_ifc(ifc_texto).to_scan()
+    assert scan["ids"]["IFCWALL"] == ["#2", "#10"]
+    assert scan["counts"]["IFCPIPESEGMENT"] == 1
+
+def test_sem_sidecar(ifc_texto):
+    assert EntityIndex.for_ifc(ifc_texto) is None
+
+@pytest.mark.parametrize("estrago", ["lixo", "truncado", "header", "vazio"])
+def test_sidecar_corrompido_vira_none(ifc_texto, estrago):
+    p = build_entity_index(ifc_texto)
+    data = p.read_bytes()
+    p.write_bytes({
+        "lixo": b"nao e um qidx" * 10,
+        "truncado": data[:-16],
+        "header": data[:12] + b"\xff" * 40 + data[52:],
+        "vazio": b"",
+    }[estrago])
+    assert EntityIndex.for_ifc(ifc_texto) is None
+
+def test_sidecar_desatualizado(ifc_texto):
+    build_entity_index(ifc_texto, file_hash="h1")
+    assert EntityIndex.for_ifc(ifc_texto, "h2") is None  # hash diferente
+    assert EntityIndex.for_ifc(ifc_texto, "h1") is not None
+    assert EntityIndex.for_ifc(ifc_texto) is not None  # chamador sem hash: só o tamanho
+    ifc_texto.write_bytes(ifc_texto.read_bytes() + b"\n")
+    assert EntityIndex.for_ifc(ifc_texto, "h1") is None  # tamanho diferente
+
+def test_engine_reconstroi_sidecar_corrompido(engine, ifc_texto):
+    entity_index_path(ifc_texto).write_bytes(b"QXIDX1\n\x00")
+    idx = engine.abrir_indice_entidades(ifc_texto, "h")
+    assert idx is not None and idx.class_ids("IFCWALL") == ["#2", "#10"]
+    assert EntityIndex.for_ifc(ifc_texto, "h") is not None
@@ -0,0 +1,80 @@
+import os
+import socket
+import subprocess
+import sys
+
+import pytest
+
+from quantix.jobs import JobQueue, batch_summary
+
+@pytest.fixture
+def fila(tmp_path):
+    return JobQueue(tmp_path / "jobs.db")
+
+def _pid_morto() -> int:
+    p = subprocess.Popen([sys.executable, "-c", "pass"])
+    p.wait()
+    return p.pid
+
+def _worker(fila, job_id, wid):
+    with fila.pool.write("teste") as con:
+        con.execute("UPDATE jobs SET worker_id=? WHERE job_id=?", (wid, job_id))
+
+def test_claim_fifo_e_atomico(fila):
+    for j in ("a", "b", "c"):
+        fila.enqueue(j, "t", "u", "k", {"n": j})
+    claimed = [fila.claim() for _ in range(4)]
+    assert [j["job_id"] for j in claimed[:3]] == ["a", "b", "c"]
+    assert claimed[3] is None
+    assert claimed[0]["payload"] == {"n": "a"}
+    assert {j["status"] for j in fila.list_for_tenant("t")} == {"running"}
+
+def test_claim_por_lote(fila):
+    fila.enqueue("solto", "t", "u", "k", {})
+    fila.enqueue("l1", "t", "u", "k", {}, batch_id="L")
+    assert fila.claim("L")["job_id"] == "l1"
+    assert fila.claim("L") is None
+    assert fila.claim()["job_id"] == "solto"
+
+def test_servidor_nao_pega_lote_da_cli(fila):
+    fila.enqueue("cli", "t", "u", "k", {}, batch_id="L", owned=True)
+    assert fila.claim() is None
+    assert fila.claim("L")["job_id"] == "cli"
+
+def test_requeue_orphans(fila):
+    host = socket.gethostname()
+    for j in ("morto", "vivo", "outro_host"):
+        fila.enqueue(j, "t", "u", "k", {})
+        fila.claim()
+    _worker(fila, "morto", f"{host}:{_pid_morto()}")
+    _worker(fila, "vivo", f"{host}:{os.getppid()}")
+    _worker(fila, "outro_host", f"outro-host:{_pid_morto()}")
+    assert fila.requeue_orphans() == 1
+    status = {j["job_id"]: j["status"] for j in fila.list_for_tenant("t")}
+    assert status == {"morto": "queued", "vivo": "running", "outro_host": "running"}
+    assert fila.claim()["job_id"] == "morto"
+    with fila.pool.read("teste") as con:
+        assert con.execute("SELECT attempts FROM jobs WHERE job_id='morto'").fetchone()[0] == 2
+
+def test_requeue_libera_lote_de_cli_morta(fila):
+    host = socket.gethostname()
+    fila.enqueue("cli", "t", "u", "k", {}, batch_id="L", owned=True)
+    with fila.pool.write("teste") as con:
+        con.execute("UPDATE jobs SET owner_id=?", (f"{host}:{_pid_morto()}",))
+    assert fila.claim() is None
+    assert fila.requeue_orphans() == 1
+    assert fila.claim()["job_id"] == "cli"
+
+def test_finish_fail_e_resumo_do_lote(fila):
+    fila.enqueue("ok", "t", "u", "k", {}, batch_id="L")
+    fila.enqueue("erro", "t", "u", "k", {}, batch_id="L")
+    fila.claim("L")
+    fila.finish("ok", {"message": "feito", "elapsed_s": 1.5})
+    fila.claim("L")
+    fila.fail("erro", "ValueError: x")
+    jobs = fila.list_batch("L", "t")
+    assert [j["status"] for j in jobs] == ["done", "error"]
+    assert jobs[0]["result"]["message"] == "feito"
+    r = batch_summary(jobs)
+    assert (r["n"], r["concluidos"], r["erros"], r["ativos"], r["soma_s"]) == (2, 1, 1, 0, 1.5)
+    assert fila.list_batch("L", "outro-tenant") == []
@@ -0,0 +1,60 @@
+import threading
+
+import pytest
+
+from quantix import model_cache
+from quantix.model_cache import ModelCache
+
+def _change_log(ids):
+    return [{"ifc_id": i, "produto": "Parede", "acao": "OTIMIZAR", "motivo": "m", "referencia": "r",
+             "tag_visual": "ORANGE"} for i in ids]
+
+@pytest.fixture
+def cache(engine, monkeypatch):
+    c = ModelCache()
+    monkeypatch.setattr(engine, "MODEL_CACHE", c)
+    yield c
+    c.clear()
+
+@pytest.fixture
+def outra_thread():
+    # processo com outra thread viva (servidor Streamlit com executor "thread"): pode_fork() é False
+    parar = threading.Event()
+    t = threading.Thread(target=parar.wait, daemon=True)
+    t.start()
+    yield
+    parar.set()
+    t.join()
+
+def _otimizar_duas_vezes(engine, path, ids, tmp_path):
+    h = engine.file_sha256(path.read_bytes())
+    for i in range(2):
+        ok, msg = engine.apply_optimizations_ifc(
+            path, tmp_path / f"OUT_{i}.ifc", "Hidraulica", _change_log(ids), "Emp", {},
+            tenant_id="t", project_id=f"p{i}", file_hash=h)
+        assert ok, msg
+
+def test_hit_com_fork(engine, cache, ifc_paredes, tmp_path):
+    if not model_cache.pode_fork():
+        pytest.skip("processo do pytest com outras threads")
+    path, ids = ifc_paredes
+    _otimizar_duas_vezes(engine, path, ids, tmp_path)
+    s = cache.stats()
+    assert (s["hits"], s["misses"], s["forks"], s["auxiliar"]) == (1, 1, 2, 0)
+
+def test_hit_sem_fork_via_auxiliar(engine, cache, ifc_paredes, tmp_path, outra_thread):
+    if not model_cache.usa_auxiliar():
+        pytest.skip("sem os.fork / processo auxiliar desligado")
+    assert not model_cache.pode_fork()
+    path, ids = ifc_paredes
+    _otimizar_duas_vezes(engine, path, ids, tmp_path)
+    s = cache.stats()
+    assert s["auxiliar"] == 2
+    assert s["hits"] > 0 and s["misses"] == 1 and s["sem_fork"] == 0
+
+def test_sem_auxiliar_modelo_sai_do_cache(engine, cache, ifc_paredes, tmp_path, outra_thread, monkeypatch):
+    monkeypatch.setattr(model_cache, "MODEL_CACHE_WORKER", False)
+    path, ids = ifc_paredes
+    _otimizar_duas_vezes(engine, path, ids, tmp_path)
+    s = cache.stats()
+    assert (s["hits"], s["misses"], s["sem_fork"], s["entries"]) == (0, 2, 2, 0)
@@ -0,0 +1,95 @@
+import pytest
+
+from quantix.step_patch import apply_optimizations_step
+
+QUANTIX_PSET = "Pset_QuantixOptimization"
+
+IFC2X3_SEM_OWNER = b"""ISO-10303-21;
+HEADER;
+FILE_DESCRIPTION(('ViewDefinition [CoordinationView]'),'2;1');
+FILE_NAME('x','2024-01-01T00:00:00',(''),(''),'','','');
+FILE_SCHEMA(('IFC2X3'));
+ENDSEC;
+DATA;
+#1=IFCPROJECT('2O2Fr$t4X7Zf8NOew3FL01',$,'P',$,$,$,$,$,$);
+#2=IFCWALL('2O2Fr$t4X7Zf8NOew3FL02',$,'W',$,$,$,$,$);
+ENDSEC;
+END-ISO-10303-21;
+"""
+
+def _log(ids, tags=None):
+    tags = tags or {}
+    return [{"ifc_id": i, "produto": "Parede 'PVC' ç \\ 🚰", "acao": "OTIMIZAR", "motivo": "m",
+             "referencia": "NBR", "tag_visual": tags.get(i, "ORANGE")} for i in ids]
+
+def _aplicar(engine, src, dst, change_log, shared=False):
+    ok, msg = apply_optimizations_step(
+        src, dst, "Hidraulica", change_log, "Emp", {"obs": "x"}, tenant_id="t", project_id="p",
+        engine_version=engine.ENGINE_VERSION, shared_psets=shared)
+    assert ok, msg
+    return msg
+
+def _quantix(model):
+    psets = [p for p in model.by_type("IfcPropertySet") if p.Name == QUANTIX_PSET]
+    ids = {p.id() for p in psets}
+    rels = [r for r in model.by_type("IfcRelDefinesByProperties") if r.RelatingPropertyDefinition.id() in ids]
+    return psets, rels
+
+@pytest.mark.parametrize("shared", [False, True])
+@pytest.mark.parametrize("sufixo", [".ifc", ".ifc.gz"])
+def test_saida_lida_pelo_ifcopenshell(engine, ifcopenshell, ifc_paredes, tmp_path, shared, sufixo):
+    from quantix.artifact_io import compress_file
+
+    src, ids = ifc_paredes
+    if sufixo == ".ifc.gz":
+        compress_file(src, tmp_path / "paredes.ifc.gz")
+        src = tmp_path / "paredes.ifc.gz"
+    out = tmp_path / f"OUT{sufixo}"
+    msg = _aplicar(engine, src, out, _log(ids, {ids[1]: "RED"}) + _log(["#999999"]), shared)
+    assert "3 elementos estilizados" in msg
+
+    if sufixo == ".ifc.gz":
+        from quantix.artifact_io import decompress_file
+        out = decompress_file(out, tmp_path / "OUT_texto.ifc")
+    model = ifcopenshell.open(str(out))
+    psets, rels = _quantix(model)
+    assert len(psets) == (2 if shared else 3)  # shared: um Pset por combinação de valores (ORANGE, RED)
+    assert sorted(f"#{el.id()}" for r in rels for el in r.RelatedObjects) == sorted(ids)
+    props = {p.Name: p.NominalValue.wrappedValue for p in psets[0].HasProperties}
+    assert props["Produto"] == "Parede 'PVC' ç \\ 🚰"
+    assert props["EngineVersion"] == engine.ENGINE_VERSION
+
+    grupo = [g for g in model.by_type("IfcGroup") if g.Name == "Quantix_Optimized_Elements"]
+    assert len(grupo) == 1
+    membros = [el for r in model.by_type("IfcRelAssignsToGroup") if r.RelatingGroup == grupo[0]
+               for el in r.RelatedObjects]
+    assert sorted(f"#{el.id()}" for el in membros) == sorted(ids)
+
+    estilos = {si.Item.id(): si.Styles[0].Name for si in model.by_type("IfcStyledItem") if si.Item}
+    assert sorted(estilos.values()) == ["Quantix_Optimized_Orange", "Quantix_Optimized_Orange", "Quantix_Optimized_Red"]
+    el = model.by_id(int(ids[1][1:]))
+    assert el.Description.endswith(":RED")
+    assert "QUANTIX OTIMIZADO" in model.by_type("IfcProject")[0].Description
+
+def test_ifc2x3_sem_owner_history(engine, ifcopenshell, tmp_path):
+    src = tmp_path / "noowner.ifc"
+    src.write_bytes(IFC2X3_SEM_OWNER)
+    out = tmp_path / "OUT.ifc"
+    _aplicar(engine, src, out, _log(["#2"]))
+    model = ifcopenshell.open(str(out))
+    psets, rels = _quantix(model)
+    grupos = model.by_type("IfcGroup") + model.by_type("IfcRelAssignsToGroup")
+    owners = {e.OwnerHistory for e in psets + rels + grupos}
+    assert len(owners) == 1 and None not in owners  # uma cadeia mínima, compartilhada
+    oh = owners.pop()
+    assert oh.OwningApplication.ApplicationIdentifier and oh.ChangeAction == "ADDED"
+    assert not list(tmp_path.glob("*.tmp"))
+
+def test_nenhum_elemento_encontrado(engine, ifc_paredes, tmp_path):
+    src, _ids = ifc_paredes
+    ok, _msg = apply_optimizations_step(
+        src, tmp_path / "OUT.ifc", "Hidraulica", _log(["#999999"]), "Emp", {}, tenant_id="t", project_id="p",
+        engine_version=engine.ENGINE_VERSION)
+    # só o carimbo do projeto muda: ainda gera o arquivo
+    assert ok
+    assert not list(tmp_path.glob("*.tmp"))